@@ -0,0 +1,151 @@
+"""One Smallest Atoms agent per persona, created once and shared by every session.
+
+AgentPool.get() is single-flight: concurrent first sessions for a persona wait
+on the one in-flight create_agent call instead of creating duplicates. warm()
+creates every persona's agent up front, the persona -> agent_id map is saved
+to AGENT_MAP_PATH so restarts reuse agents, and a background health check
+replaces agents the provider no longer knows about.
+"""
+import os, json, hashlib, threading
+from concurrent.futures import Future
+from personas import PERSONAS
+
+AGENT_MAP_PATH = os.environ.get("AGENT_MAP_PATH") or None
+AGENT_HEALTH_INTERVAL_SECONDS = float(os.environ.get("AGENT_HEALTH_INTERVAL_SECONDS", "300"))
+
+
+def _prompt_hash(persona):
+    return hashlib.sha256(f"{persona['name']}\n{persona['prompt']}".encode("utf-8")).hexdigest()[:16]
+
+
+class AgentPool:
+    def __init__(self, smallest, path=AGENT_MAP_PATH, personas=PERSONAS):
+        self.smallest = smallest
+        self.path = path
+        self.personas = personas
+        self.agents = {}
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._health_thread = None
+        self._load()
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path) as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            return
+        for key, entry in saved.items():
+            persona = self.personas.get(key)
+            # an edited persona prompt needs a fresh agent
+            if persona and entry.get("prompt_hash") == _prompt_hash(persona) and entry.get("agent_id"):
+                self.agents[key] = entry["agent_id"]
+
+    def _save(self):
+        if not self.path:
+            return
+        with self._lock:
+            data = {k: {"agent_id": v, "prompt_hash": _prompt_hash(self.personas[k])} for k, v in self.agents.items()}
+        tmp = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp, self.path)
+
+    def _create(self, persona_key):
+        persona = self.personas[persona_key]
+        resp = self.smallest.create_agent(display_name=persona["name"], persona_prompt=persona["prompt"])
+        agent_id = resp.get("agent_id")
+        if not agent_id:
+            raise RuntimeError("failed_to_create_agent")
+        return agent_id
+
+    def get(self, persona_key, replace=None):
+        """Agent id for persona_key, creating it at most once across concurrent callers.
+
+        replace=<agent_id> forces a new agent when that id is still the current one.
+        """
+        if persona_key not in self.personas:
+            raise ValueError("Unknown persona key")
+        with self._lock:
+            agent_id = self.agents.get(persona_key)
+            if agent_id and agent_id != replace:
+                return agent_id
+            future = self._inflight.get(persona_key)
+            owner = future is None
+            if owner:
+                future = self._inflight[persona_key] = Future()
+        if not owner:
+            return future.result()
+        try:
+            agent_id = self._create(persona_key)
+        except Exception as e:
+            with self._lock:
+                del self._inflight[persona_key]
+            future.set_exception(e)
+            raise
+        with self._lock:
+            self.agents[persona_key] = agent_id
+            del self._inflight[persona_key]
+        future.set_result(agent_id)
+        try:
+            self._save()
+        except OSError:
+            # the agent exists; an unwritable AGENT_MAP_PATH only costs a re-create after restart
+            pass
+        return agent_id
+
+    def warm(self):
+        """Create any missing persona agents; returns the number that failed."""
+        failed = 0
+        for key in self.personas:
+            try:
+                self.get(key)
+            except Exception:
+                # sessions for this persona retry creation on first use
+                failed += 1
+        return failed
+
+    def check_health(self):
+        """Recreate agents the provider reports as gone; returns the persona keys replaced."""
+        alive = getattr(self.smallest, "agent_alive", None)
+        if alive is None:
+            return []
+        replaced = []
+        for key, agent_id in list(self.agents.items()):
+            if alive(agent_id):
+                continue
+            try:
+                # best effort: the agent may be half-deleted rather than gone
+                self.smallest.delete_agent(agent_id)
+            except Exception:
+                pass
+            try:
+                self.get(key, replace=agent_id)
+                replaced.append(key)
+            except Exception:
+                # keep the old id; the next check tries again
+                pass
+        return replaced
+
+    def _health_loop(self, interval):
+        while not self._stop.wait(interval):
+            try:
+                self.check_health()
+            except Exception:
+                pass
+
+    def start(self, warm=True, interval=AGENT_HEALTH_INTERVAL_SECONDS):
+        """Warm up and run health checks on a daemon thread."""
+        def run():
+            if warm:
+                self.warm()
+            self._health_loop(interval)
+        self._stop.clear()
+        self._health_thread = threading.Thread(target=run, name="agent-pool", daemon=True)
+        self._health_thread.start()
+
+    def stop(self):
+        self._stop.set()
@@ -1,47 +1,277 @@
-import os, json
-from typing import List, Dict, Any
+import os, re, json, time, shutil, hashlib, threading
+from collections import OrderedDict
+from typing import List, Dict, Any, Union
 from analysis_heuristic import analyze_conversation_heuristic
+from messages import MessageLog, format_transcript, iter_pairs
+from providers import openai_chat_completion, openai_api_key, ProviderUnavailable
+from metrics import ANALYSIS_CACHE_LOOKUPS, ANALYSIS_CACHE_SAVED_SECONDS, count
 
-def analyze_with_openai(transcript: str) -> Dict[str, Any]:
-    """If OPENAI_API_KEY is present, call OpenAI's chat completion to analyze.
-    Otherwise fall back to heuristic analysis and return a structured dict.
-    Note: this function uses the openai package when available; real calls will
-    only work when OPENAI_API_KEY is set in your environment and the package
-    is installed.
+# Bump when the rubric or prompts change: cached analyses from other versions are ignored
+ANALYSIS_RUBRIC_VERSION = os.environ.get("ANALYSIS_RUBRIC_VERSION", "1")
+ANALYSIS_CACHE_SIZE = int(os.environ.get("ANALYSIS_CACHE_SIZE", "2048"))
+ANALYSIS_CACHE_DIR = os.environ.get("ANALYSIS_CACHE_DIR") or None
+
+ANALYSIS_SYSTEM_PROMPT = 'You are an expert sales coach.'
+ANALYSIS_PROMPT = 'Analyze the following transcript and produce json with scores, improvements, missed_facts, rewrites.'
+
+def parse_transcript(transcript: str) -> List[Dict[str, str]]:
+    """Best-effort parse of a 'role: text' transcript string (legacy input)."""
+    messages = []
+    for line in transcript.splitlines():
+        if line.strip().startswith('rep:'):
+            messages.append({'role':'rep', 'text': line.split(':',1)[1].strip()})
+        elif line.strip().startswith('customer:'):
+            messages.append({'role':'customer', 'text': line.split(':',1)[1].strip()})
+        else:
+            # try simple parse
+            parts = line.split(':',1)
+            if len(parts) == 2:
+                messages.append({'role': parts[0].strip(), 'text': parts[1].strip()})
+    return messages
+
+def analysis_cache_key(messages, kind: str) -> str:
+    """sha256 of rubric version, analysis kind and the exact (role, text) pairs.
+
+    Nothing is normalized: the heuristic's phrase matches, rewrites and missed
+    facts depend on roles and text verbatim, whitespace included.
     """
-    api_key = os.environ.get('OPENAI_API_KEY')
-    if not api_key:
-        # fallback to heuristic (need to convert transcript to messages list)
-        messages = []
-        for line in transcript.splitlines():
-            if line.strip().startswith('rep:'):
-                messages.append({'role':'rep', 'text': line.split(':',1)[1].strip()})
-            elif line.strip().startswith('customer:'):
-                messages.append({'role':'customer', 'text': line.split(':',1)[1].strip()})
+    prompt = f"{ANALYSIS_SYSTEM_PROMPT}\n{ANALYSIS_PROMPT}" if kind == "openai" else ""
+    raw = json.dumps([ANALYSIS_RUBRIC_VERSION, kind, prompt, list(iter_pairs(messages))], ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class AnalysisCache:
+    """Finished analyses keyed by analysis_cache_key.
+
+    An entry-bounded in-memory LRU in front of an optional on-disk store
+    (ANALYSIS_CACHE_DIR/<rubric version>/). Each entry keeps how long the
+    analysis took to compute, so hits can report the latency they saved.
+    Results are stored as JSON and decoded per hit, so callers get their own copy.
+    """
+
+    def __init__(self, max_entries=ANALYSIS_CACHE_SIZE, disk_dir=ANALYSIS_CACHE_DIR, version=ANALYSIS_RUBRIC_VERSION):
+        self.max_entries = max_entries
+        self.disk_dir = disk_dir
+        self.version = version
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+        if disk_dir:
+            os.makedirs(self._version_dir(), exist_ok=True)
+
+    def _version_dir(self):
+        return os.path.join(self.disk_dir, re.sub(r"[^A-Za-z0-9_.-]", "_", self.version))
+
+    def _disk_path(self, key):
+        return os.path.join(self._version_dir(), key[:2], key + ".json")
+
+    def _read_disk(self, key):
+        try:
+            with open(self._disk_path(key), "r", encoding="utf-8") as f:
+                entry = json.load(f)
+            return json.dumps(entry["result"]), float(entry["seconds"])
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def _write_disk(self, key, doc, seconds):
+        path = self._disk_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(f'{{"seconds": {seconds!r}, "result": {doc}}}')
+        os.replace(tmp, path)
+
+    def _remember(self, key, entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get(self, key, kind=""):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+        if entry is None and self.disk_dir:
+            entry = self._read_disk(key)
+            if entry is not None:
+                with self._lock:
+                    self._remember(key, entry)
+        with self._lock:
+            if entry is None:
+                self.misses += 1
             else:
-                # try simple parse
-                parts = line.split(':',1)
-                if len(parts) == 2:
-                    messages.append({'role': parts[0].strip(), 'text': parts[1].strip()})
-        return analyze_conversation_heuristic(messages)
+                self.hits += 1
+                self.saved_seconds += entry[1]
+        if entry is None:
+            count(ANALYSIS_CACHE_LOOKUPS, kind, "miss")
+            return None
+        count(ANALYSIS_CACHE_LOOKUPS, kind, "hit")
+        count(ANALYSIS_CACHE_SAVED_SECONDS, kind, amount=entry[1])
+        return json.loads(entry[0])
+
+    def put(self, key, result, seconds):
+        doc = json.dumps(result)
+        with self._lock:
+            self._remember(key, (doc, seconds))
+        if self.disk_dir:
+            try:
+                self._write_disk(key, doc, seconds)
+            except OSError:
+                pass
+
+    def get_or_compute(self, messages, kind, compute):
+        """Cached result for (messages, kind), else compute() -> (result, cacheable) and store it."""
+        key = analysis_cache_key(messages, kind)
+        result = self.get(key, kind)
+        if result is not None:
+            return result
+        started = time.perf_counter()
+        result, cacheable = compute()
+        if cacheable:
+            self.put(key, result, time.perf_counter() - started)
+        return result
+
+    def prune(self):
+        """Delete on-disk entries written under other rubric versions; returns the number of version dirs removed."""
+        if not self.disk_dir:
+            return 0
+        current = os.path.basename(self._version_dir())
+        removed = 0
+        for name in os.listdir(self.disk_dir):
+            path = os.path.join(self.disk_dir, name)
+            if name != current and os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+                removed += 1
+        return removed
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "rubric_version": self.version,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "saved_seconds": round(self.saved_seconds, 3),
+            }
+
+
+ANALYSIS_CACHE = AnalysisCache()
+
+def _openai_analysis(messages):
+    """(analysis, cacheable): degraded fallbacks and errors are not cached."""
+    api_key = openai_api_key()
+    if not api_key:
+        return analyze_conversation_heuristic(messages), True
 
     # Real OpenAI call placeholder
     try:
-        import openai
-        openai.api_key = api_key
-        prompt = f"Analyze the following transcript and produce json with scores, improvements, missed_facts, rewrites.\n\n{transcript}"
-        resp = openai.ChatCompletion.create(
+        prompt = f"{ANALYSIS_PROMPT}\n\n{format_transcript(messages)}"
+        resp = openai_chat_completion(
+            api_key,
             model='gpt-4o-mini',
-            messages=[{'role':'system','content':'You are an expert sales coach.'}, {'role':'user','content':prompt}],
+            messages=[{'role':'system','content':ANALYSIS_SYSTEM_PROMPT}, {'role':'user','content':prompt}],
             max_tokens=800
         )
         text = resp['choices'][0]['message']['content']
         # attempt to parse JSON out of response
         try:
             data = json.loads(text)
-            return data
+            return data, isinstance(data, dict)
         except Exception:
             # if not JSON, wrap the text
-            return {'raw': text}
+            return {'raw': text}, False
+    except ProviderUnavailable:
+        # OpenAI is degraded; fail fast to the heuristic coach
+        return analyze_conversation_heuristic(messages), False
     except Exception as e:
-        return {'error': 'openai_call_failed', 'detail': str(e)}
+        return {'error': 'openai_call_failed', 'detail': str(e)}, False
+
+def _compute_and_cache(key, messages):
+    # single-transcript analysis for a key whose cache miss was already counted
+    started = time.perf_counter()
+    result, cacheable = _openai_analysis(messages)
+    if cacheable:
+        ANALYSIS_CACHE.put(key, result, time.perf_counter() - started)
+    return result
+
+def analyze_with_openai(messages: Union[MessageLog, List[Dict[str, str]], str]) -> Dict[str, Any]:
+    """If OPENAI_API_KEY is present, call OpenAI's chat completion to analyze.
+    Otherwise fall back to heuristic analysis and return a structured dict.
+    messages is a MessageLog or list of {role, text}; a 'role: text' transcript
+    string is still accepted and parsed line by line.
+    Results are cached in ANALYSIS_CACHE by normalized transcript and rubric version.
+    Note: this function uses the openai package when available; real calls will
+    only work when OPENAI_API_KEY is set in your environment and the package
+    is installed.
+    """
+    if isinstance(messages, str):
+        messages = parse_transcript(messages)
+    kind = "openai" if openai_api_key() else "heuristic"
+    return ANALYSIS_CACHE.get_or_compute(messages, kind, lambda: _openai_analysis(messages))
+
+def _batch_prompt(items):
+    parts = [
+        "Analyze each of the following sales call transcripts. Respond with one JSON object mapping "
+        "every transcript id to its analysis (json with scores, improvements, missed_facts, rewrites)."
+    ]
+    for item_id, messages in items:
+        parts.append(f"### id: {item_id}\n{format_transcript(messages)}")
+    return "\n\n".join(parts)
+
+def analyze_batch_with_openai(items) -> Dict[str, Any]:
+    """Analyze several transcripts with one OpenAI call.
+
+    items is a list of (id, messages). Returns {id: analysis}; transcripts the
+    batched answer doesn't cover are analyzed one by one with analyze_with_openai.
+    """
+    items = [(item_id, parse_transcript(m) if isinstance(m, str) else m) for item_id, m in items]
+    api_key = openai_api_key()
+    if not api_key:
+        return {item_id: analyze_with_openai(messages) for item_id, messages in items}
+    results, keys = {}, {}
+    for item_id, messages in items:
+        keys[item_id] = analysis_cache_key(messages, "openai")
+        cached = ANALYSIS_CACHE.get(keys[item_id], "openai")
+        if cached is not None:
+            results[item_id] = cached
+    items = [(item_id, messages) for item_id, messages in items if item_id not in results]
+    if len(items) <= 1:
+        results.update((item_id, _compute_and_cache(keys[item_id], messages)) for item_id, messages in items)
+        return results
+    started = time.perf_counter()
+    try:
+        resp = openai_chat_completion(
+            api_key,
+            model='gpt-4o-mini',
+            messages=[{'role':'system','content':ANALYSIS_SYSTEM_PROMPT}, {'role':'user','content':_batch_prompt(items)}],
+            max_tokens=min(800 * len(items), 8000)
+        )
+        data = json.loads(resp['choices'][0]['message']['content'])
+        if isinstance(data, dict):
+            # the batch's latency is shared by its transcripts
+            seconds = (time.perf_counter() - started) / len(items)
+            for item_id, _ in items:
+                if isinstance(data.get(item_id), dict):
+                    results[item_id] = data[item_id]
+                    ANALYSIS_CACHE.put(keys[item_id], data[item_id], seconds)
+    except ProviderUnavailable:
+        results.update((item_id, analyze_conversation_heuristic(messages)) for item_id, messages in items)
+        return results
+    except Exception:
+        # unparseable or failed batch: fall through to per-transcript calls
+        pass
+    for item_id, messages in items:
+        if item_id not in results:
+            results[item_id] = _compute_and_cache(keys[item_id], messages)
+    return results
+
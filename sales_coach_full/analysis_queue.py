@@ -0,0 +1,127 @@
+"""Queue that batches end-of-session OpenAI analyses.
+
+Sessions ending within ANALYSIS_BATCH_WAIT_MS of each other share one
+provider call of up to ANALYSIS_BATCH_SIZE transcripts. At most
+ANALYSIS_MAX_CONCURRENCY batches are in flight. Repeated end calls for a
+session whose job is still queued or running get that same job back.
+
+    queue = AnalysisQueue(on_done=lambda session_id, result: ...)
+    job = queue.submit(session_id, messages)
+    job.wait()          # or poll job.status / queue.get(job.id)
+"""
+import os, time, uuid, threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from analysis import analyze_batch_with_openai
+from metrics import span
+
+ANALYSIS_BATCH_SIZE = int(os.environ.get("ANALYSIS_BATCH_SIZE", "8"))
+ANALYSIS_BATCH_WAIT_S = float(os.environ.get("ANALYSIS_BATCH_WAIT_MS", "250")) / 1000.0
+ANALYSIS_MAX_CONCURRENCY = int(os.environ.get("ANALYSIS_MAX_CONCURRENCY", "4"))
+# how long a synchronous /end waits for its analysis before answering like ?background=true
+ANALYSIS_END_WAIT_SECONDS = float(os.environ.get("ANALYSIS_END_WAIT_SECONDS", "20"))
+# finished jobs kept for polling; results also land in the session store via on_done
+ANALYSIS_JOBS_MAX = int(os.environ.get("ANALYSIS_JOBS_MAX", "10000"))
+
+
+class AnalysisJob:
+    def __init__(self, session_id, messages):
+        self.id = "job_" + uuid.uuid4().hex[:12]
+        self.session_id = session_id
+        self.messages = messages
+        self.status = "queued"
+        self.result = None
+        self.created_at = time.time()
+        self.future = Future()
+
+    def wait(self, timeout=None):
+        return self.future.result(timeout)
+
+    def to_dict(self):
+        return {"job_id": self.id, "session_id": self.session_id, "status": self.status}
+
+
+class AnalysisQueue:
+    def __init__(self, on_done=None, batch_size=ANALYSIS_BATCH_SIZE, max_wait_s=ANALYSIS_BATCH_WAIT_S,
+                 max_concurrency=ANALYSIS_MAX_CONCURRENCY, analyze_batch=analyze_batch_with_openai):
+        self.on_done = on_done
+        self.batch_size = batch_size
+        self.max_wait_s = max_wait_s
+        self.analyze_batch = analyze_batch
+        self.jobs = OrderedDict()
+        self._pending = []
+        self._by_session = {}
+        self._cond = threading.Condition()
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._pool = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="analysis")
+        self._dispatcher = None
+
+    def submit(self, session_id, messages):
+        with self._cond:
+            job = self._by_session.get(session_id)
+            if job is not None and job.status in ("queued", "running"):
+                return job
+            job = AnalysisJob(session_id, messages)
+            self.jobs[job.id] = job
+            self._by_session[session_id] = job
+            self._trim()
+            self._pending.append(job)
+            if self._dispatcher is None:
+                self._dispatcher = threading.Thread(target=self._dispatch, name="analysis-dispatch", daemon=True)
+                self._dispatcher.start()
+            self._cond.notify()
+        return job
+
+    def get(self, job_id):
+        return self.jobs.get(job_id) if job_id else None
+
+    def _trim(self):
+        while len(self.jobs) > ANALYSIS_JOBS_MAX:
+            oldest = next(iter(self.jobs.values()))
+            if oldest.status in ("queued", "running"):
+                break
+            del self.jobs[oldest.id]
+            if self._by_session.get(oldest.session_id) is oldest:
+                del self._by_session[oldest.session_id]
+
+    def _next_batch(self):
+        with self._cond:
+            while not self._pending:
+                self._cond.wait()
+            # first job opens the window; collect more until it closes or the batch is full
+            deadline = time.monotonic() + self.max_wait_s
+            while len(self._pending) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            batch, self._pending = self._pending[:self.batch_size], self._pending[self.batch_size:]
+            for job in batch:
+                job.status = "running"
+            return batch
+
+    def _dispatch(self):
+        while True:
+            batch = self._next_batch()
+            # concurrency ceiling: wait for a free slot before taking the next batch
+            self._slots.acquire()
+            self._pool.submit(self._run, batch)
+
+    def _run(self, batch):
+        try:
+            with span("analysis_batch", provider="openai"):
+                results = self.analyze_batch([(job.id, job.messages) for job in batch])
+        except Exception as e:
+            results = {job.id: {"error": "analysis_failed", "detail": str(e)} for job in batch}
+        finally:
+            self._slots.release()
+        for job in batch:
+            job.result = results.get(job.id)
+            job.status = "error" if job.result is None or "error" in job.result else "done"
+            job.messages = None
+            if self.on_done is not None:
+                try:
+                    self.on_done(job.session_id, job.result)
+                except Exception:
+                    pass
+            job.future.set_result(job.result)
@@ -1,8 +1,12 @@
 # FastAPI app wiring updated to include audio upload (STT) endpoint and OpenAI analysis option
-import os
-from fastapi import FastAPI, HTTPException, UploadFile, File
+import os, time, threading, base64
+from contextlib import asynccontextmanager
+from typing import Literal, Optional
+from fastapi import FastAPI, HTTPException, UploadFile, File, WebSocket, Request
 from pydantic import BaseModel
 from fastapi.middleware.cors import CORSMiddleware
+import asyncio, json
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
 import sys
 # from os.path import abspath, dirname, join
 # PARENT_DIR = abspath(join(dirname(__file__), '..'))
@@ -11,18 +15,89 @@ import sys
 from smallest_wrapper import SmallestClientWrapper
 from session_manager import SessionManager
 from personas import PERSONAS
-from stt import transcribe_audio_deepgram
-from analysis import analyze_with_openai
+from stt import transcribe_audio_deepgram, load_numpy
+from analysis import ANALYSIS_CACHE
+from concurrent.futures import TimeoutError as FutureTimeout
+from analysis_queue import AnalysisQueue, ANALYSIS_END_WAIT_SECONDS
+from providers import openai_api_key, load_openai, get_provider
 from reply import generate_reply_text
+from async_utils import run_blocking
+from streaming import stream_voice_turns
+from speculation import speculate
+from tts_cache import warm_tts_cache
+from audio_response import multipart_audio_response, audio_media_type
+from turn_audio import TurnAudioStore, TURN_AUDIO_MAX_WAIT_SECONDS
+from uploads import UploadLimitMiddleware, read_upload
+from metrics import METRICS_ENABLED, RequestTimingMiddleware, span, render_prometheus
 
 class CreateSessionReq(BaseModel):
     persona_key: str
+    # who is practicing; scores are grouped by it for trends and leaderboards
+    rep_id: Optional[str] = None
 
 class MessageReq(BaseModel):
     text: str
 
+# ?audio=binary returns multipart/form-data (JSON "metadata" part + raw "audio"
+# part) instead of embedding the audio as base64 in JSON; ?audio=deferred
+# returns the text right away and a turn id whose audio is fetched separately
+AudioMode = Literal["base64", "binary", "deferred"]
+
+def turn_response(audio_mode, metadata, audio):
+    if audio_mode == "binary":
+        return multipart_audio_response(metadata, audio)
+    return {**metadata, "tts_base64": base64.b64encode(audio).decode('utf-8') if audio else ""}
+
+def deferred_turn_response(session_id, metadata):
+    # TTS for the reply runs in the background; see GET /sessions/{id}/turns/{turn_id}/audio
+    if not metadata.get("reply_text"):
+        return {**metadata, "turn_id": None, "audio_url": None}
+    turn = turn_audio.start(session_id, metadata["reply_text"])
+    return {**metadata, "turn_id": turn.id, "audio_url": f"/sessions/{session_id}/turns/{turn.id}/audio"}
+
 SMALLEST_API_KEY = os.environ.get("SMALLEST_API_KEY")
-app = FastAPI(title="Sales Coach Backend")
+# Pre-synthesize canned replies into the TTS cache when the worker starts
+TTS_WARMUP = os.environ.get("TTS_WARMUP", "1") == "1"
+# Create every persona's agent at startup instead of on its first session
+AGENT_WARMUP = os.environ.get("AGENT_WARMUP", "1") == "1"
+
+# filled in by warm_up(); GET /ready answers 503 until every check is ok
+readiness = {"ready": False, "checks": {}}
+
+def warm_up():
+    """Import the heavy provider dependencies and build clients off the request path."""
+    checks = {}
+    for name, load in (("smallest", smallest.init_clients),
+                       ("http", lambda: get_provider("deepgram").session),
+                       ("openai", load_openai if openai_api_key() else None)):
+        if load is None:
+            continue
+        try:
+            load()
+            checks[name] = "ok"
+        except Exception as e:
+            checks[name] = f"error: {e}"
+    # optional: uploads are sent untrimmed without it
+    checks["numpy"] = "ok" if load_numpy() is not None else "missing"
+    readiness["checks"] = checks
+    readiness["ready"] = all(v == "ok" for k, v in checks.items() if k != "numpy")
+    if TTS_WARMUP and readiness["ready"]:
+        # requests that arrive first just miss the cache
+        warm_tts_cache(smallest)
+
+@asynccontextmanager
+async def lifespan(app):
+    # don't hold up startup: the worker accepts requests while this runs
+    threading.Thread(target=warm_up, name="warm-up", daemon=True).start()
+    # agent warm-up and periodic health checks run on their own daemon thread
+    session_mgr.agents.start(warm=AGENT_WARMUP)
+    yield
+    session_mgr.agents.stop()
+    session_mgr.scores.close()
+
+app = FastAPI(title="Sales Coach Backend", lifespan=lifespan)
+# 413 for bodies over UPLOAD_MAX_BYTES while they arrive (see uploads.py)
+app.add_middleware(UploadLimitMiddleware)
 
 # Enable CORS for local frontend dev
 frontend_origins = [
@@ -36,10 +111,17 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+if METRICS_ENABLED:
+    app.add_middleware(RequestTimingMiddleware)
 
-# Require real Smallest.ai SDK and API key
+# Needs the real Smallest.ai SDK and API key unless PROVIDER_MODE=mock; both are
+# only loaded on first use or by warm_up(), so a missing one fails /ready, not the import
 smallest = SmallestClientWrapper(api_key=SMALLEST_API_KEY)
 session_mgr = SessionManager(smallest)
+# reply audio for ?audio=deferred turns, kept until fetched out of retention or the session ends
+turn_audio = TurnAudioStore(smallest.synthesize_tts_bytes)
+# end-of-session OpenAI analyses are batched; results are stored on the session
+analysis_queue = AnalysisQueue(on_done=lambda session_id, result: session_mgr.sessions.set_field(session_id, "openai_analysis", result))
 
 @app.get("/personas")
 def list_personas():
@@ -49,70 +131,234 @@ def list_personas():
 def create_session(req: CreateSessionReq):
     if req.persona_key not in PERSONAS:
         raise HTTPException(status_code=400, detail="unknown persona_key")
-    session_id, agent_id = session_mgr.create_session(req.persona_key)
+    session_id, agent_id = session_mgr.create_session(req.persona_key, req.rep_id)
     return {"session_id": session_id, "agent_id": agent_id}
 
 @app.post("/sessions/{session_id}/message")
-def send_message(session_id: str, msg: MessageReq):
+def send_message(session_id: str, msg: MessageReq, audio: AudioMode = "base64"):
     try:
-        reply_text, tts_b64 = session_mgr.send_rep_message(session_id, msg.text)
-        return {"reply_text": reply_text, "tts_base64": tts_b64}
+        reply_text, tts_audio = session_mgr.send_rep_message_audio(session_id, msg.text, synthesize=audio != "deferred")
+        if audio == "deferred":
+            return deferred_turn_response(session_id, {"reply_text": reply_text})
+        return turn_response(audio, {"reply_text": reply_text}, tts_audio)
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
 
 @app.post("/sessions/{session_id}/upload_audio")
-async def upload_audio(session_id: str, file: UploadFile = File(...)):
+async def upload_audio(session_id: str, file: UploadFile = File(...), audio: AudioMode = "base64"):
     # Accepts an audio file from the frontend and returns transcription
     if session_id not in session_mgr.sessions:
         raise HTTPException(status_code=404, detail="session not found")
-    content = await file.read()
-    transcript = transcribe_audio_deepgram(content, filename=file.filename)
+    session = session_mgr.get_session(session_id)
+    persona_key = session['persona_key']
+    with span("upload_read", persona_key):
+        content = await read_upload(file)
+    with span("stt", persona_key, "deepgram"):
+        transcript = await run_blocking(transcribe_audio_deepgram, content, filename=file.filename)
     # store as rep message (assumes rep spoke)
-    session_mgr.sessions[session_id]['messages'].append({'role':'rep','text': transcript})
+    session_mgr.append_message(session_id, 'rep', transcript)
     # Now attempt agent reply (optional)
-    agent_id = session_mgr.sessions[session_id]['agent_id']
+    agent_id = session['agent_id']
     reply = ""
-    tts_b64 = ""
+    tts_audio = b""
     try:
         reply = smallest.converse_text(agent_id, transcript)
         if reply:
-            session_mgr.sessions[session_id]['messages'].append({'role':'customer','text':reply})
+            session_mgr.append_message(session_id, 'customer', reply)
+        if reply and audio != "deferred":
             try:
-                tts_b64 = smallest.synthesize_tts_base64(reply)
+                with span("tts", persona_key, "smallest"):
+                    tts_audio = await run_blocking(smallest.synthesize_tts_bytes, reply)
             except Exception:
-                tts_b64 = ""
+                tts_audio = b""
     except Exception:
         reply = ""
-        tts_b64 = ""
-    return {'transcript': transcript, 'reply_text': reply, 'tts_base64': tts_b64}
+        tts_audio = b""
+    if audio == "deferred":
+        return deferred_turn_response(session_id, {'transcript': transcript, 'reply_text': reply})
+    return turn_response(audio, {'transcript': transcript, 'reply_text': reply}, tts_audio)
 
 @app.post("/voice/{session_id}")
-async def voice_exchange(session_id: str, file: UploadFile = File(...)):
+async def voice_exchange(session_id: str, file: UploadFile = File(...), audio: AudioMode = "base64"):
     if session_id not in session_mgr.sessions:
         raise HTTPException(status_code=404, detail="session not found")
-    content = await file.read()
-    transcript = transcribe_audio_deepgram(content, filename=file.filename)
-    # Append transcript
-    session_mgr.sessions[session_id]['messages'].append({'role': 'rep', 'text': transcript})
-    # Produce a reply text (OpenAI if available, else heuristic) and TTS
-    agent_id = session_mgr.sessions[session_id]['agent_id']
-    persona_key = session_mgr.sessions[session_id]['persona_key']
+    session = session_mgr.get_session(session_id)
+    persona_key = session['persona_key']
     persona = PERSONAS.get(persona_key, {})
-    reply_text = generate_reply_text(session_mgr.sessions[session_id]['messages'], persona.get('prompt', ''))
-    tts_b64 = smallest.synthesize_tts_base64(reply_text)
-    session_mgr.sessions[session_id]['messages'].append({'role': 'customer', 'text': reply_text})
-    return { 'transcript': transcript, 'reply_text': reply_text, 'tts_base64': tts_b64 }
+    with span("upload_read", persona_key):
+        content = await read_upload(file)
+    # heuristic replies come from a small set: start TTS for the likely ones while STT runs
+    # (not for deferred audio: nobody waits on the TTS, so there is nothing to overlap with STT)
+    speculation = None if audio == "deferred" else speculate(smallest, session['messages'], persona.get('prompt', ''), persona_key)
+    with span("stt", persona_key, "deepgram"):
+        transcript = await run_blocking(transcribe_audio_deepgram, content, filename=file.filename)
+    # Append transcript
+    session_mgr.append_message(session_id, 'rep', transcript)
+    session = session_mgr.get_session(session_id)
+    committed = None
+    if speculation is not None:
+        with span("speculation_commit", persona_key, "smallest"):
+            committed = await speculation.commit(transcript)
+    if committed is not None:
+        reply_text, tts_audio = committed
+    else:
+        # Produce a reply text (OpenAI if available, else heuristic) and TTS
+        with span("reply", persona_key, "openai" if openai_api_key() else "heuristic"):
+            reply_text = await run_blocking(generate_reply_text, session['messages'], persona.get('prompt', ''),
+                                            session_mgr.reply_context(session_id))
+        if audio == "deferred":
+            session_mgr.append_message(session_id, 'customer', reply_text)
+            return deferred_turn_response(session_id, {'transcript': transcript, 'reply_text': reply_text})
+        try:
+            with span("tts", persona_key, "smallest"):
+                tts_audio = await run_blocking(smallest.synthesize_tts_bytes, reply_text)
+        except Exception:
+            # open breaker or provider error: the turn still gets its reply text
+            tts_audio = b""
+    session_mgr.append_message(session_id, 'customer', reply_text)
+    return turn_response(audio, {'transcript': transcript, 'reply_text': reply_text}, tts_audio)
+
+@app.websocket("/ws/sessions/{session_id}")
+async def voice_stream(websocket: WebSocket, session_id: str):
+    # Streaming variant of /voice: audio frames in, partial transcripts and
+    # per-sentence TTS audio frames out (see streaming.stream_voice_turns).
+    # Clients must send {"type": "end"} after each utterance.
+    if session_id not in session_mgr.sessions:
+        await websocket.close(code=4404)
+        return
+    await websocket.accept()
+    persona = PERSONAS.get(session_mgr.get_session(session_id)['persona_key'], {})
+    await stream_voice_turns(websocket, session_mgr, session_id, persona.get('prompt', ''), smallest)
 
 @app.post("/sessions/{session_id}/end")
-def end_session(session_id: str):
+def end_session(session_id: str, background: bool = False):
+    # ?background=true returns right away with a job id; poll GET /sessions/{id}/analysis
     if session_id not in session_mgr.sessions:
         raise HTTPException(status_code=404, detail="session not found")
-    coaching = session_mgr.end_and_analyze(session_id)
-    # attempt OpenAI analysis if key present
-    full_transcript = coaching.get('transcript','')
-    openai_result = analyze_with_openai(full_transcript)
+    persona_key = session_mgr.get_session(session_id)['persona_key']
+    # reply audio nobody will play any more
+    turn_audio.cancel_session(session_id)
+    with span("analysis", persona_key, "heuristic"):
+        coaching = session_mgr.end_and_analyze(session_id)
+    # attempt OpenAI analysis if key present; without one analyze_with_openai
+    # would only recompute the same heuristic we already hold
+    if not openai_api_key():
+        return {"analysis": coaching, "openai_analysis": coaching}
+    job = analysis_queue.submit(session_id, session_mgr.get_session(session_id)['messages'])
+    session_mgr.sessions.set_field(session_id, "analysis_job", job.id)
+    pending = {"analysis": coaching, **job.to_dict(), "status_url": f"/sessions/{session_id}/analysis"}
+    if background:
+        return pending
+    # bounded, so a burst of slow analyses can't hold every sync-route thread
+    try:
+        with span("analysis", persona_key, "openai"):
+            openai_result = job.wait(ANALYSIS_END_WAIT_SECONDS)
+    except FutureTimeout:
+        return {**pending, "status": job.status}
     return {"analysis": coaching, "openai_analysis": openai_result}
 
+@app.get("/sessions/{session_id}/turns/{turn_id}/audio")
+async def turn_audio_fetch(session_id: str, turn_id: str, wait: float = 0.0):
+    # ?wait=N long-polls up to N seconds (capped) while the audio is still being synthesized
+    turn = turn_audio.get(session_id, turn_id)
+    if turn is None:
+        raise HTTPException(status_code=404, detail="turn not found, or its audio has expired")
+    turn = await turn_audio.wait(turn, min(max(wait, 0.0), TURN_AUDIO_MAX_WAIT_SECONDS))
+    if turn.status == "done":
+        return Response(turn.audio, media_type=audio_media_type(turn.audio))
+    if turn.status == "pending":
+        return JSONResponse(turn.to_dict(), status_code=202, headers={"Retry-After": "1"})
+    if turn.status == "error":
+        return JSONResponse({**turn.to_dict(), "detail": turn.error}, status_code=502)
+    raise HTTPException(status_code=410, detail=f"turn audio {turn.status}")
+
+def _analysis_status(session_id, session):
+    job = analysis_queue.get(session.get("analysis_job"))
+    if job is not None:
+        status = job.status
+    elif "openai_analysis" in session:
+        status = "done"
+    elif "analysis" in session:
+        # ended without OpenAI: the heuristic analysis is the final one
+        status = "done" if not openai_api_key() else "unknown"
+    else:
+        status = "not_ended"
+    openai_result = session.get("openai_analysis")
+    if openai_result is None and status == "done" and job is None:
+        openai_result = session.get("analysis")
+    return {"session_id": session_id, "job_id": session.get("analysis_job"), "status": status,
+            "analysis": session.get("analysis"), "openai_analysis": openai_result}
+
+async def _analysis_events(session_id):
+    # one "status" event now, then one when the job finishes
+    session = session_mgr.get_session(session_id)
+    state = _analysis_status(session_id, session)
+    yield f"event: status\ndata: {json.dumps(state)}\n\n"
+    job = analysis_queue.get(session.get("analysis_job"))
+    if job is not None and state["status"] in ("queued", "running"):
+        await asyncio.wrap_future(job.future)
+        state = _analysis_status(session_id, session_mgr.get_session(session_id))
+        yield f"event: status\ndata: {json.dumps(state)}\n\n"
+
+@app.get("/sessions/{session_id}/analysis")
+def get_analysis(session_id: str, request: Request):
+    # JSON status for polling; Server-Sent Events with Accept: text/event-stream
+    if session_id not in session_mgr.sessions:
+        raise HTTPException(status_code=404, detail="session not found")
+    if "text/event-stream" in request.headers.get("accept", ""):
+        return StreamingResponse(_analysis_events(session_id), media_type="text/event-stream")
+    return _analysis_status(session_id, session_mgr.get_session(session_id))
+
+@app.get("/sessions/{session_id}/live_score")
+def live_score(session_id: str):
+    try:
+        return session_mgr.live_scores(session_id)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+def _since(days):
+    return time.time() - days * 86400 if days else None
+
+@app.get("/scores/reps/{rep_id}/trend")
+def rep_trend(rep_id: str, bucket: Literal["day", "week"] = "day", days: Optional[float] = None):
+    return {"rep_id": rep_id, "bucket": bucket, "trend": session_mgr.scores.rep_trend(rep_id, bucket, _since(days))}
+
+@app.get("/scores/personas")
+def persona_percentiles(percentiles: str = "10,50,90", days: Optional[float] = None):
+    try:
+        wanted = tuple(float(p) for p in percentiles.split(",") if p.strip())
+    except ValueError:
+        raise HTTPException(status_code=400, detail="percentiles must be comma-separated numbers")
+    if not wanted or any(not 0 <= p <= 100 for p in wanted):
+        raise HTTPException(status_code=400, detail="percentiles must be between 0 and 100")
+    return {"personas": session_mgr.scores.persona_percentiles(wanted, _since(days))}
+
+@app.get("/scores/leaderboard")
+def leaderboard(metric: str = "overall", days: Optional[float] = None, persona_key: Optional[str] = None,
+                min_sessions: int = 1, limit: int = 10):
+    try:
+        rows = session_mgr.scores.leaderboard(metric, _since(days), persona_key, min_sessions, max(1, min(limit, 100)))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"metric": metric, "leaderboard": rows}
+
+@app.get("/analysis/cache_stats")
+def analysis_cache_stats():
+    return ANALYSIS_CACHE.stats()
+
+@app.get("/tts/cache_stats")
+def tts_cache_stats():
+    return smallest.tts_cache.stats()
+
+@app.get("/metrics")
+def metrics():
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
+
 @app.get("/health")
 def health():
+    # liveness only; use /ready to gate traffic
     return {"status": "ok"}
+
+@app.get("/ready")
+def ready():
+    return JSONResponse(readiness, status_code=200 if readiness["ready"] else 503)
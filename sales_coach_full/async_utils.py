@@ -0,0 +1,21 @@
+import os, asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+# Provider SDKs (Deepgram via requests, Smallest Waves, OpenAI) are blocking.
+# Run them on a bounded pool so one slow call can't stall the event loop for
+# every other session on the worker.
+PROVIDER_MAX_WORKERS = int(os.environ.get("PROVIDER_MAX_WORKERS", "64"))
+
+_executor = None
+
+def get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=PROVIDER_MAX_WORKERS, thread_name_prefix="provider")
+    return _executor
+
+async def run_blocking(func, *args, **kwargs):
+    """Await a blocking callable on the shared provider pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(), partial(func, *args, **kwargs))
@@ -0,0 +1,41 @@
+# Binary audio responses: multipart/form-data with a JSON "metadata" part and a raw "audio" part
+import json, uuid
+from fastapi.responses import StreamingResponse
+
+AUDIO_CHUNK_SIZE = 64 * 1024
+
+def audio_media_type(audio: bytes) -> str:
+    head = bytes(audio[:4])
+    if head == b'RIFF':
+        return 'audio/wav'
+    if head[:3] == b'ID3' or head[:2] in (b'\xff\xfb', b'\xff\xf3', b'\xff\xf2'):
+        return 'audio/mpeg'
+    if head == b'OggS':
+        return 'audio/ogg'
+    return 'application/octet-stream'
+
+async def _parts(boundary: str, metadata: dict, audio: bytes):
+    # async generator so Starlette doesn't hop to a thread for every chunk
+    yield (
+        f'--{boundary}\r\n'
+        'Content-Disposition: form-data; name="metadata"\r\n'
+        'Content-Type: application/json\r\n\r\n'
+        f'{json.dumps(metadata)}\r\n'
+    ).encode('utf-8')
+    if audio:
+        yield (
+            f'--{boundary}\r\n'
+            'Content-Disposition: form-data; name="audio"; filename="reply"\r\n'
+            f'Content-Type: {audio_media_type(audio)}\r\n\r\n'
+        ).encode('utf-8')
+        view = memoryview(audio)
+        for i in range(0, len(view), AUDIO_CHUNK_SIZE):
+            yield view[i:i + AUDIO_CHUNK_SIZE]
+        yield b'\r\n'
+    yield f'--{boundary}--\r\n'.encode('utf-8')
+
+def multipart_audio_response(metadata: dict, audio: bytes) -> StreamingResponse:
+    """Stream metadata + raw audio without base64; browsers can read it with Response.formData()."""
+    boundary = 'turn-' + uuid.uuid4().hex
+    return StreamingResponse(_parts(boundary, metadata, audio or b''),
+                             media_type=f'multipart/form-data; boundary={boundary}')
@@ -0,0 +1,207 @@
+"""Batch re-scoring of stored transcripts.
+
+Streams transcripts from a JSONL file or a directory of .json/.jsonl files,
+fans analyze_conversation_heuristic out across a process pool and streams the
+results to JSONL (or Parquet part files when pyarrow is installed). Progress is
+checkpointed after every flushed batch so an interrupted run can be resumed.
+
+Each input record is a JSON object with "messages" ([{role, text}]) and an
+optional "id" / "session_id". Records that can't be parsed or scored are
+written as {"id", "error"} rows and counted, without stopping the run.
+
+    python -m batch transcripts.jsonl scores.jsonl --workers 8
+    python -m batch transcripts/ scores_parquet --format parquet --resume
+"""
+import argparse, json, os, sys, time
+from concurrent.futures import ProcessPoolExecutor
+from analysis_heuristic import analyze_conversation_heuristic
+
+CHUNK_SIZE = 200
+SCORE_KEYS = ("rapport", "objection_handling", "product_knowledge", "closing")
+
+
+def _iter_raw(path):
+    """Yield (fallback_id, raw JSON text) for every transcript under path."""
+    if os.path.isdir(path):
+        files = sorted(os.path.join(path, f) for f in os.listdir(path) if f.endswith((".json", ".jsonl")))
+    else:
+        files = [path]
+    n = 0
+    for fp in files:
+        with open(fp, encoding="utf-8") as f:
+            lines = [f.read()] if fp.endswith(".json") else (line for line in f if line.strip())
+            for raw in lines:
+                yield f"{os.path.basename(fp)}:{n}", raw
+                n += 1
+
+
+def _load(fallback_id, raw):
+    record = json.loads(raw) if isinstance(raw, str) else raw
+    record.setdefault("id", record.get("session_id") or fallback_id)
+    return record
+
+
+def iter_transcripts(path):
+    """Yield transcript records from a JSONL file or a directory of .json/.jsonl files."""
+    for fallback_id, raw in _iter_raw(path):
+        yield _load(fallback_id, raw)
+
+
+def _analyze_chunk(items):
+    # JSON parsing happens here, in the worker, rather than in the parent
+    out = []
+    for fallback_id, raw in items:
+        record_id = fallback_id
+        try:
+            record = _load(fallback_id, raw)
+            record_id = record["id"]
+            coaching = analyze_conversation_heuristic(record.get("messages") or [])
+        except Exception as e:
+            # one bad record must not abort the run (or every resume of it)
+            out.append({"id": record_id, "error": f"{type(e).__name__}: {e}"})
+            continue
+        coaching.pop("transcript", None)
+        out.append({"id": record_id, **coaching})
+    return out
+
+
+def _chunks(records, size):
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def analyze_transcripts(records, workers=None, chunk_size=CHUNK_SIZE):
+    """Yield result chunks (lists of dicts) in input order.
+
+    records are transcript dicts, or (fallback_id, raw JSON text) pairs as read
+    from disk. At most 2 * workers chunks are in flight, so memory stays
+    bounded however large the input is.
+    """
+    workers = workers or os.cpu_count() or 1
+    items = (r if isinstance(r, tuple) else (None, r) for r in records)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = []
+        for chunk in _chunks(items, chunk_size):
+            pending.append(pool.submit(_analyze_chunk, chunk))
+            if len(pending) >= 2 * workers:
+                yield pending.pop(0).result()
+        for fut in pending:
+            yield fut.result()
+
+
+class _JsonlSink:
+    def __init__(self, path, state):
+        mode = "r+" if state and os.path.exists(path) else "w"
+        self.f = open(path, mode, encoding="utf-8")
+        if state:
+            # drop anything written after the last checkpoint
+            self.f.seek(state.get("output_bytes", 0))
+            self.f.truncate()
+
+    def write(self, results):
+        for r in results:
+            self.f.write(json.dumps(r) + "\n")
+        self.f.flush()
+        return {"output_bytes": self.f.tell()}
+
+    def close(self):
+        self.f.close()
+
+
+class _ParquetSink:
+    def __init__(self, path, state):
+        import pyarrow  # noqa: F401  (fail early if the optional dependency is missing)
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.part = state.get("parts", 0) if state else 0
+        for name in os.listdir(path):
+            if name.startswith("part-") and int(name[5:10]) >= self.part:
+                os.remove(os.path.join(path, name))
+
+    def write(self, results):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        columns = {"id": [r["id"] for r in results], "error": [r.get("error") for r in results]}
+        for key in SCORE_KEYS:
+            columns[key] = [r["scores"][key] if "scores" in r else None for r in results]
+        for key in ("improvements", "missed_facts_examples", "rewrites"):
+            columns[key] = [json.dumps(r[key]) if key in r else None for r in results]
+        pq.write_table(pa.table(columns), os.path.join(self.path, f"part-{self.part:05d}.parquet"))
+        self.part += 1
+        return {"parts": self.part}
+
+    def close(self):
+        pass
+
+
+def _checkpoint_path(output):
+    return output.rstrip("/\\") + ".ckpt"
+
+
+def _save_checkpoint(path, state):
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp, path)
+
+
+def run_batch(input_path, output_path, fmt="jsonl", workers=None, resume=False, chunk_size=CHUNK_SIZE):
+    """Score every transcript under input_path into output_path and return a throughput report."""
+    workers = workers or os.cpu_count() or 1
+    ckpt = _checkpoint_path(output_path)
+    state = None
+    if resume and os.path.exists(ckpt):
+        with open(ckpt) as f:
+            state = json.load(f)
+    done = state["done"] if state else 0
+    sink = (_ParquetSink if fmt == "parquet" else _JsonlSink)(output_path, state)
+
+    records = _iter_raw(input_path)
+    for _ in range(done):
+        next(records, None)
+
+    processed = errors = 0
+    t0 = time.perf_counter()
+    try:
+        for results in analyze_transcripts(records, workers=workers, chunk_size=chunk_size):
+            progress = sink.write(results)
+            processed += len(results)
+            errors += sum(1 for r in results if "error" in r)
+            _save_checkpoint(ckpt, {"done": done + processed, **progress})
+    finally:
+        sink.close()
+    elapsed = time.perf_counter() - t0
+    rate = processed / elapsed if elapsed > 0 else 0.0
+    return {
+        "processed": processed,
+        "errors": errors,
+        "skipped": done,
+        "seconds": round(elapsed, 3),
+        "workers": workers,
+        "transcripts_per_second": round(rate, 1),
+        "transcripts_per_second_per_core": round(rate / workers, 1),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m batch", description="Re-score stored transcripts with the heuristic coach.")
+    parser.add_argument("input", help="JSONL file or directory of .json/.jsonl transcripts")
+    parser.add_argument("output", help="output JSONL file (or directory for --format parquet)")
+    parser.add_argument("--format", choices=("jsonl", "parquet"), default="jsonl")
+    parser.add_argument("--workers", type=int, default=None, help="process pool size (default: CPU count)")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--resume", action="store_true", help="continue from the last checkpoint")
+    args = parser.parse_args(argv)
+    report = run_batch(args.input, args.output, fmt=args.format, workers=args.workers,
+                       resume=args.resume, chunk_size=args.chunk_size)
+    print(json.dumps(report), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
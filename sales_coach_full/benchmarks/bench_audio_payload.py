@@ -0,0 +1,66 @@
+"""Bytes on the wire and server CPU per turn: base64-in-JSON vs binary multipart.
+
+Renders the same turn (transcript, reply text, WAV audio of increasing length)
+both ways, exactly as the routes do, and reports response size and CPU time.
+
+    python benchmarks/bench_audio_payload.py --seconds 1 5 20
+"""
+import argparse, asyncio, base64, os, sys, time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from fastapi.responses import JSONResponse
+from audio_response import multipart_audio_response
+
+SAMPLE_RATE = 24000  # 16-bit mono, what Waves returns by default
+
+
+def fake_wav(seconds):
+    return b'RIFF' + os.urandom(int(seconds * SAMPLE_RATE * 2))
+
+
+def render_json(metadata, audio):
+    body = {**metadata, "tts_base64": base64.b64encode(audio).decode('utf-8')}
+    return len(JSONResponse(body).body)
+
+
+async def _drain(response):
+    n = 0
+    async for chunk in response.body_iterator:
+        n += len(chunk)
+    return n
+
+
+def render_binary(metadata, audio):
+    return asyncio.run(_drain(multipart_audio_response(metadata, audio)))
+
+
+def measure(fn, metadata, audio, repeat):
+    best = float('inf')
+    size = 0
+    for _ in range(repeat):
+        t0 = time.process_time()
+        size = fn(metadata, audio)
+        best = min(best, time.process_time() - t0)
+    return size, best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--seconds', type=float, nargs='+', default=[1, 5, 20])
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args(argv)
+    metadata = {"transcript": "what is the battery range", "reply_text": "What's the actual range?"}
+    print(f"{'audio s':>8} {'raw KB':>9} {'json KB':>9} {'binary KB':>10} {'json ms':>9} {'binary ms':>10}")
+    for seconds in args.seconds:
+        audio = fake_wav(seconds)
+        json_size, json_cpu = measure(render_json, metadata, audio, args.repeat)
+        bin_size, bin_cpu = measure(render_binary, metadata, audio, args.repeat)
+        print(f"{seconds:>8.1f} {len(audio) / 1024:>9.0f} {json_size / 1024:>9.0f} {bin_size / 1024:>10.0f} "
+              f"{json_cpu * 1000:>9.2f} {bin_cpu * 1000:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
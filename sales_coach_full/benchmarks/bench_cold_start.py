@@ -0,0 +1,134 @@
+"""Worker cold start: app import time, time to first request and time to ready.
+
+Each run starts a fresh child process that imports app.main and serves it with
+uvicorn, while the parent polls GET /health (first answered request) and
+GET /ready (provider clients built) and measures from process spawn. A
+stand-in `smallestai` package is put on PYTHONPATH whose import sleeps
+--sdk-import-ms, since the real SDK's import is the slow part and is
+usually not installed where this runs.
+
+--mode eager repeats the runs with provider clients and numpy loaded before
+uvicorn starts, which is what importing the app used to do.
+
+    python benchmarks/bench_cold_start.py --runs 5
+    python benchmarks/bench_cold_start.py --sdk-import-ms 1500 --mode lazy
+"""
+import argparse, json, os, subprocess, sys, tempfile, time, urllib.request
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_voice_load import _percentile  # noqa: E402
+
+STAND_IN_SDK = {
+    'smallestai/__init__.py': 'import os, time\ntime.sleep(float(os.environ.get("BENCH_SDK_IMPORT_MS", "0")) / 1000.0)\n',
+    'smallestai/atoms/__init__.py': '',
+    'smallestai/atoms/configuration.py': (
+        'class Configuration:\n'
+        '    def __init__(self, access_token=None):\n'
+        '        self.access_token = access_token\n'),
+    'smallestai/atoms/atoms_client.py': (
+        'import types, uuid\n'
+        'class AtomsClient:\n'
+        '    def __init__(self, configuration=None):\n'
+        '        pass\n'
+        '    def create_agent(self, req):\n'
+        '        return types.SimpleNamespace(id="agent_" + uuid.uuid4().hex[:8])\n'
+        '    def get_agent_by_id(self, id):\n'
+        '        return {"id": id}\n'
+        '    def delete_agent(self, id):\n'
+        '        pass\n'),
+    'smallestai/atoms/models/__init__.py': '',
+    'smallestai/atoms/models/create_agent_request.py': (
+        'class CreateAgentRequest:\n'
+        '    def __init__(self, name, global_prompt):\n'
+        '        self.name, self.global_prompt = name, global_prompt\n'),
+    'smallestai/waves/__init__.py': '',
+    'smallestai/waves/waves_client.py': (
+        'class WavesClient:\n'
+        '    def __init__(self, api_key=None):\n'
+        '        pass\n'
+        '    def synthesize(self, text, voice_id=None, **params):\n'
+        '        return b"RIFF" + b"\\x00" * 1600\n'),
+}
+
+
+def write_stand_in_sdk(root):
+    for rel, source in STAND_IN_SDK.items():
+        path = os.path.join(root, rel)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+            f.write(source)
+
+
+def serve(port, mode):
+    """Child process: import the app (timed), optionally load providers eagerly, then serve."""
+    t0 = time.perf_counter()
+    import app.main as main
+    imported = time.perf_counter() - t0
+    if mode == 'eager':
+        main.smallest.init_clients()
+        main.load_numpy()
+        main.get_provider('deepgram').session
+    print(json.dumps({'import_s': imported}), flush=True)
+    import uvicorn
+    uvicorn.run(main.app, host='127.0.0.1', port=port, log_level='warning')
+
+
+def _wait_for(url, deadline):
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=1) as resp:
+                if resp.status == 200:
+                    return time.monotonic()
+        except Exception:
+            pass
+        time.sleep(0.005)
+    return None
+
+
+def run_once(mode, port, env):
+    started = time.monotonic()
+    child = subprocess.Popen([sys.executable, __file__, '--serve', str(port), '--mode', mode],
+                             env=env, stdout=subprocess.PIPE, text=True)
+    try:
+        deadline = started + 60
+        first = _wait_for(f'http://127.0.0.1:{port}/health', deadline)
+        ready = _wait_for(f'http://127.0.0.1:{port}/ready', deadline)
+        imported = json.loads(child.stdout.readline())['import_s']
+        return imported, first - started, ready - started
+    finally:
+        child.terminate()
+        child.wait()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--sdk-import-ms', type=float, default=800.0, help='simulated smallestai import time')
+    parser.add_argument('--mode', choices=['lazy', 'eager', 'both'], default='both')
+    parser.add_argument('--serve', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    if args.serve:
+        return serve(args.serve, args.mode)
+
+    sdk_dir = tempfile.mkdtemp(prefix='bench-sdk-')
+    write_stand_in_sdk(sdk_dir)
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([sdk_dir, ROOT]), BENCH_SDK_IMPORT_MS=str(args.sdk_import_ms),
+               SMALLEST_API_KEY='bench', DEEPGRAM_API_KEY='bench', AGENT_WARMUP='0', TTS_WARMUP='0')
+    env.pop('OPENAI_API_KEY', None)
+    env.pop('PROVIDER_MODE', None)
+    print(f"{args.runs} cold starts per mode, simulated SDK import {args.sdk_import_ms:.0f} ms")
+    print(f"{'mode':<8}{'import p50':>12}{'first req p50':>15}{'first req max':>15}{'ready p50':>11}")
+    port = 19000 + os.getpid() % 1000
+    for mode in (['lazy', 'eager'] if args.mode == 'both' else [args.mode]):
+        rows = [run_once(mode, port + i, env) for i in range(args.runs)]
+        imports, firsts, readies = (sorted(col) for col in zip(*rows))
+        print(f"{mode:<8}{_percentile(imports, 50) * 1000:>10.0f}ms{_percentile(firsts, 50) * 1000:>13.0f}ms"
+              f"{max(firsts) * 1000:>13.0f}ms{_percentile(readies, 50) * 1000:>9.0f}ms")
+
+
+if __name__ == '__main__':
+    main()
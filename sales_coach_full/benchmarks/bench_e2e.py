@@ -0,0 +1,377 @@
+"""End-to-end load and latency benchmark for the FastAPI app.
+
+Starts in-process stand-ins for Deepgram (STT), Smallest Waves (TTS), Smallest
+Atoms (agents) and OpenAI (chat completions), each with a log-normal latency
+distribution, then drives the app with a mix of sessions:
+
+    create -> N turns (/voice, /message or /upload_audio) -> live_score -> end
+
+It reports throughput and p50/p95/p99 per route, then measures memory per
+open session in a separate tracemalloc pass (so tracing does not skew the
+latencies). --check compares the run against e2e_thresholds.json and exits 1
+on a regression.
+
+    python benchmarks/bench_e2e.py --sessions 200 --concurrency 50 --turns 4
+    python benchmarks/bench_e2e.py --mix voice=1 --stt-ms 300 --check
+    python benchmarks/bench_e2e.py --json report.json
+    python benchmarks/bench_e2e.py --offline      # PROVIDER_MODE=mock, no stand-in servers
+"""
+import argparse, asyncio, gc, json, math, os, random, sys, threading, time, tracemalloc, types, urllib.request
+from http.server import BaseHTTPRequestHandler
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_voice_load import _start_server, _percentile  # noqa: E402
+
+THRESHOLDS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'e2e_thresholds.json')
+
+REP_LINES = [
+    "Hi, thanks for taking the time today. How are you?",
+    "The battery range is about 400 km and capacity is 75 kWh.",
+    "I understand, price matters. We have a discount this month.",
+    "Delivery takes two weeks and shipping is included.",
+    "The warranty covers eight years with 24/7 support.",
+    "Does that answer your question? Shall we schedule a test drive?",
+]
+
+
+class LatencyModel:
+    """Log-normal latency with the given median (ms) and sigma; sigma=0 is a fixed delay."""
+
+    def __init__(self, median_ms, sigma):
+        self.median_s = median_ms / 1000.0
+        self.sigma = sigma
+        self._rng = random.Random(median_ms)
+        self._lock = threading.Lock()
+
+    def sample(self):
+        if self.sigma <= 0:
+            return self.median_s
+        with self._lock:
+            return self.median_s * math.exp(self._rng.gauss(0.0, self.sigma))
+
+
+def _json_handler(latency, respond):
+    """Handler class that sleeps latency.sample() then answers respond(method, path, body) -> (status, ctype, bytes)."""
+    class StandIn(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def _handle(self):
+            body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+            time.sleep(latency.sample())
+            status, ctype, payload = respond(self.command, self.path, body)
+            self.send_response(status)
+            self.send_header('Content-Type', ctype)
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        do_POST = do_DELETE = _handle
+
+        def log_message(self, *args):
+            pass
+    return StandIn
+
+
+def _deepgram(method, path, body):
+    line = REP_LINES[len(body) % len(REP_LINES)]
+    doc = {'results': {'channels': [{'alternatives': [{'transcript': line}]}]}}
+    return 200, 'application/json', json.dumps(doc).encode()
+
+
+def _waves(method, path, body):
+    # ~16 kB of audio per 10 characters, roughly 16 kHz 16-bit speech
+    return 200, 'audio/wav', b'RIFF' + b'\x00' * (len(body) * 1600)
+
+
+def _atoms(method, path, body):
+    _atoms.n += 1
+    return 200, 'application/json', json.dumps({'id': f'agent_{_atoms.n}'}).encode()
+_atoms.n = 0
+
+
+def _openai(method, path, body):
+    prompt = json.loads(body or b'{}').get('messages', [{}])[-1].get('content', '')
+    analysis = {'scores': {'rapport': 7, 'product_knowledge': 8}, 'improvements': [], 'missed_facts': [], 'rewrites': []}
+    if prompt.startswith('Analyze the following transcript'):
+        content = json.dumps(analysis)
+    elif prompt.startswith('Analyze each of the following'):
+        # batched end-of-session analyses: one entry per "### id: ..." header
+        ids = [line[len('### id: '):].strip() for line in prompt.splitlines() if line.startswith('### id: ')]
+        content = json.dumps({item_id: analysis for item_id in ids})
+    else:
+        content = "What's the final price with everything included?"
+    doc = {'choices': [{'message': {'role': 'assistant', 'content': content}}]}
+    return 200, 'application/json', json.dumps(doc).encode()
+
+
+def _post(url, payload, method='POST'):
+    req = urllib.request.Request(url, data=payload, method=method)
+    with urllib.request.urlopen(req, timeout=60) as resp:
+        return resp.read()
+
+
+def _install_stand_ins(urls):
+    """Register `smallestai` and `openai` modules that talk to the local stand-in servers."""
+    class Configuration:
+        def __init__(self, access_token=None):
+            self.access_token = access_token
+
+    class AtomsClient:
+        def __init__(self, configuration=None):
+            pass
+
+        def create_agent(self, req):
+            doc = json.loads(_post(urls['atoms'] + '/agents', json.dumps({'name': req.name}).encode()))
+            return types.SimpleNamespace(id=doc['id'])
+
+        def delete_agent(self, id):
+            _post(f"{urls['atoms']}/agents/{id}", b'', method='DELETE')
+
+    class WavesClient:
+        def __init__(self, api_key=None):
+            pass
+
+        def synthesize(self, text, voice_id=None):
+            return _post(urls['waves'] + '/tts', text.encode('utf-8'))
+
+    class CreateAgentRequest:
+        def __init__(self, name, global_prompt):
+            self.name, self.global_prompt = name, global_prompt
+
+    class ChatCompletion:
+        @staticmethod
+        def create(**kwargs):
+            return json.loads(_post(urls['openai'] + '/v1/chat/completions', json.dumps(kwargs).encode()))
+
+    modules = {
+        'smallestai': {},
+        'smallestai.atoms': {},
+        'smallestai.atoms.atoms_client': {'AtomsClient': AtomsClient},
+        'smallestai.atoms.configuration': {'Configuration': Configuration},
+        'smallestai.atoms.models': {},
+        'smallestai.atoms.models.create_agent_request': {'CreateAgentRequest': CreateAgentRequest},
+        'smallestai.waves': {},
+        'smallestai.waves.waves_client': {'WavesClient': WavesClient},
+        'openai': {'ChatCompletion': ChatCompletion, 'api_key': None},
+    }
+    for name, attrs in modules.items():
+        mod = types.ModuleType(name)
+        mod.__dict__.update(attrs)
+        sys.modules[name] = mod
+
+
+def _parse_mix(raw):
+    mix = {}
+    for part in raw.split(','):
+        kind, _, weight = part.partition('=')
+        if kind not in ('voice', 'text', 'upload'):
+            raise SystemExit(f"unknown session kind in --mix: {kind}")
+        mix[kind] = float(weight or 1)
+    return mix
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = {}
+        self.errors = {}
+
+    async def call(self, route, send):
+        t0 = time.perf_counter()
+        resp = await send()
+        self.latencies.setdefault(route, []).append(time.perf_counter() - t0)
+        if resp.status_code >= 400:
+            self.errors[route] = self.errors.get(route, 0) + 1
+        return resp
+
+
+async def _session(client, rec, kind, persona, turns, rng, end=True):
+    r = await rec.call('POST /sessions', lambda: client.post('/sessions', json={'persona_key': persona}))
+    sid = r.json()['session_id']
+    for i in range(turns):
+        audio = b'RIFF' + b'\x00' * rng.randint(16000, 64000)
+        if kind == 'voice':
+            await rec.call('POST /voice/{session_id}', lambda: client.post(
+                f'/voice/{sid}', files={'file': ('turn.wav', audio, 'audio/wav')}))
+        elif kind == 'upload':
+            await rec.call('POST /sessions/{session_id}/upload_audio', lambda: client.post(
+                f'/sessions/{sid}/upload_audio', files={'file': ('turn.wav', audio, 'audio/wav')}))
+        else:
+            text = REP_LINES[(i + rng.randrange(len(REP_LINES))) % len(REP_LINES)]
+            await rec.call('POST /sessions/{session_id}/message', lambda: client.post(
+                f'/sessions/{sid}/message', json={'text': text}))
+    await rec.call('GET /sessions/{session_id}/live_score', lambda: client.get(f'/sessions/{sid}/live_score'))
+    if end:
+        await rec.call('POST /sessions/{session_id}/end', lambda: client.post(f'/sessions/{sid}/end'))
+    return sid
+
+
+def _plan(args, personas):
+    rng = random.Random(args.seed)
+    mix = _parse_mix(args.mix)
+    kinds, weights = list(mix), list(mix.values())
+    return [(rng.choices(kinds, weights)[0], personas[i % len(personas)], random.Random(args.seed + i))
+            for i in range(args.sessions)]
+
+
+async def _run_load(app, args, personas):
+    import httpx
+    rec = Recorder()
+    gate = asyncio.Semaphore(args.concurrency)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url='http://bench', timeout=300) as client:
+        async def one(kind, persona, rng):
+            async with gate:
+                await _session(client, rec, kind, persona, args.turns, rng)
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*(one(*p) for p in _plan(args, personas)))
+        wall = time.perf_counter() - t0
+    return rec, wall
+
+
+def _measure_memory(session_mgr, args, personas):
+    """Bytes retained per open session (store entry, message log, running analysis).
+
+    Sessions are driven straight through the SessionManager with the same turn
+    shape as the load run; tracing the whole HTTP stack under load is ~20x
+    slower and only adds transient request buffers.
+    """
+    customer = "What's the final price with everything included?"
+    plan = [personas[i % len(personas)] for i in range(args.memory_sessions)]
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    sids = []
+    for n, persona in enumerate(plan):
+        sid, _ = session_mgr.create_session(persona)
+        for i in range(args.turns):
+            # fresh strings, as real transcripts never share text between sessions
+            session_mgr.append_message(sid, 'rep', f"{REP_LINES[(n + i) % len(REP_LINES)]} ({n}.{i})")
+            session_mgr.append_message(sid, 'customer', f"{customer} ({n}.{i})")
+        session_mgr.live_scores(sid)
+        sids.append(sid)
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    for sid in sids:
+        session_mgr.sessions.delete(sid)
+        session_mgr.live.pop(sid, None)
+    return (after - before) / max(1, len(plan))
+
+
+def _report(rec, wall, bytes_per_session, args):
+    routes = {}
+    for route, values in sorted(rec.latencies.items()):
+        routes[route] = {
+            'count': len(values),
+            'errors': rec.errors.get(route, 0),
+            'rps': round(len(values) / wall, 2),
+            'p50_ms': round(_percentile(values, 50) * 1000, 1),
+            'p95_ms': round(_percentile(values, 95) * 1000, 1),
+            'p99_ms': round(_percentile(values, 99) * 1000, 1),
+        }
+    return {
+        'config': {k: getattr(args, k) for k in ('sessions', 'concurrency', 'turns', 'mix', 'stt_ms', 'tts_ms',
+                                                 'atoms_ms', 'openai_ms', 'sigma', 'openai')},
+        'wall_s': round(wall, 3),
+        'sessions_per_s': round(args.sessions / wall, 2),
+        'turns_per_s': round(args.sessions * args.turns / wall, 2),
+        'bytes_per_session': round(bytes_per_session),
+        'routes': routes,
+    }
+
+
+def check_thresholds(report, thresholds):
+    """List of human-readable threshold violations (empty when the run passes)."""
+    failures = []
+    if report['sessions_per_s'] < thresholds.get('min_sessions_per_s', 0):
+        failures.append(f"sessions_per_s {report['sessions_per_s']} < {thresholds['min_sessions_per_s']}")
+    if report['bytes_per_session'] > thresholds.get('max_bytes_per_session', float('inf')):
+        failures.append(f"bytes_per_session {report['bytes_per_session']} > {thresholds['max_bytes_per_session']}")
+    for route, limits in thresholds.get('routes', {}).items():
+        stats = report['routes'].get(route)
+        if stats is None:
+            continue
+        if stats['errors']:
+            failures.append(f"{route}: {stats['errors']} error responses")
+        for key, limit in limits.items():
+            if stats[key] > limit:
+                failures.append(f"{route}: {key} {stats[key]} > {limit}")
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sessions', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=50, help='sessions in flight at once')
+    parser.add_argument('--turns', type=int, default=4)
+    parser.add_argument('--mix', default='voice=0.6,text=0.3,upload=0.1')
+    parser.add_argument('--stt-ms', type=float, default=200.0)
+    parser.add_argument('--tts-ms', type=float, default=80.0)
+    parser.add_argument('--atoms-ms', type=float, default=150.0)
+    parser.add_argument('--openai-ms', type=float, default=350.0)
+    parser.add_argument('--sigma', type=float, default=0.25, help='log-normal sigma for every stand-in')
+    parser.add_argument('--no-openai', dest='openai', action='store_false', help='leave OPENAI_API_KEY unset (heuristic replies)')
+    parser.add_argument('--offline', action='store_true',
+                        help='use PROVIDER_MODE=mock instead of stand-in servers (MOCK_LATENCY_MS sets the delay)')
+    parser.add_argument('--memory-sessions', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--json', help='write the report to this path')
+    parser.add_argument('--check', action='store_true', help='exit 1 when e2e_thresholds.json is exceeded')
+    parser.add_argument('--thresholds', default=THRESHOLDS_PATH)
+    args = parser.parse_args(argv)
+
+    if args.offline:
+        os.environ['PROVIDER_MODE'] = 'mock'
+        args.openai = False
+    else:
+        urls = {}
+        for name, median, respond in (('deepgram', args.stt_ms, _deepgram), ('waves', args.tts_ms, _waves),
+                                      ('atoms', args.atoms_ms, _atoms), ('openai', args.openai_ms, _openai)):
+            _, urls[name] = _start_server(_json_handler(LatencyModel(median, args.sigma), respond))
+        os.environ['DEEPGRAM_URL'] = urls['deepgram'] + '/v1/listen'
+        os.environ.setdefault('DEEPGRAM_API_KEY', 'bench')
+        os.environ.setdefault('SMALLEST_API_KEY', 'bench')
+        _install_stand_ins(urls)
+    os.environ.setdefault('TTS_WARMUP', '0')
+    if args.openai:
+        os.environ.setdefault('OPENAI_API_KEY', 'bench')
+    else:
+        os.environ.pop('OPENAI_API_KEY', None)
+    for name in ('DEEPGRAM', 'SMALLEST', 'OPENAI'):
+        os.environ.setdefault(f'{name}_MAX_CONCURRENCY', str(max(args.concurrency, 16)))
+
+    from app.main import app, session_mgr
+    from personas import PERSONAS
+
+    personas = list(PERSONAS)
+    rec, wall = asyncio.run(_run_load(app, args, personas))
+    bytes_per_session = _measure_memory(session_mgr, args, personas) if args.memory_sessions else 0
+    report = _report(rec, wall, bytes_per_session, args)
+
+    print(f"sessions: {args.sessions} ({args.concurrency} in flight, {args.turns} turns, mix {args.mix}, "
+          f"openai {'on' if args.openai else 'off'}{', offline' if args.offline else ''})")
+    print(f"throughput: {report['sessions_per_s']} sessions/s, {report['turns_per_s']} turns/s, wall {report['wall_s']} s")
+    print(f"memory    : {report['bytes_per_session'] / 1024:.1f} KiB per active session")
+    print(f"{'route':<42}{'n':>6}{'err':>5}{'rps':>8}{'p50':>9}{'p95':>9}{'p99':>9}")
+    for route, s in report['routes'].items():
+        print(f"{route:<42}{s['count']:>6}{s['errors']:>5}{s['rps']:>8}{s['p50_ms']:>9}{s['p95_ms']:>9}{s['p99_ms']:>9}")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.check:
+        with open(args.thresholds) as f:
+            failures = check_thresholds(report, json.load(f))
+        for failure in failures:
+            print('REGRESSION', failure)
+        if failures:
+            sys.exit(1)
+        print('thresholds: ok')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+"""Scaling benchmark for analyze_conversation_heuristic.
+
+Times the heuristic on synthetic transcripts of increasing length; per-turn
+cost should stay flat (linear scaling) up to 10k turns.
+
+    python benchmarks/bench_heuristic.py --sizes 1000 2500 5000 10000
+"""
+import argparse, os, random, sys, time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from analysis_heuristic import analyze_conversation_heuristic
+
+REP_LINES = [
+    "I understand, the battery gives you about 400 km of range.",
+    "Would you like to book a test drive this weekend?",
+    "We offer a two year warranty and a free trial.",
+    "The processor benchmark is well ahead of the competition.",
+    "Sounds like price matters most, we can price match.",
+]
+CUSTOMER_LINES = [
+    "I'm not sure, it seems too expensive.",
+    "What is the real range in winter?",
+    "How many years of support do I get?",
+    "Maybe, I'll think about it.",
+    "Okay, tell me more.",
+]
+
+
+def make_transcript(turns, seed=0):
+    rng = random.Random(seed)
+    return [
+        {"role": "rep", "text": rng.choice(REP_LINES)} if i % 2 == 0 else {"role": "customer", "text": rng.choice(CUSTOMER_LINES)}
+        for i in range(turns)
+    ]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 2500, 5000, 10000])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args(argv)
+
+    print(f"{'turns':>8} {'best ms':>10} {'us/turn':>10}")
+    for n in args.sizes:
+        messages = make_transcript(n)
+        best = float('inf')
+        for _ in range(args.repeat):
+            t0 = time.perf_counter()
+            analyze_conversation_heuristic(messages)
+            best = min(best, time.perf_counter() - t0)
+        print(f"{n:>8} {best * 1000:>10.1f} {best / n * 1e6:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
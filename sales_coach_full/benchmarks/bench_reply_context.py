@@ -0,0 +1,145 @@
+"""Reply prompt size, build cost and fact recall across context budgets.
+
+Replays recorded sessions turn by turn (the JSONL / directory format
+`python -m batch` reads: {"messages": [{role, text}]}), building the OpenAI
+reply prompt before every customer turn, for several REPLY_CONTEXT_TOKENS
+budgets plus the old "last rep line only" prompt and the full history.
+
+Per budget it reports mean/max prompt tokens, prompt build time, an estimated
+OpenAI latency (--base-ms + --ms-per-1k-tokens per prompt) and fact recall:
+the share of numbers the rep stated earlier in the call that are still
+visible in the prompt. Without a corpus, long synthetic calls are generated.
+With --live and OPENAI_API_KEY set, real replies are requested for the last
+turn of the first session at each budget and timed.
+
+    python benchmarks/bench_reply_context.py --turns 80
+    python benchmarks/bench_reply_context.py --sessions transcripts.jsonl --budgets 300 800 1500
+"""
+import argparse, os, random, re, sys, time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from batch import iter_transcripts
+from context import ContextWindow, build_reply_prompt, estimate_tokens, system_prefix
+
+_NUMBER_RE = re.compile(r"\d[\d,.]*")
+
+REP_FACTS = [
+    "The battery is {n} mAh and lasts about two days.",
+    "Range is {n} km on a full charge.",
+    "We can offer a {n} percent discount this month.",
+    "Delivery takes {n} days and shipping is included.",
+    "The warranty runs {n} months with 24/7 support.",
+]
+REP_FILLER = ["I understand, that's a fair question.", "Let me explain how that works for you.",
+              "Many of our customers felt the same way at first."]
+CUSTOMER_LINES = ["What's the final price?", "How long does the battery last?", "Is shipping included?",
+                  "I'm not sure yet.", "Do you have any proof?", "What's the warranty?"]
+
+
+def synthetic_sessions(count, turns, seed):
+    rng = random.Random(seed)
+    for s in range(count):
+        messages = []
+        for _ in range(turns):
+            text = rng.choice(REP_FACTS).format(n=rng.randint(10, 9000))
+            if rng.random() < 0.5:
+                text = rng.choice(REP_FILLER) + " " + text
+            messages.append({"role": "rep", "text": text})
+            messages.append({"role": "customer", "text": rng.choice(CUSTOMER_LINES)})
+        yield {"id": f"synthetic-{s}", "messages": messages}
+
+
+def last_line_prompt(messages, persona_prompt):
+    """The pre-window prompt: only the latest rep line."""
+    last_rep = next((m["text"] for m in reversed(messages) if m["role"] == "rep"), "")
+    return [system_prefix(persona_prompt), {"role": "user", "content": last_rep}]
+
+
+def full_prompt(messages, persona_prompt):
+    return build_reply_prompt(messages, persona_prompt, ContextWindow(max_tokens=10 ** 9))
+
+
+def _rep_numbers(messages):
+    return {n for m in messages if m["role"] == "rep" for n in _NUMBER_RE.findall(m["text"])}
+
+
+def replay(sessions, make_prompt, persona_prompt):
+    """[(prompt tokens, build seconds, fact recall)] for every customer turn of every session."""
+    rows = []
+    for record in sessions:
+        messages = record["messages"]
+        state = make_prompt()
+        for i, m in enumerate(messages):
+            if m["role"] == "rep" or i == 0:
+                continue
+            history = messages[:i]
+            t0 = time.perf_counter()
+            prompt = state(history, persona_prompt)
+            elapsed = time.perf_counter() - t0
+            tokens = sum(estimate_tokens(p["content"]) for p in prompt)
+            facts = _rep_numbers(history)
+            visible = " ".join(p["content"] for p in prompt)
+            recall = sum(1 for f in facts if f in visible) / len(facts) if facts else 1.0
+            rows.append((tokens, elapsed, recall))
+    return rows
+
+
+def strategies(budgets):
+    yield "last line", lambda: last_line_prompt
+    for budget in budgets:
+        def make(budget=budget):
+            ctx = ContextWindow(max_tokens=budget)
+            return lambda history, persona: build_reply_prompt(history, persona, ctx)
+        yield f"window {budget}", make
+    yield "full history", lambda: full_prompt
+
+
+def live_replies(record, budgets, persona_prompt):
+    from providers import openai_chat_completion, openai_api_key
+    api_key = openai_api_key()
+    history = record["messages"][:-1]
+    for label, make in strategies(budgets):
+        prompt = make()(history, persona_prompt)
+        t0 = time.perf_counter()
+        resp = openai_chat_completion(api_key, model="gpt-4o-mini", messages=prompt, max_tokens=120, temperature=0.7)
+        text = resp["choices"][0]["message"]["content"].strip()
+        print(f"{label:<14} {(time.perf_counter() - t0) * 1000:7.0f} ms  {text}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", help="recorded sessions (JSONL file or directory, batch format)")
+    parser.add_argument("--count", type=int, default=20, help="synthetic sessions")
+    parser.add_argument("--turns", type=int, default=60, help="rep turns per synthetic session")
+    parser.add_argument("--budgets", type=int, nargs="+", default=[300, 600, 1200])
+    parser.add_argument("--persona", default="You are focused on price and deals. Ask about discounts.")
+    parser.add_argument("--base-ms", type=float, default=300.0, help="modelled OpenAI latency per call")
+    parser.add_argument("--ms-per-1k-tokens", type=float, default=150.0, help="modelled prompt processing cost")
+    parser.add_argument("--seed", type=int, default=5)
+    parser.add_argument("--live", action="store_true", help="also request real replies (needs OPENAI_API_KEY)")
+    args = parser.parse_args(argv)
+
+    if args.sessions:
+        sessions = list(iter_transcripts(args.sessions))
+    else:
+        sessions = list(synthetic_sessions(args.count, args.turns, args.seed))
+    turns = sum(len(r["messages"]) for r in sessions)
+    print(f"sessions: {len(sessions)} ({turns} messages)")
+    print(f"{'prompt':<14}{'mean tok':>9}{'max tok':>9}{'build us':>10}{'est. ms':>9}{'fact recall':>13}")
+    for label, make in strategies(args.budgets):
+        rows = replay(sessions, make, args.persona)
+        tokens = [r[0] for r in rows]
+        mean_tokens = sum(tokens) / len(tokens)
+        build_us = sum(r[1] for r in rows) / len(rows) * 1e6
+        est_ms = args.base_ms + mean_tokens / 1000.0 * args.ms_per_1k_tokens
+        recall = sum(r[2] for r in rows) / len(rows)
+        print(f"{label:<14}{mean_tokens:>9.0f}{max(tokens):>9}{build_us:>10.1f}{est_ms:>9.0f}{recall:>12.0%}")
+    if args.live:
+        live_replies(sessions[0], args.budgets, args.persona)
+
+
+if __name__ == "__main__":
+    main()
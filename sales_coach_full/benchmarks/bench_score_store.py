@@ -0,0 +1,116 @@
+"""Query latency of the columnar score store at a million sessions.
+
+Fills a ScoreStore with --rows synthetic analyses (--reps reps, every
+persona, timestamps over --days days) and times each query --repeat times:
+a rep's daily trend, per-persona percentiles, and the overall and per-metric
+leaderboards, each over all time and over the last 7 days. For comparison,
+the same leaderboard is computed once with a Python loop over per-session
+score dicts, which is what reading session["analysis"] would mean.
+--check exits 1 when any query's p95 is over --budget-ms.
+
+    python benchmarks/bench_score_store.py --rows 1000000
+    python benchmarks/bench_score_store.py --rows 1000000 --path /tmp/scores --check
+"""
+import argparse, os, sys, time
+
+import numpy as np
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_voice_load import _percentile  # noqa: E402
+from personas import PERSONAS  # noqa: E402
+from score_store import ScoreStore, SCORE_KEYS  # noqa: E402
+
+DAY = 86400
+
+
+def fill(store, rows, reps, days, seed):
+    rng = np.random.default_rng(seed)
+    now = time.time()
+    rep_names = np.array([f"rep{i:04d}" for i in range(reps)])
+    # reps differ in skill so the leaderboard has a shape
+    skill = rng.normal(0, 1.5, reps)
+    rep_idx = rng.integers(0, reps, rows)
+    scores = np.clip(np.rint(rng.normal(6, 2, (rows, len(SCORE_KEYS))) + skill[rep_idx, None]), 1, 10).astype(np.uint8)
+    personas = np.array(list(PERSONAS))[rng.integers(0, len(PERSONAS), rows)]
+    ts = np.sort(rng.uniform(now - days * DAY, now, rows))
+    store.extend(rep_names[rep_idx], personas, scores, ts)
+    return rep_names, rep_idx, scores
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+    return samples
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--reps', type=int, default=500)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=11)
+    parser.add_argument('--path', help='also write segments here and time a reload')
+    parser.add_argument('--budget-ms', type=float, default=100.0)
+    parser.add_argument('--check', action='store_true')
+    args = parser.parse_args(argv)
+
+    store = ScoreStore(path=args.path)
+    t0 = time.perf_counter()
+    rep_names, rep_idx, scores = fill(store, args.rows, args.reps, args.days, args.seed)
+    print(f"rows: {store.n:,} ({args.reps} reps, {len(store.personas)} personas), filled in {time.perf_counter() - t0:.2f} s")
+    if args.path:
+        t0 = time.perf_counter()
+        store.close()
+        saved = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        reloaded = ScoreStore(path=args.path)
+        reloaded.leaderboard()
+        print(f"segments: written in {saved:.2f} s, reloaded {reloaded.n:,} rows in {time.perf_counter() - t0:.2f} s")
+
+    week = time.time() - 7 * DAY
+    rep = str(rep_names[0])
+    queries = [
+        ("rep trend (day)", lambda: store.rep_trend(rep, "day")),
+        ("rep trend (week, 90d)", lambda: store.rep_trend(rep, "week", time.time() - 90 * DAY)),
+        ("persona percentiles", lambda: store.persona_percentiles((10, 50, 90))),
+        ("persona percentiles (7d)", lambda: store.persona_percentiles((10, 50, 90), week)),
+        ("leaderboard overall", lambda: store.leaderboard()),
+        ("leaderboard closing (7d)", lambda: store.leaderboard("closing", week)),
+        ("leaderboard per persona", lambda: store.leaderboard(persona=store.personas[0], min_sessions=5)),
+    ]
+    print(f"{'query':<28}{'p50 ms':>9}{'p95 ms':>9}")
+    over = []
+    for label, fn in queries:
+        samples = timed(fn, args.repeat)
+        p50, p95 = _percentile(samples, 50) * 1000, _percentile(samples, 95) * 1000
+        print(f"{label:<28}{p50:>9.2f}{p95:>9.2f}")
+        if p95 > args.budget_ms:
+            over.append(label)
+
+    # the same overall leaderboard from a list of per-session score dicts
+    sessions = [{"rep_id": rep_names[r], "scores": dict(zip(SCORE_KEYS, map(int, s)))}
+                for r, s in zip(rep_idx.tolist(), scores.tolist())]
+    t0 = time.perf_counter()
+    totals = {}
+    for s in sessions:
+        total = totals.setdefault(s["rep_id"], [0, 0.0])
+        total[0] += 1
+        total[1] += sum(s["scores"].values()) / len(SCORE_KEYS)
+    sorted(totals.items(), key=lambda item: -item[1][1] / item[1][0])[:10]
+    print(f"{'python loop leaderboard':<28}{(time.perf_counter() - t0) * 1000:>9.2f}")
+
+    if args.check and over:
+        print(f"over {args.budget_ms:.0f} ms p95: {', '.join(over)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+"""Bytes uploaded and STT latency with and without local VAD trimming.
+
+Runs every recording in a corpus through stt.transcribe_audio_deepgram twice,
+STT_VAD off and on, against a local Deepgram stand-in whose latency models
+upload time (--uplink-mbps) plus processing proportional to audio length
+(--rtf). Without --corpus a synthetic corpus of browser-like recordings is
+generated: 48 kHz stereo / 44.1 kHz / 16 kHz mono, 0.5-4 s of dead air on each
+side, some clips with no speech at all.
+
+    python benchmarks/bench_stt_vad.py --clips 40
+    python benchmarks/bench_stt_vad.py --corpus ~/recordings
+"""
+import argparse, glob, io, json, os, sys, time, wave
+from http.server import BaseHTTPRequestHandler
+
+import numpy as np
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_voice_load import _start_server, _percentile  # noqa: E402
+
+
+def _make_handler(base_s, uplink_bytes_per_s, rtf, received):
+    class DeepgramStandIn(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+            received.append(len(body))
+            seconds = 0.0
+            if body[:4] == b'RIFF':
+                with wave.open(io.BytesIO(body), 'rb') as w:
+                    seconds = w.getnframes() / float(w.getframerate())
+            time.sleep(base_s + len(body) / uplink_bytes_per_s + seconds * rtf)
+            doc = json.dumps({'results': {'channels': [{'alternatives': [{'transcript': 'ok'}]}]}}).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(doc)))
+            self.end_headers()
+            self.wfile.write(doc)
+
+        def log_message(self, *args):
+            pass
+    return DeepgramStandIn
+
+
+def _speech_like(seconds, rate, rng):
+    """Noise shaped by a ~4 Hz syllable envelope, roughly -20 dBFS."""
+    n = int(seconds * rate)
+    t = np.arange(n) / rate
+    envelope = np.clip(np.sin(2 * np.pi * 4.0 * t + rng.uniform(0, np.pi)), 0, None) ** 0.5
+    return 0.25 * envelope * rng.standard_normal(n)
+
+
+def _wav(mono, rate, channels):
+    pcm = (np.clip(np.repeat(mono[:, None], channels, axis=1), -1, 1) * 32767).astype('<i2')
+    buf = io.BytesIO()
+    with wave.open(buf, 'wb') as w:
+        w.setnchannels(channels)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        w.writeframes(pcm.tobytes())
+    return buf.getvalue()
+
+
+def synthetic_corpus(clips, seed):
+    rng = np.random.default_rng(seed)
+    formats = [(48000, 2), (44100, 1), (16000, 1)]
+    corpus = []
+    for i in range(clips):
+        rate, channels = formats[i % len(formats)]
+        speech = 0.0 if i % 10 == 9 else rng.uniform(1.0, 8.0)
+        lead, trail = rng.uniform(0.5, 4.0), rng.uniform(0.5, 4.0)
+        floor = rng.uniform(0.0005, 0.003)
+        mono = np.concatenate([np.zeros(int(lead * rate)), _speech_like(speech, rate, rng), np.zeros(int(trail * rate))])
+        mono = mono + floor * rng.standard_normal(len(mono))
+        corpus.append((f'clip{i:03d}.wav', _wav(mono, rate, channels)))
+    return corpus
+
+
+def run(corpus, vad):
+    import stt
+    stt.STT_VAD = vad
+    latencies, prep = [], []
+    for name, audio in corpus:
+        t0 = time.perf_counter()
+        if vad:
+            stt.preprocess_audio(audio)
+            prep.append(time.perf_counter() - t0)
+            t0 = time.perf_counter()
+        stt.transcribe_audio_deepgram(audio, filename=name)
+        latencies.append(time.perf_counter() - t0)
+    return latencies, prep
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--corpus', help='directory of .wav recordings (default: synthetic corpus)')
+    parser.add_argument('--clips', type=int, default=40)
+    parser.add_argument('--seed', type=int, default=3)
+    parser.add_argument('--base-ms', type=float, default=80.0, help='fixed STT request overhead')
+    parser.add_argument('--uplink-mbps', type=float, default=10.0)
+    parser.add_argument('--rtf', type=float, default=0.05, help='STT seconds of processing per second of audio')
+    args = parser.parse_args(argv)
+
+    if args.corpus:
+        corpus = [(os.path.basename(p), open(p, 'rb').read()) for p in sorted(glob.glob(os.path.join(args.corpus, '*.wav')))]
+    else:
+        corpus = synthetic_corpus(args.clips, args.seed)
+    received = []
+    _, url = _start_server(_make_handler(args.base_ms / 1000.0, args.uplink_mbps * 125000.0, args.rtf, received))
+    os.environ['DEEPGRAM_URL'] = url + '/v1/listen'
+    os.environ.setdefault('DEEPGRAM_API_KEY', 'bench')
+    os.environ['DEEPGRAM_RETRIES'] = '0'
+
+    raw_lat, _ = run(corpus, vad=False)
+    raw_bytes, received[:] = sum(received), []
+    vad_lat, prep = run(corpus, vad=True)
+    sent_bytes, calls = sum(received), len(received)
+
+    total = sum(len(a) for _, a in corpus)
+    print(f"clips          : {len(corpus)} ({total / 1e6:.1f} MB)")
+    print(f"uploaded bytes : {raw_bytes / 1e6:.2f} MB -> {sent_bytes / 1e6:.2f} MB "
+          f"({100.0 * (1 - sent_bytes / max(1, raw_bytes)):.1f}% saved)")
+    print(f"STT calls      : {len(corpus)} -> {calls} ({len(corpus) - calls} all-silence clips skipped)")
+    for label, values in (('latency raw', raw_lat), ('latency vad', vad_lat)):
+        print(f"{label:<15}: mean {np.mean(values) * 1000:.1f} ms, p50 {_percentile(values, 50) * 1000:.1f} ms, "
+              f"p95 {_percentile(values, 95) * 1000:.1f} ms")
+    print(f"preprocessing  : mean {np.mean(prep) * 1000:.2f} ms per clip (included in latency vad)")
+
+
+if __name__ == '__main__':
+    main()
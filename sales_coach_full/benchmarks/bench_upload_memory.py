@@ -0,0 +1,174 @@
+"""Server RSS while many large audio files are uploaded at once.
+
+Starts the app under uvicorn in a child process, with in-process stand-ins
+for Deepgram (reads the request body in 64 kB chunks and discards it),
+Smallest and OpenAI, then uploads --files recordings of --size-mb each to
+/sessions/{id}/upload_audio, --concurrency at a time. Clients stream the
+multipart body from a reused buffer, so only the server's memory grows. The
+child's VmRSS is sampled every 20 ms.
+
+Each run is repeated with the old ingestion (`await file.read()` into a
+bytes object) for comparison; --mode picks one.
+
+    python benchmarks/bench_upload_memory.py --files 16 --concurrency 8 --size-mb 50
+"""
+import argparse, http.client, json, os, subprocess, sys, threading, time
+from http.server import BaseHTTPRequestHandler
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+CHUNK = 1024 * 1024
+BOUNDARY = 'bench-upload-boundary'
+
+
+class DrainingDeepgram(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        remaining = int(self.headers.get('Content-Length') or 0)
+        while remaining > 0:
+            remaining -= len(self.rfile.read(min(remaining, 65536)))
+        doc = json.dumps({'results': {'channels': [{'alternatives': [{'transcript': 'what is the battery range'}]}]}}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(doc)))
+        self.end_headers()
+        self.wfile.write(doc)
+
+    def log_message(self, *args):
+        pass
+
+
+def serve(port, mode):
+    """Child process: stand-ins plus the app on 127.0.0.1:port."""
+    from bench_e2e import LatencyModel, _json_handler, _install_stand_ins, _waves, _atoms, _openai
+    from bench_voice_load import _start_server
+    urls = {'deepgram': _start_server(DrainingDeepgram)[1]}
+    for name, respond in (('waves', _waves), ('atoms', _atoms), ('openai', _openai)):
+        urls[name] = _start_server(_json_handler(LatencyModel(5, 0), respond))[1]
+    _install_stand_ins(urls)
+    os.environ['DEEPGRAM_URL'] = urls['deepgram'] + '/v1/listen'
+    os.environ.update(DEEPGRAM_API_KEY='bench', SMALLEST_API_KEY='bench', AGENT_WARMUP='0', TTS_WARMUP='0')
+    os.environ.pop('OPENAI_API_KEY', None)
+    import uvicorn
+    import app.main as main
+    if mode == 'buffered':
+        async def read_whole(file):
+            return await file.read()
+        main.read_upload = read_whole
+    uvicorn.run(main.app, host='127.0.0.1', port=port, log_level='warning')
+
+
+def _rss_mb(pid):
+    with open(f'/proc/{pid}/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1]) / 1024.0
+    return 0.0
+
+
+def _request(port, method, path, body=b'', headers=None):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=300)
+    conn.request(method, path, body=body, headers=headers or {})
+    resp = conn.getresponse()
+    data = resp.read()
+    conn.close()
+    return resp.status, data
+
+
+def upload(port, session_id, size):
+    head = (f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="file"; filename="call.webm"\r\n'
+            'Content-Type: audio/webm\r\n\r\n').encode()
+    tail = f'\r\n--{BOUNDARY}--\r\n'.encode()
+    chunk = b'\x1aE\xdf\xa3' + b'\x00' * (CHUNK - 4)
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=300)
+    conn.putrequest('POST', f'/sessions/{session_id}/upload_audio?audio=binary')
+    conn.putheader('Content-Type', f'multipart/form-data; boundary={BOUNDARY}')
+    conn.putheader('Content-Length', str(len(head) + size + len(tail)))
+    conn.endheaders()
+    conn.send(head)
+    sent = 0
+    while sent < size:
+        piece = chunk[:min(CHUNK, size - sent)]
+        conn.send(piece)
+        sent += len(piece)
+    conn.send(tail)
+    status = conn.getresponse().status
+    conn.close()
+    return status
+
+
+def run(mode, args):
+    port = 18000 + os.getpid() % 1000 + (1 if mode == 'buffered' else 0)
+    env = dict(os.environ, UPLOAD_MAX_BYTES=str((args.size_mb + 1) * 1024 * 1024))
+    child = subprocess.Popen([sys.executable, __file__, '--serve', str(port), '--mode', mode], env=env)
+    try:
+        for _ in range(200):
+            try:
+                _request(port, 'GET', '/personas')
+                break
+            except OSError:
+                time.sleep(0.1)
+        persona_key = json.loads(_request(port, 'GET', '/personas')[1])['personas'][0]['key']
+        sessions = [json.loads(_request(port, 'POST', '/sessions', json.dumps({'persona_key': persona_key}).encode(),
+                                        {'Content-Type': 'application/json'})[1])['session_id']
+                    for _ in range(args.files)]
+        idle = _rss_mb(child.pid)
+        peak = [idle]
+        done = threading.Event()
+
+        def sample():
+            while not done.is_set():
+                peak[0] = max(peak[0], _rss_mb(child.pid))
+                time.sleep(0.02)
+        sampler = threading.Thread(target=sample, daemon=True)
+        sampler.start()
+
+        statuses = []
+        pending = list(sessions)
+        lock = threading.Lock()
+
+        def worker():
+            while True:
+                with lock:
+                    if not pending:
+                        return
+                    sid = pending.pop()
+                statuses.append(upload(port, sid, args.size_mb * 1024 * 1024))
+        t0 = time.perf_counter()
+        workers = [threading.Thread(target=worker) for _ in range(args.concurrency)]
+        for w in workers:
+            w.start()
+        for w in workers:
+            w.join()
+        elapsed = time.perf_counter() - t0
+        done.set()
+        sampler.join()
+        ok = sum(1 for s in statuses if s == 200)
+        print(f"{mode:<10} uploads {ok}/{len(statuses)} ok in {elapsed:5.1f} s  "
+              f"RSS idle {idle:6.1f} MB  peak {peak[0]:6.1f} MB  growth {peak[0] - idle:6.1f} MB")
+    finally:
+        child.terminate()
+        child.wait()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--files', type=int, default=16)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--size-mb', type=int, default=50)
+    parser.add_argument('--mode', choices=['streaming', 'buffered', 'both'], default='both')
+    parser.add_argument('--serve', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    if args.serve:
+        return serve(args.serve, args.mode)
+    print(f"{args.files} uploads of {args.size_mb} MB, {args.concurrency} concurrent")
+    for mode in (['streaming', 'buffered'] if args.mode == 'both' else [args.mode]):
+        run(mode, args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,169 @@
+"""Load benchmark for the /voice/{session_id} pipeline.
+
+Runs local stand-in STT (Deepgram-shaped) and TTS (Waves-shaped) HTTP servers
+with fixed latency, then fires N concurrent voice exchanges at the FastAPI app
+in a single event loop and reports p50/p99 latency.
+
+    python benchmarks/bench_voice_load.py --concurrency 120 --stt-ms 200 --tts-ms 80
+"""
+import argparse, asyncio, json, os, sys, threading, time, types, urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+
+def _start_server(handler_cls):
+    server = _Server(('127.0.0.1', 0), handler_cls)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def _make_stt_handler(latency_s):
+    class DeepgramStandIn(BaseHTTPRequestHandler):
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get('Content-Length') or 0))
+            time.sleep(latency_s)
+            body = json.dumps({'results': {'channels': [{'alternatives': [{'transcript': 'what is the battery range'}]}]}}).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+    return DeepgramStandIn
+
+
+def _make_tts_handler(latency_s):
+    class WavesStandIn(BaseHTTPRequestHandler):
+        def do_POST(self):
+            n = int(self.headers.get('Content-Length') or 0)
+            text = self.rfile.read(n)
+            time.sleep(latency_s)
+            body = b'\x00' * (len(text) * 200)
+            self.send_response(200)
+            self.send_header('Content-Type', 'audio/wav')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+    return WavesStandIn
+
+
+def _install_sdk_stand_in(tts_url):
+    """Register minimal `smallestai` modules whose Waves client talks to the local TTS server."""
+    class Configuration:
+        def __init__(self, access_token=None):
+            self.access_token = access_token
+
+    class AtomsClient:
+        def __init__(self, configuration=None):
+            self._n = 0
+
+        def create_agent(self, req):
+            self._n += 1
+            return types.SimpleNamespace(id=f"agent_{self._n}")
+
+        def delete_agent(self, id):
+            return None
+
+    class WavesClient:
+        def __init__(self, api_key=None):
+            self.api_key = api_key
+
+        def synthesize(self, text, voice_id=None):
+            req = urllib.request.Request(tts_url, data=text.encode('utf-8'), method='POST')
+            with urllib.request.urlopen(req, timeout=30) as resp:
+                return resp.read()
+
+    class CreateAgentRequest:
+        def __init__(self, name, global_prompt):
+            self.name, self.global_prompt = name, global_prompt
+
+    modules = {
+        'smallestai': {},
+        'smallestai.atoms': {},
+        'smallestai.atoms.atoms_client': {'AtomsClient': AtomsClient},
+        'smallestai.atoms.configuration': {'Configuration': Configuration},
+        'smallestai.atoms.models': {},
+        'smallestai.atoms.models.create_agent_request': {'CreateAgentRequest': CreateAgentRequest},
+        'smallestai.waves': {},
+        'smallestai.waves.waves_client': {'WavesClient': WavesClient},
+    }
+    for name, attrs in modules.items():
+        mod = types.ModuleType(name)
+        mod.__dict__.update(attrs)
+        sys.modules[name] = mod
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    idx = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+async def _run(app, concurrency, personas):
+    import httpx
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url='http://bench', timeout=120) as client:
+        session_ids = []
+        for i in range(concurrency):
+            r = await client.post('/sessions', json={'persona_key': personas[i % len(personas)]})
+            session_ids.append(r.json()['session_id'])
+
+        async def one(sid):
+            t0 = time.perf_counter()
+            r = await client.post(f'/voice/{sid}', files={'file': ('turn.wav', b'RIFF' + b'\x00' * 32000, 'audio/wav')})
+            r.raise_for_status()
+            return time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        latencies = await asyncio.gather(*(one(sid) for sid in session_ids))
+        wall = time.perf_counter() - t0
+    return latencies, wall
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--concurrency', type=int, default=120)
+    parser.add_argument('--stt-ms', type=float, default=200.0)
+    parser.add_argument('--tts-ms', type=float, default=80.0)
+    args = parser.parse_args(argv)
+
+    _, stt_url = _start_server(_make_stt_handler(args.stt_ms / 1000.0))
+    _, tts_url = _start_server(_make_tts_handler(args.tts_ms / 1000.0))
+    os.environ['DEEPGRAM_URL'] = stt_url + '/v1/listen'
+    os.environ.setdefault('DEEPGRAM_API_KEY', 'bench')
+    os.environ.setdefault('SMALLEST_API_KEY', 'bench')
+    os.environ.pop('OPENAI_API_KEY', None)
+    # let provider concurrency limits match the offered load
+    for name in ('DEEPGRAM', 'SMALLEST'):
+        os.environ.setdefault(f'{name}_MAX_CONCURRENCY', str(args.concurrency))
+    _install_sdk_stand_in(tts_url)
+
+    from app.main import app
+    from personas import PERSONAS
+
+    latencies, wall = asyncio.run(_run(app, args.concurrency, list(PERSONAS)))
+    serial = (args.stt_ms + args.tts_ms) / 1000.0
+    print(f"voice exchanges: {len(latencies)} concurrent")
+    print(f"stage latency  : stt={args.stt_ms:.0f}ms tts={args.tts_ms:.0f}ms (serial turn ~{serial * 1000:.0f}ms)")
+    print(f"p50            : {_percentile(latencies, 50) * 1000:.1f} ms")
+    print(f"p99            : {_percentile(latencies, 99) * 1000:.1f} ms")
+    print(f"wall           : {wall * 1000:.1f} ms ({len(latencies) / wall:.1f} turns/s)")
+
+
+if __name__ == '__main__':
+    main()
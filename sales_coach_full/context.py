@@ -0,0 +1,133 @@
+"""Token-budgeted conversation context for OpenAI reply generation.
+
+The prompt is a cached persona system prefix, then a short summary of older
+turns, then the most recent turns verbatim up to REPLY_CONTEXT_TOKENS. The
+system prefix is byte-identical for every call with the same persona so the
+provider can reuse its prompt cache. ContextWindow is kept per session and
+only looks at messages appended since its last call: turns that fall out of
+the window are folded into the summary once, when they leave.
+
+Token counts are estimated as len(text) / CHARS_PER_TOKEN; no tokenizer
+dependency.
+"""
+import os, re, threading
+from collections import deque
+from functools import lru_cache
+from analysis_heuristic import REP_ROLES, FEATURE_KEYWORDS, RESOLUTION_TERMS
+
+REPLY_CONTEXT_TOKENS = int(os.environ.get("REPLY_CONTEXT_TOKENS", "1200"))
+REPLY_SUMMARY_TOKENS = int(os.environ.get("REPLY_SUMMARY_TOKENS", "200"))
+CHARS_PER_TOKEN = 4
+# per-message overhead of the chat format (role, separators)
+MESSAGE_TOKENS = 4
+SUMMARY_LINE_WORDS = 24
+
+SYSTEM_PROMPT = "You are a concise, natural-sounding customer speaking in short sentences."
+
+_SENTENCE_RE = re.compile(r"[^.!?]+[.!?]?")
+_FACT_TERMS = tuple(k.lower() for k in FEATURE_KEYWORDS + RESOLUTION_TERMS)
+
+
+def estimate_tokens(text):
+    return MESSAGE_TOKENS + (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+@lru_cache(maxsize=64)
+def system_prefix(persona_prompt):
+    """The persona system message, built once per persona."""
+    return {
+        "role": "system",
+        "content": (
+            f"{SYSTEM_PROMPT}\n"
+            f"Persona: {persona_prompt}\n"
+            "You are the customer; the user is the sales rep. "
+            "Reply as the customer in one or two short sentences."
+        ),
+    }
+
+
+def _clip(sentence):
+    words = sentence.split()
+    if len(words) > SUMMARY_LINE_WORDS:
+        words = words[:SUMMARY_LINE_WORDS] + ["…"]
+    return " ".join(words)
+
+
+def summarize_turn(role, text):
+    """Summary line for an evicted turn: rep facts (numbers, product/offer terms) or customer questions."""
+    sentences = [s.strip() for s in _SENTENCE_RE.findall(text or "") if s.strip()]
+    if role in REP_ROLES:
+        keep = [s for s in sentences if any(c.isdigit() for c in s) or any(t in s.lower() for t in _FACT_TERMS)]
+        return f"rep said: {_clip(' '.join(keep))}" if keep else None
+    keep = [s for s in sentences if s.endswith("?")]
+    return f"customer asked: {_clip(' '.join(keep))}" if keep else None
+
+
+class ContextWindow:
+    def __init__(self, max_tokens=REPLY_CONTEXT_TOKENS, summary_tokens=REPLY_SUMMARY_TOKENS):
+        self.max_tokens = max_tokens
+        self.summary_tokens = summary_tokens
+        self.window = deque()
+        self.summary = deque()
+        self.lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.count = 0
+        self.window.clear()
+        self.window_tokens = 0
+        self.summary.clear()
+        self.summary_tokens_used = 0
+        self.evicted = 0
+
+    def add(self, role, text):
+        tokens = estimate_tokens(text)
+        self.window.append((role, text, tokens))
+        self.window_tokens += tokens
+        self.count += 1
+        # always keep the latest turn, even when it alone exceeds the budget
+        while self.window_tokens > self.max_tokens and len(self.window) > 1:
+            old_role, old_text, old_tokens = self.window.popleft()
+            self.window_tokens -= old_tokens
+            self._fold(old_role, old_text)
+
+    def _fold(self, role, text):
+        self.evicted += 1
+        line = summarize_turn(role, text)
+        if line is None:
+            return
+        tokens = estimate_tokens(line)
+        self.summary.append((line, tokens))
+        self.summary_tokens_used += tokens
+        while self.summary_tokens_used > self.summary_tokens and len(self.summary) > 1:
+            self.summary_tokens_used -= self.summary.popleft()[1]
+
+    def sync(self, messages):
+        """Catch up with messages appended since the last call (rebuilds if the log was replaced)."""
+        n = len(messages)
+        if n < self.count:
+            self._reset()
+        for i in range(self.count, n):
+            m = messages[i]
+            self.add(m["role"], m["text"])
+        return self
+
+    def prompt_messages(self, persona_prompt=""):
+        """Chat messages: persona prefix, summary of evicted turns, then the window (rep=user, customer=assistant)."""
+        out = [system_prefix(persona_prompt or "")]
+        if self.summary:
+            lines = "\n".join(line for line, _ in self.summary)
+            out.append({"role": "system", "content": f"Earlier in the call ({self.evicted} turns, summarized):\n{lines}"})
+        for role, text, _ in self.window:
+            out.append({"role": "user" if role in REP_ROLES else "assistant", "content": text})
+        return out
+
+    def prompt_tokens(self, persona_prompt=""):
+        return sum(estimate_tokens(m["content"]) for m in self.prompt_messages(persona_prompt))
+
+
+def build_reply_prompt(messages, persona_prompt="", context=None):
+    """Prompt for the next customer reply; pass the session's ContextWindow to avoid rescanning history."""
+    context = context or ContextWindow()
+    with context.lock:
+        return context.sync(messages).prompt_messages(persona_prompt)
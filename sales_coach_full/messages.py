@@ -0,0 +1,71 @@
+# Compact per-session message log: parallel arrays of role codes and texts
+from array import array
+
+ROLES = ["rep", "customer", "sales", "agent_rep", "agent", "persona"]
+_ROLE_CODES = {r: i for i, r in enumerate(ROLES)}
+
+def role_code(role):
+    code = _ROLE_CODES.get(role)
+    if code is None:
+        ROLES.append(role)
+        code = _ROLE_CODES[role] = len(ROLES) - 1
+    return code
+
+def format_transcript(messages):
+    """'role: text' lines, the format the OpenAI prompt and API responses use."""
+    return "\n".join(f"{role}: {text}" for role, text in iter_pairs(messages))
+
+def iter_pairs(messages):
+    """(role, text) pairs from a MessageLog or a list of {role, text} dicts."""
+    if isinstance(messages, MessageLog):
+        return messages.pairs()
+    return ((m["role"], m["text"]) for m in messages)
+
+
+class MessageLog:
+    """Append-only conversation log.
+
+    Roles are stored as one byte each and texts as a plain list, instead of a
+    dict per message. Iterating or indexing still yields {"role", "text"} dicts
+    for callers that expect the old list-of-dicts shape.
+    """
+    __slots__ = ("_roles", "_texts")
+
+    def __init__(self, messages=()):
+        self._roles = array("B")
+        self._texts = []
+        for role, text in iter_pairs(messages):
+            self.append(role, text)
+
+    def append(self, role, text):
+        self._roles.append(role_code(role))
+        self._texts.append(text)
+
+    def pairs(self):
+        roles = ROLES
+        return ((roles[c], t) for c, t in zip(self._roles, self._texts))
+
+    def transcript(self):
+        return format_transcript(self)
+
+    def __len__(self):
+        return len(self._texts)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        return {"role": ROLES[self._roles[i]], "text": self._texts[i]}
+
+    def __iter__(self):
+        return ({"role": r, "text": t} for r, t in self.pairs())
+
+    def __reversed__(self):
+        return (self[i] for i in range(len(self) - 1, -1, -1))
+
+    def __eq__(self, other):
+        if not isinstance(other, (MessageLog, list)):
+            return NotImplemented
+        return list(self.pairs()) == list(iter_pairs(other))
+
+    def __repr__(self):
+        return f"MessageLog({list(self)!r})"
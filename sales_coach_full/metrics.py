@@ -0,0 +1,167 @@
+"""Per-stage latency histograms exposed in Prometheus text format.
+
+    with span("stt", persona=persona_key, provider="deepgram"):
+        transcript = ...
+
+Set METRICS_ENABLED=0 to turn every span into a shared no-op context manager.
+"""
+import os, time, threading
+from bisect import bisect_left
+
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "1") == "1"
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Histogram:
+    """Fixed-bucket histogram keyed by a tuple of label values."""
+
+    def __init__(self, name, help_text, label_names=("stage", "persona", "provider"), buckets=BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        idx = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                # per-bucket counts (+Inf last), then sum
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[idx] += 1
+            series[-1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._series.items())
+        for labels, series in items:
+            base = ",".join(f'{n}="{_escape(v)}"' for n, v in zip(self.label_names, labels))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f'{self.name}_bucket{{{base},le="{le}"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{base}}} {series[-1]}")
+            lines.append(f"{self.name}_count{{{base}}} {cumulative}")
+        return "\n".join(lines) + "\n"
+
+
+class Counter:
+    """Monotonic counter keyed by a tuple of label values."""
+
+    def __init__(self, name, help_text, label_names):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, labels):
+        return self._values.get(labels, 0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            base = ",".join(f'{n}="{_escape(v)}"' for n, v in zip(self.label_names, labels))
+            lines.append(f"{self.name}{{{base}}} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+STAGE_SECONDS = Histogram("sales_coach_stage_seconds", "Wall time per request stage (upload_read, stt, reply, tts, analysis).")
+PROVIDER_SECONDS = Histogram("sales_coach_provider_request_seconds", "Wall time of outbound provider calls, retries included.",
+                             label_names=("provider", "outcome"))
+SPECULATION_TURNS = Counter("sales_coach_speculation_turns_total", "Voice turns by speculative reply outcome (hit, miss, skipped).",
+                            label_names=("outcome",))
+SPECULATIVE_TTS = Counter("sales_coach_speculative_tts_total", "Speculative TTS syntheses by fate (used, wasted, cancelled, over_budget).",
+                          label_names=("result",))
+SPECULATION_SAVED_SECONDS = Histogram("sales_coach_speculation_saved_seconds", "TTS wait removed from a turn by a speculative hit.",
+                                      label_names=("persona",))
+ANALYSIS_CACHE_LOOKUPS = Counter("sales_coach_analysis_cache_lookups_total", "Analysis cache lookups by kind (openai, heuristic) and result (hit, miss).",
+                                 label_names=("kind", "result"))
+ANALYSIS_CACHE_SAVED_SECONDS = Counter("sales_coach_analysis_cache_saved_seconds_total", "Analysis compute time avoided by cache hits.",
+                                       label_names=("kind",))
+REQUEST_SECONDS = Histogram("sales_coach_request_seconds", "Wall time per HTTP request, parsing and serialization included.",
+                            label_names=("method", "route"))
+
+
+class _Span:
+    __slots__ = ("histogram", "labels", "start")
+
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(self.labels, time.perf_counter() - self.start)
+        return False
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP = _NoopSpan()
+
+
+def span(stage, persona="", provider=""):
+    """Time a request stage; a no-op when metrics are disabled."""
+    if not METRICS_ENABLED:
+        return _NOOP
+    return _Span(STAGE_SECONDS, (stage, persona or "", provider))
+
+
+def observe_provider(provider, outcome, seconds):
+    if METRICS_ENABLED:
+        PROVIDER_SECONDS.observe((provider, outcome), seconds)
+
+
+class RequestTimingMiddleware:
+    """ASGI middleware feeding REQUEST_SECONDS, labelled by route template."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            route = getattr(scope.get("route"), "path", "unmatched")
+            REQUEST_SECONDS.observe((scope["method"], route), time.perf_counter() - start)
+
+
+def count(counter, *labels, amount=1):
+    if METRICS_ENABLED:
+        counter.inc(labels, amount)
+
+
+def render_prometheus():
+    return "".join(m.render() for m in (STAGE_SECONDS, PROVIDER_SECONDS, REQUEST_SECONDS,
+                                        SPECULATION_TURNS, SPECULATIVE_TTS, SPECULATION_SAVED_SECONDS,
+                                        ANALYSIS_CACHE_LOOKUPS, ANALYSIS_CACHE_SAVED_SECONDS))
@@ -0,0 +1,96 @@
+"""Offline stand-ins for Smallest (Atoms agents, Waves TTS), Deepgram STT and OpenAI.
+
+PROVIDER_MODE=mock switches the whole process to these: no network, no API
+keys, no spend, deterministic output. Use it for CI and for load tests of
+session throughput and memory. MOCK_LATENCY_MS adds a fixed delay to every
+simulated provider call so concurrency behaves roughly like production.
+"""
+import io, os, time, wave, hashlib
+
+PROVIDER_MODE = os.environ.get("PROVIDER_MODE", "live")
+MOCK_MODE = PROVIDER_MODE == "mock"
+MOCK_LATENCY_MS = float(os.environ.get("MOCK_LATENCY_MS", "0"))
+
+SAMPLE_RATE = 16000
+# ~14 characters of text per second of speech
+TTS_SECONDS_PER_CHAR = 0.07
+
+# A rep pitch the synthetic STT reads back, one sentence per ~3 s of audio
+MOCK_PITCH = [
+    "Hi, I'd like to tell you about the battery range on this model.",
+    "The battery capacity is 5000 mAh and it charges in about an hour.",
+    "I understand price matters, so we have a discount running this month.",
+    "Delivery takes about a week and shipping is included.",
+    "It comes with a two year warranty and 24/7 support.",
+    "Does that answer your question? Can I help you get started today?",
+]
+STT_SECONDS_PER_SENTENCE = 3.0
+
+
+def _simulate_latency():
+    if MOCK_LATENCY_MS > 0:
+        time.sleep(MOCK_LATENCY_MS / 1000.0)
+
+
+def synthetic_wav(text, sample_rate=SAMPLE_RATE):
+    """16-bit mono silent WAV whose duration grows with len(text)."""
+    frames = int(max(1, len(text or "")) * TTS_SECONDS_PER_CHAR * sample_rate)
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(sample_rate)
+        w.writeframes(bytes(frames * 2))
+    return buf.getvalue()
+
+
+def audio_seconds(audio):
+    """Duration of a WAV payload; other formats are assumed 16 kHz 16-bit mono."""
+    if audio[:4] == b"RIFF":
+        try:
+            with wave.open(io.BytesIO(audio), "rb") as w:
+                return w.getnframes() / float(w.getframerate())
+        except (wave.Error, EOFError):
+            pass
+    return len(audio) / float(SAMPLE_RATE * 2)
+
+
+def synthetic_transcript(audio):
+    """Deterministic rep transcript, one MOCK_PITCH sentence per STT_SECONDS_PER_SENTENCE of audio."""
+    _simulate_latency()
+    n = max(1, int(audio_seconds(audio) / STT_SECONDS_PER_SENTENCE))
+    return " ".join(MOCK_PITCH[i % len(MOCK_PITCH)] for i in range(n))
+
+
+def mock_agent_id(name, prompt):
+    """Same persona, same agent id, in every process."""
+    return "mock_agent_" + hashlib.sha1(f"{name}\n{prompt}".encode("utf-8")).hexdigest()[:12]
+
+
+class MockNotFound(Exception):
+    status = 404
+
+
+class MockAtomsClient:
+    def __init__(self):
+        self.agents = {}
+
+    def create_agent(self, name, global_prompt):
+        _simulate_latency()
+        agent_id = mock_agent_id(name, global_prompt)
+        self.agents[agent_id] = name
+        return {"agent_id": agent_id}
+
+    def get_agent_by_id(self, id):
+        if id not in self.agents:
+            raise MockNotFound(id)
+        return {"id": id, "name": self.agents[id]}
+
+    def delete_agent(self, id):
+        self.agents.pop(id, None)
+
+
+class MockWavesClient:
+    def synthesize(self, text, voice_id=None, **params):
+        _simulate_latency()
+        return synthetic_wav(text)
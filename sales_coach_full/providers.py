@@ -0,0 +1,216 @@
+"""Shared outbound provider layer (Deepgram, OpenAI, Smallest).
+
+Every provider gets one ProviderClient holding a keep-alive requests.Session,
+a concurrency limit, jittered retries bounded by a deadline and a circuit
+breaker. While a breaker is open calls raise ProviderUnavailable immediately
+so callers can drop to their heuristic fallback instead of waiting on a
+degraded provider.
+
+Per-provider settings come from PROVIDER_DEFAULTS and can be overridden with
+<NAME>_MAX_CONCURRENCY, <NAME>_TIMEOUT_S, <NAME>_DEADLINE_S, <NAME>_RETRIES,
+<NAME>_BREAKER_THRESHOLD and <NAME>_BREAKER_COOLDOWN_S.
+"""
+import os, time, random, threading
+from metrics import observe_provider
+from mock_providers import MOCK_MODE
+
+RETRY_STATUSES = frozenset({408, 425, 429, 500, 502, 503, 504})
+
+PROVIDER_DEFAULTS = {
+    "deepgram": {"max_concurrency": 32, "timeout_s": 30.0, "deadline_s": 45.0, "retries": 2},
+    "openai": {"max_concurrency": 16, "timeout_s": 30.0, "deadline_s": 40.0, "retries": 2},
+    "smallest": {"max_concurrency": 32, "timeout_s": 20.0, "deadline_s": 30.0, "retries": 1},
+}
+_BASE_DEFAULTS = {"max_concurrency": 16, "timeout_s": 30.0, "deadline_s": 45.0, "retries": 2,
+                  "backoff_base_s": 0.2, "breaker_threshold": 5, "breaker_cooldown_s": 30.0}
+
+
+class ProviderUnavailable(RuntimeError):
+    """Raised without contacting the provider (breaker open, or no slot before the deadline)."""
+
+
+class CircuitBreaker:
+    """Opens after `threshold` consecutive failures; lets one trial call through after `cooldown_s`."""
+
+    def __init__(self, threshold, cooldown_s):
+        self.threshold = threshold
+        self.cooldown_s = cooldown_s
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.cooldown_s:
+            return "half_open"
+        return "open"
+
+    def allow(self):
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half_open" and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._trial_in_flight or self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+
+class ProviderClient:
+    def __init__(self, name, max_concurrency, timeout_s, deadline_s, retries,
+                 backoff_base_s, breaker_threshold, breaker_cooldown_s):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.timeout_s = timeout_s
+        self.deadline_s = deadline_s
+        self.retries = retries
+        self.backoff_base_s = backoff_base_s
+        self.breaker = CircuitBreaker(breaker_threshold, breaker_cooldown_s)
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._session = None
+        self._session_lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, name):
+        cfg = dict(_BASE_DEFAULTS, **PROVIDER_DEFAULTS.get(name, {}))
+        for key, default in cfg.items():
+            raw = os.environ.get(f"{name.upper()}_{key.upper()}")
+            if raw is not None:
+                cfg[key] = type(default)(raw)
+        return cls(name, **cfg)
+
+    @property
+    def session(self):
+        """Keep-alive requests.Session, pool sized to the concurrency limit."""
+        if self._session is None:
+            with self._session_lock:
+                if self._session is None:
+                    import requests
+                    from requests.adapters import HTTPAdapter
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.max_concurrency)
+                    session.mount("http://", adapter)
+                    session.mount("https://", adapter)
+                    self._session = session
+        return self._session
+
+    def _backoff(self, attempt, deadline):
+        delay = random.uniform(0, self.backoff_base_s * (2 ** attempt))
+        remaining = deadline - time.monotonic()
+        if remaining <= delay:
+            return False
+        time.sleep(delay)
+        return True
+
+    def call(self, fn, *args, retry_on=None, **kwargs):
+        """Run fn(*args, **kwargs) under the concurrency limit, retries and breaker.
+
+        retry_on(result) -> bool marks a returned value as a retryable failure
+        (e.g. a 503 response); the last such value is returned once retries or
+        the deadline run out. Exceptions are retried the same way and re-raised.
+        """
+        if not self.breaker.allow():
+            raise ProviderUnavailable(f"{self.name}: circuit open")
+        deadline = time.monotonic() + self.deadline_s
+        if not self._slots.acquire(timeout=self.deadline_s):
+            self.breaker.record_failure()
+            raise ProviderUnavailable(f"{self.name}: no free slot before deadline")
+        started = time.perf_counter()
+        outcome = "error"
+        try:
+            attempt = 0
+            while True:
+                error = result = None
+                try:
+                    result = fn(*args, **kwargs)
+                    failed = bool(retry_on and retry_on(result))
+                except Exception as e:
+                    failed, error = True, e
+                if not failed:
+                    self.breaker.record_success()
+                    outcome = "ok"
+                    return result
+                if attempt >= self.retries or not self._backoff(attempt, deadline):
+                    self.breaker.record_failure()
+                    if error is not None:
+                        raise error
+                    return result
+                attempt += 1
+        finally:
+            self._slots.release()
+            observe_provider(self.name, outcome, time.perf_counter() - started)
+
+    def request(self, method, url, **kwargs):
+        """HTTP request on the pooled session; 408/429/5xx responses are retried."""
+        deadline = time.monotonic() + self.deadline_s
+        # file bodies are streamed; rewind them before every attempt
+        body = kwargs.get("data")
+        start = body.tell() if hasattr(body, "seek") else None
+        def send():
+            timeout = max(0.1, min(self.timeout_s, deadline - time.monotonic()))
+            if start is not None:
+                body.seek(start)
+            return self.session.request(method, url, timeout=timeout, **kwargs)
+        return self.call(send, retry_on=lambda resp: resp.status_code in RETRY_STATUSES)
+
+    def stats(self):
+        return {"name": self.name, "breaker": self.breaker.state, "consecutive_failures": self.breaker.failures}
+
+
+_providers = {}
+_providers_lock = threading.Lock()
+
+
+def get_provider(name):
+    provider = _providers.get(name)
+    if provider is None:
+        with _providers_lock:
+            provider = _providers.get(name)
+            if provider is None:
+                provider = _providers[name] = ProviderClient.from_env(name)
+    return provider
+
+
+_openai = None
+_openai_key = None
+
+
+def openai_api_key():
+    """OPENAI_API_KEY, or None in mock mode so callers take their offline path."""
+    if MOCK_MODE:
+        return None
+    return os.environ.get("OPENAI_API_KEY")
+
+
+def load_openai():
+    """The openai module, imported on first use (or by the app's warm-up)."""
+    global _openai
+    if _openai is None:
+        import openai
+        _openai = openai
+    return _openai
+
+
+def openai_chat_completion(api_key, **kwargs):
+    """ChatCompletion.create through the 'openai' provider; the module is imported and keyed once."""
+    global _openai_key
+    load_openai()
+    if _openai_key != api_key:
+        _openai.api_key = _openai_key = api_key
+    return get_provider("openai").call(_openai.ChatCompletion.create, **kwargs)
@@ -1,7 +1,7 @@
-import os, random
+import re, random
 from typing import List, Dict
-
-SYSTEM_PROMPT = "You are a concise, natural-sounding customer speaking in short sentences."
+from providers import openai_chat_completion, openai_api_key
+from context import build_reply_prompt
 
 CANNED_REPLIES = [
     "Can you clarify that?",
@@ -19,40 +19,38 @@ KEYWORD_REPLIES = [
     ("delivery|shipping|time", ["How long is delivery?", "When can I get it?", "Is shipping included?"]),
     ("warranty|support", ["What's the warranty?", "What support do you offer?", "Is support 24/7?"]),
 ]
+_KEYWORD_RES = [(re.compile(pattern), replies) for pattern, replies in KEYWORD_REPLIES]
+
+def candidate_replies(rep_text: str) -> List[str]:
+    """The fallback replies one of which answers rep_text: a keyword group, else the canned set."""
+    txt = (rep_text or "").lower()
+    for pattern, replies in _KEYWORD_RES:
+        if pattern.search(txt):
+            return replies
+    return CANNED_REPLIES
 
-def generate_reply_text(messages: List[Dict[str, str]], persona_prompt: str = "") -> str:
+def generate_reply_text(messages: List[Dict[str, str]], persona_prompt: str = "", context=None) -> str:
     """
     messages: list of {role: 'rep'|'customer', text: str}
     persona_prompt: optional string to bias the customer style
+    context: the session's context.ContextWindow; OpenAI then sees a bounded
+        window of recent turns plus a summary of older ones without the
+        history being rescanned on every turn
     """
-    last_rep = next((m["text"] for m in reversed(messages) if m.get("role") == "rep"), "")
-
-    api_key = os.environ.get("OPENAI_API_KEY")
+    api_key = openai_api_key()
     if api_key:
         try:
-            import openai
-            openai.api_key = api_key
-            user_prompt = (
-                f"Persona: {persona_prompt}\n"
-                f"Conversation so far (latest from rep):\n{last_rep}\n\n"
-                "Reply as the customer in one or two short sentences."
-            )
-            resp = openai.ChatCompletion.create(
+            resp = openai_chat_completion(
+                api_key,
                 model="gpt-4o-mini",
-                messages=[
-                    {"role": "system", "content": SYSTEM_PROMPT},
-                    {"role": "user", "content": user_prompt},
-                ],
+                messages=build_reply_prompt(messages, persona_prompt, context),
                 max_tokens=120,
                 temperature=0.7,
             )
             return resp["choices"][0]["message"]["content"].strip()
         except Exception:
+            # includes ProviderUnavailable while the OpenAI breaker is open
             pass
 
-    txt = last_rep.lower()
-    for pattern, replies in KEYWORD_REPLIES:
-        import re
-        if re.search(pattern, txt):
-            return random.choice(replies)
-    return random.choice(CANNED_REPLIES) 
\ No newline at end of file
+    last_rep = next((m["text"] for m in reversed(messages) if m.get("role") == "rep"), "")
+    return random.choice(candidate_replies(last_rep)) 
\ No newline at end of file
@@ -0,0 +1,308 @@
+"""Columnar store of finished-session coaching scores.
+
+One row per analyzed session: timestamp (float64 epoch seconds), rep and
+persona as dictionary codes (int32 / int16), and the four heuristic scores
+(uint8, 1-10) in one (n, 4) array. Rows live in NumPy arrays that grow by
+doubling; queries slice the filled prefix and aggregate with bincount /
+cumsum instead of looping over rows, so they stay fast at millions of rows.
+
+With SCORE_STORE_DIR set, rows are also written to .npz segments. Each
+process writes its own uniquely named segments, so workers can share the
+directory, and every query rescans it: segments that are new or have grown
+since the last look (by size and mtime) are read in, so all workers answer
+from the same rows. New rows are flushed every SCORE_STORE_FLUSH_ROWS rows
+or SCORE_STORE_FLUSH_SECONDS seconds, whichever comes first, by rewriting
+the process's open segment; a segment is closed once it holds
+SCORE_STORE_SEGMENT_ROWS rows. Bulk extend() rows are written on the next
+flush or close(). NumPy is imported on first use, not at import time.
+
+Rows without a rep id are stored under ANONYMOUS_REP, which is left out of
+leaderboards and trends.
+"""
+import os, glob, json, time, uuid, threading
+
+SCORE_KEYS = ("rapport", "objection_handling", "product_knowledge", "closing")
+SCORE_STORE_DIR = os.environ.get("SCORE_STORE_DIR") or None
+SCORE_STORE_SEGMENT_ROWS = int(os.environ.get("SCORE_STORE_SEGMENT_ROWS", "4096"))
+SCORE_STORE_FLUSH_ROWS = int(os.environ.get("SCORE_STORE_FLUSH_ROWS", "64"))
+SCORE_STORE_FLUSH_SECONDS = float(os.environ.get("SCORE_STORE_FLUSH_SECONDS", "5"))
+# scores are integers in 0..MAX_SCORE, which lets percentiles come from per-score counts
+MAX_SCORE = 10
+BUCKET_SECONDS = {"day": 86400, "week": 7 * 86400}
+ANONYMOUS_REP = "anonymous"
+
+
+class ScoreStore:
+    def __init__(self, path=SCORE_STORE_DIR, segment_rows=SCORE_STORE_SEGMENT_ROWS, capacity=1024,
+                 flush_rows=SCORE_STORE_FLUSH_ROWS, flush_seconds=SCORE_STORE_FLUSH_SECONDS):
+        self.path = path
+        self.segment_rows = segment_rows
+        self.flush_rows = flush_rows
+        self.flush_seconds = flush_seconds
+        self.n = 0
+        self.reps, self.personas = [], []
+        self._rep_codes, self._persona_codes = {}, {}
+        self._capacity = capacity
+        self._columns = None
+        # this process's open segment: its file (None until first written) and the
+        # (start, end) row ranges it holds; rows read from other segments sit in between
+        self._segment_file = None
+        self._open_ranges = []
+        self._open_rows = 0
+        self._unflushed = 0
+        self._own_files = set()
+        # other processes' segments: filename -> (size, mtime_ns, rows read so far)
+        self._seen = {}
+        self._timer = None
+        self._lock = threading.Lock()
+
+    # -- storage -----------------------------------------------------------
+
+    def _ensure(self):
+        """Allocate the columns on first use (caller holds the lock)."""
+        if self._columns is not None:
+            return
+        import numpy as np
+        cap = self._capacity
+        self._columns = {"ts": np.zeros(cap, np.float64), "rep": np.zeros(cap, np.int32),
+                         "persona": np.zeros(cap, np.int16), "scores": np.zeros((cap, len(SCORE_KEYS)), np.uint8)}
+        if self.path:
+            os.makedirs(self.path, exist_ok=True)
+
+    def _refresh(self):
+        """Read segments other processes created or extended since the last look (caller holds the lock)."""
+        self._ensure()
+        if not self.path:
+            return
+        for name in sorted(glob.glob(os.path.join(self.path, "segment-*.npz"))):
+            if name in self._own_files:
+                continue
+            try:
+                st = os.stat(name)
+            except OSError:
+                continue
+            size, mtime, rows = self._seen.get(name, (None, None, 0))
+            if (size, mtime) == (st.st_size, st.st_mtime_ns):
+                continue
+            try:
+                rows = self._load_segment(name, rows)
+            except (OSError, ValueError, KeyError):
+                # unreadable or half-written by a crashed process: try again next time
+                continue
+            self._seen[name] = (st.st_size, st.st_mtime_ns, rows)
+
+    def _grow(self, need):
+        import numpy as np
+        cap = len(self._columns["ts"])
+        if need <= cap:
+            return
+        while cap < need:
+            cap *= 2
+        for key, col in self._columns.items():
+            grown = np.zeros((cap,) + col.shape[1:], col.dtype)
+            grown[:self.n] = col[:self.n]
+            self._columns[key] = grown
+
+    @staticmethod
+    def _code(name, names, codes):
+        code = codes.get(name)
+        if code is None:
+            code = codes[name] = len(names)
+            names.append(name)
+        return code
+
+    def _load_segment(self, filename, skip=0):
+        """Append the segment's rows after the first skip (already read); returns its row count."""
+        import numpy as np
+        with np.load(filename) as seg:
+            total = len(seg["ts"])
+            if total <= skip:
+                return skip
+            names = json.loads(str(seg["names"]))
+            # segment-local dictionary codes -> this store's codes
+            rep_map = np.array([self._code(r, self.reps, self._rep_codes) for r in names["reps"]] or [0], np.int32)
+            persona_map = np.array([self._code(p, self.personas, self._persona_codes) for p in names["personas"]] or [0], np.int16)
+            rows = total - skip
+            self._grow(self.n + rows)
+            end = self.n + rows
+            self._columns["ts"][self.n:end] = seg["ts"][skip:]
+            self._columns["rep"][self.n:end] = rep_map[seg["rep"][skip:]]
+            self._columns["persona"][self.n:end] = persona_map[seg["persona"][skip:]]
+            self._columns["scores"][self.n:end] = seg["scores"][skip:]
+            self.n = end
+        return total
+
+    def _add_own_rows(self, start, end):
+        # caller holds the lock; rows start..end were just appended by this process
+        if self._open_ranges and self._open_ranges[-1][1] == start:
+            self._open_ranges[-1] = (self._open_ranges[-1][0], end)
+        else:
+            self._open_ranges.append((start, end))
+        self._open_rows += end - start
+        self._unflushed += end - start
+
+    def _flush(self):
+        """Rewrite the open segment with every row it holds (caller holds the lock)."""
+        import numpy as np
+        if not self.path or not self._unflushed:
+            return
+        if self._segment_file is None:
+            # unique per process and segment: workers sharing the directory never collide
+            self._segment_file = os.path.join(
+                self.path, f"segment-{time.time_ns():020d}-{os.getpid()}-{uuid.uuid4().hex[:8]}.npz")
+            self._own_files.add(self._segment_file)
+        cols = {key: np.concatenate([col[a:b] for a, b in self._open_ranges]) for key, col in self._columns.items()}
+        names = json.dumps({"reps": self.reps, "personas": self.personas})
+        filename = self._segment_file
+        # not named *.npz, so other processes' rescans never pick it up
+        tmp = filename[:-len(".npz")] + ".tmp"
+        with open(tmp, "wb") as f:
+            np.savez(f, names=np.array(names), **cols)
+        os.replace(tmp, filename)
+        self._unflushed = 0
+        if self._open_rows >= self.segment_rows:
+            self._segment_file, self._open_ranges, self._open_rows = None, [], 0
+
+    def _timed_flush(self):
+        with self._lock:
+            self._timer = None
+            try:
+                self._flush()
+            except OSError:
+                pass
+
+    def _schedule_flush(self):
+        # caller holds the lock; bounds what a crash can lose to flush_rows rows or flush_seconds
+        if not self.path or not self._unflushed:
+            return
+        if self._unflushed >= self.flush_rows:
+            try:
+                self._flush()
+            except OSError:
+                pass
+        elif self._timer is None:
+            self._timer = threading.Timer(self.flush_seconds, self._timed_flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def append(self, rep, persona, scores, ts=None):
+        """Record one analyzed session; scores is the heuristic's {metric: 1-10} dict."""
+        with self._lock:
+            self._ensure()
+            self._grow(self.n + 1)
+            i = self.n
+            self._columns["ts"][i] = time.time() if ts is None else ts
+            self._columns["rep"][i] = self._code(rep or ANONYMOUS_REP, self.reps, self._rep_codes)
+            self._columns["persona"][i] = self._code(persona, self.personas, self._persona_codes)
+            self._columns["scores"][i] = [min(MAX_SCORE, max(0, int(scores.get(k, 0)))) for k in SCORE_KEYS]
+            self.n += 1
+            self._add_own_rows(i, self.n)
+            self._schedule_flush()
+
+    def extend(self, reps, personas, scores, ts):
+        """Bulk append: reps/personas are sequences of names, scores an (n, 4) array."""
+        import numpy as np
+        with self._lock:
+            self._ensure()
+            rows = len(ts)
+            self._grow(self.n + rows)
+            end = self.n + rows
+            rep_names, rep_inv = np.unique(np.asarray(reps, dtype=object).astype(str), return_inverse=True)
+            persona_names, persona_inv = np.unique(np.asarray(personas, dtype=object).astype(str), return_inverse=True)
+            rep_map = np.array([self._code(r, self.reps, self._rep_codes) for r in rep_names], np.int32)
+            persona_map = np.array([self._code(p, self.personas, self._persona_codes) for p in persona_names], np.int16)
+            self._columns["ts"][self.n:end] = ts
+            self._columns["rep"][self.n:end] = rep_map[rep_inv.ravel()]
+            self._columns["persona"][self.n:end] = persona_map[persona_inv.ravel()]
+            self._columns["scores"][self.n:end] = np.clip(scores, 0, MAX_SCORE)
+            start, self.n = self.n, end
+            self._add_own_rows(start, end)
+
+    def close(self):
+        """Write rows not yet in a segment (no-op without SCORE_STORE_DIR)."""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if self._columns is not None:
+                self._flush()
+
+    # -- queries -----------------------------------------------------------
+
+    def _view(self, since=None):
+        """(ts, rep, persona, scores) for rows at or after since; views, not copies, when since is None."""
+        with self._lock:
+            self._refresh()
+            n = self.n
+            cols = self._columns
+            ts, rep, persona, scores = cols["ts"][:n], cols["rep"][:n], cols["persona"][:n], cols["scores"][:n]
+        if since is not None:
+            keep = ts >= since
+            ts, rep, persona, scores = ts[keep], rep[keep], persona[keep], scores[keep]
+        return ts, rep, persona, scores
+
+    def rep_trend(self, rep, bucket="day", since=None):
+        """Mean scores per day/week for one rep, oldest period first."""
+        import numpy as np
+        width = BUCKET_SECONDS[bucket]
+        # _view loads the segments first, or a fresh process wouldn't know the rep yet
+        ts, reps, _, scores = self._view(since)
+        code = self._rep_codes.get(rep)
+        if code is None or rep == ANONYMOUS_REP:
+            return []
+        mine = reps == code
+        periods, inverse, counts = np.unique((ts[mine] // width).astype(np.int64), return_inverse=True, return_counts=True)
+        inverse, mine_scores = inverse.ravel(), scores[mine]
+        means = np.stack([np.bincount(inverse, weights=mine_scores[:, j], minlength=len(periods))
+                          for j in range(len(SCORE_KEYS))], axis=1) / counts[:, None]
+        return [{"period_start": int(p * width), "sessions": int(c),
+                 **{k: round(float(m), 2) for k, m in zip(SCORE_KEYS, row)}}
+                for p, c, row in zip(periods, counts, means)]
+
+    def persona_percentiles(self, percentiles=(10, 50, 90), since=None):
+        """{persona: {"sessions": n, metric: {"p50": score, ...}}}, nearest-rank percentiles."""
+        import numpy as np
+        _, _, personas, scores = self._view(since)
+        n_personas, bins = len(self.personas), MAX_SCORE + 1
+        sessions = np.bincount(personas, minlength=n_personas)
+        result = {name: {"sessions": int(sessions[i])} for i, name in enumerate(self.personas) if sessions[i]}
+        for j, key in enumerate(SCORE_KEYS):
+            # per-persona score histograms -> cumulative share -> first score reaching each percentile
+            hist = np.bincount(personas.astype(np.int64) * bins + scores[:, j], minlength=n_personas * bins)
+            cdf = np.cumsum(hist.reshape(n_personas, bins), axis=1) / np.maximum(sessions, 1)[:, None]
+            for p in percentiles:
+                at = (cdf >= p / 100.0 - 1e-9).argmax(axis=1)
+                for i, name in enumerate(self.personas):
+                    if sessions[i]:
+                        result[name].setdefault(key, {})[f"p{p:g}"] = int(at[i])
+        return result
+
+    def leaderboard(self, metric="overall", since=None, persona=None, min_sessions=1, limit=10):
+        """Reps ranked by mean score (metric, or the mean of all four for "overall")."""
+        import numpy as np
+        if metric != "overall" and metric not in SCORE_KEYS:
+            raise ValueError(f"unknown metric {metric!r}")
+        _, reps, personas, scores = self._view(since)
+        if persona is not None:
+            code = self._persona_codes.get(persona)
+            if code is None:
+                return []
+            keep = personas == code
+            reps, scores = reps[keep], scores[keep]
+        values = scores.mean(axis=1) if metric == "overall" else scores[:, SCORE_KEYS.index(metric)].astype(np.float64)
+        counts = np.bincount(reps, minlength=len(self.reps))
+        means = np.bincount(reps, weights=values, minlength=len(self.reps)) / np.maximum(counts, 1)
+        anonymous = self._rep_codes.get(ANONYMOUS_REP)
+        if anonymous is not None and anonymous < len(counts):
+            # sessions without a rep id aren't one rep's results
+            counts[anonymous] = 0
+        eligible = np.flatnonzero(counts >= max(1, min_sessions))
+        top = eligible[np.argsort(-means[eligible], kind="stable")[:limit]]
+        return [{"rank": i + 1, "rep_id": self.reps[r], "sessions": int(counts[r]), metric: round(float(means[r]), 2)}
+                for i, r in enumerate(top)]
+
+    def stats(self):
+        with self._lock:
+            self._refresh()
+            return {"sessions": self.n, "reps": len(self.reps), "personas": len(self.personas),
+                    "unflushed": self._unflushed, "path": self.path}
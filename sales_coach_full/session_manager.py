@@ -1,56 +1,158 @@
-import uuid
+import uuid, time, threading, base64
+from collections import OrderedDict
 from smallest_wrapper import SmallestClientWrapper
 from personas import PERSONAS
-from analysis import analyze_conversation_heuristic
+from analysis_heuristic import RunningAnalysis
+from messages import iter_pairs
+from session_store import make_session_store, SESSION_MAX, SESSION_TTL_SECONDS
+from agent_pool import AgentPool
+from context import ContextWindow
+from analysis import ANALYSIS_CACHE
+from score_store import ScoreStore
 import os
 
+# How often create_session sweeps idle sessions out of the store
+EXPIRE_INTERVAL_SECONDS = 60
+
 class SessionManager:
-    def __init__(self, smallest_wrapper=None):
+    def __init__(self, smallest_wrapper=None, store=None, agents=None, scores=None):
         self.smallest = smallest_wrapper or SmallestClientWrapper()
-        self.sessions = {}
-        self.persona_agent_cache = {}
+        # "is not None": an empty injected store is falsy (MemorySessionStore has __len__)
+        self.sessions = store if store is not None else make_session_store()
+        # one agent per persona to avoid plan limits, created once even under concurrent first sessions
+        self.agents = agents if agents is not None else AgentPool(self.smallest)
+        # every finished session's scores, for trends, percentiles and leaderboards
+        self.scores = scores if scores is not None else ScoreStore()
+        self._last_expire = time.monotonic()
+        # per-process running analysis, rebuilt from stored messages when missing or stale
+        self.live = OrderedDict()
+        # per-process reply context windows, caught up incrementally from stored messages
+        self.contexts = OrderedDict()
+        # both are bounded like the store: same session cap, dropped after the same idle time
+        self._live_used = {}
+        self._live_max = getattr(self.sessions, "max_sessions", SESSION_MAX)
+        self._live_ttl = getattr(self.sessions, "ttl_seconds", SESSION_TTL_SECONDS)
+        self._live_lock = threading.Lock()
 
-    def create_session(self, persona_key):
+    def create_session(self, persona_key, rep_id=None):
         if persona_key not in PERSONAS:
             raise ValueError("Unknown persona key")
-        persona = PERSONAS[persona_key]
-        # Reuse one agent per persona to avoid plan limits
-        agent_id = self.persona_agent_cache.get(persona_key)
-        if not agent_id:
-            resp = self.smallest.create_agent(display_name=persona["name"], persona_prompt=persona["prompt"])
-            agent_id = resp.get("agent_id")
-            if not agent_id:
-                raise RuntimeError("failed_to_create_agent")
-            self.persona_agent_cache[persona_key] = agent_id
+        agent_id = self.agents.get(persona_key)
         session_id = "sess_" + uuid.uuid4().hex[:8]
-        self.sessions[session_id] = {"agent_id": agent_id, "persona_key": persona_key, "messages": []}
+        self.sessions.create(session_id, agent_id, persona_key)
+        if rep_id:
+            self.sessions.set_field(session_id, "rep_id", rep_id)
+        with self._live_lock:
+            self.live[session_id] = RunningAnalysis()
+            self._touch_live(session_id)
+        if time.monotonic() - self._last_expire > EXPIRE_INTERVAL_SECONDS:
+            self._last_expire = time.monotonic()
+            self.sessions.expire()
+            self.expire_live()
         return session_id, agent_id
 
-    def send_rep_message(self, session_id, text):
-        if session_id not in self.sessions:
+    def _touch_live(self, session_id):
+        # caller holds _live_lock; keeps live/contexts in LRU order and within the session cap
+        self._live_used[session_id] = time.monotonic()
+        for table in (self.live, self.contexts):
+            if session_id in table:
+                table.move_to_end(session_id)
+            while len(table) > self._live_max:
+                old_id, _ = table.popitem(last=False)
+                if old_id not in self.live and old_id not in self.contexts:
+                    self._live_used.pop(old_id, None)
+
+    def _drop_live(self, session_id):
+        self.live.pop(session_id, None)
+        self.contexts.pop(session_id, None)
+        self._live_used.pop(session_id, None)
+
+    def expire_live(self):
+        """Drop per-process state of sessions idle longer than the store's TTL; returns the number dropped."""
+        cutoff = time.monotonic() - self._live_ttl
+        with self._live_lock:
+            stale = [sid for sid, used in self._live_used.items() if used < cutoff]
+            for sid in stale:
+                self._drop_live(sid)
+        return len(stale)
+
+    def get_session(self, session_id):
+        session = self.sessions.get(session_id)
+        if session is None:
             raise ValueError("session not found")
-        session = self.sessions[session_id]
+        return session
+
+    def append_message(self, session_id, role, text):
+        with self._live_lock:
+            self.sessions.append_message(session_id, role, text)
+            running = self.live.get(session_id)
+            if running is not None:
+                running.add(role, text)
+                self._touch_live(session_id)
+
+    def _running_analysis(self, session_id, session):
+        messages = session["messages"]
+        with self._live_lock:
+            running = self.live.get(session_id)
+            # another worker appended, or this process never saw the session
+            if running is None or running.count != len(messages):
+                running = RunningAnalysis()
+                for role, text in iter_pairs(messages):
+                    running.add(role, text)
+                self.live[session_id] = running
+            self._touch_live(session_id)
+            return running
+
+    def reply_context(self, session_id):
+        with self._live_lock:
+            context = self.contexts.get(session_id)
+            if context is None:
+                context = self.contexts[session_id] = ContextWindow()
+            self._touch_live(session_id)
+            return context
+
+    def live_scores(self, session_id):
+        session = self.get_session(session_id)
+        running = self._running_analysis(session_id, session)
+        return {"scores": running.scores(), "turns": running.count}
+
+    def send_rep_message_audio(self, session_id, text, synthesize=True):
+        """Like send_rep_message but returns the reply audio as raw bytes (b"" when synthesize is False)."""
+        session = self.get_session(session_id)
         agent_id = session["agent_id"]
-        session["messages"].append({"role": "rep", "text": text})
+        self.append_message(session_id, "rep", text)
         reply = ""
-        tts_b64 = ""
+        audio = b""
         try:
             reply = self.smallest.converse_text(agent_id, text)
             if reply:
-                session["messages"].append({"role": "customer", "text": reply})
+                self.append_message(session_id, "customer", reply)
+                if not synthesize:
+                    return reply, audio
                 try:
-                    tts_b64 = self.smallest.synthesize_tts_base64(reply)
+                    audio = self.smallest.synthesize_tts_bytes(reply)
                 except Exception:
-                    tts_b64 = ""
+                    audio = b""
         except Exception:
             reply = ""
-            tts_b64 = ""
-        return reply, tts_b64
+            audio = b""
+        return reply, audio
+
+    def send_rep_message(self, session_id, text):
+        reply, audio = self.send_rep_message_audio(session_id, text)
+        return reply, base64.b64encode(audio).decode("utf-8") if audio else ""
 
     def end_and_analyze(self, session_id):
-        if session_id not in self.sessions:
-            raise ValueError("session not found")
-        session = self.sessions[session_id]
-        coaching = analyze_conversation_heuristic(session["messages"])
-        session["analysis"] = coaching
+        session = self.get_session(session_id)
+        messages = session["messages"]
+        # re-opened sessions hit the cache instead of replaying the transcript
+        coaching = ANALYSIS_CACHE.get_or_compute(
+            messages, "heuristic", lambda: (self._running_analysis(session_id, session).snapshot(messages.transcript()), True))
+        self.sessions.set_field(session_id, "analysis", coaching)
+        # scored once, on the first end; re-ending only re-reads the analysis
+        if not session.get("scored"):
+            self.scores.append(session.get("rep_id"), session["persona_key"], coaching["scores"])
+            self.sessions.set_field(session_id, "scored", True)
+        with self._live_lock:
+            self._drop_live(session_id)
         return coaching
@@ -0,0 +1,210 @@
+# Session storage backends used by SessionManager
+import os, json, time, sqlite3, threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from messages import MessageLog
+
+SESSION_TTL_SECONDS = float(os.environ.get("SESSION_TTL_SECONDS", "3600"))
+SESSION_MAX = int(os.environ.get("SESSION_MAX", "10000"))
+
+
+class SessionStore(ABC):
+    """Interface for session storage.
+
+    A session is {"agent_id", "persona_key", "messages": MessageLog, ...extra fields}.
+    Messages are appended one at a time; backends must not rewrite the whole session.
+    Sessions idle for longer than ttl_seconds are expired.
+    """
+
+    @abstractmethod
+    def create(self, session_id, agent_id, persona_key):
+        ...
+
+    @abstractmethod
+    def get(self, session_id):
+        """Return the session dict (with messages) or None."""
+
+    @abstractmethod
+    def append_message(self, session_id, role, text):
+        ...
+
+    @abstractmethod
+    def set_field(self, session_id, key, value):
+        ...
+
+    @abstractmethod
+    def delete(self, session_id):
+        ...
+
+    @abstractmethod
+    def expire(self):
+        """Drop idle sessions; returns the number removed."""
+
+    @abstractmethod
+    def __contains__(self, session_id):
+        ...
+
+
+class MemorySessionStore(SessionStore):
+    """Per-process store with LRU eviction and idle TTL."""
+
+    def __init__(self, max_sessions=SESSION_MAX, ttl_seconds=SESSION_TTL_SECONDS):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self._data = OrderedDict()
+        self._touched = {}
+        self._lock = threading.Lock()
+
+    def _live(self, session_id):
+        session = self._data.get(session_id)
+        if session is None:
+            return None
+        if time.monotonic() - self._touched[session_id] > self.ttl_seconds:
+            del self._data[session_id]
+            del self._touched[session_id]
+            return None
+        self._data.move_to_end(session_id)
+        self._touched[session_id] = time.monotonic()
+        return session
+
+    def create(self, session_id, agent_id, persona_key):
+        with self._lock:
+            self._data[session_id] = {"agent_id": agent_id, "persona_key": persona_key, "messages": MessageLog()}
+            self._touched[session_id] = time.monotonic()
+            while len(self._data) > self.max_sessions:
+                old_id, _ = self._data.popitem(last=False)
+                del self._touched[old_id]
+
+    def get(self, session_id):
+        with self._lock:
+            return self._live(session_id)
+
+    def append_message(self, session_id, role, text):
+        with self._lock:
+            session = self._live(session_id)
+            if session is None:
+                raise ValueError("session not found")
+            session["messages"].append(role, text)
+
+    def set_field(self, session_id, key, value):
+        with self._lock:
+            session = self._live(session_id)
+            if session is None:
+                raise ValueError("session not found")
+            session[key] = value
+
+    def delete(self, session_id):
+        with self._lock:
+            self._data.pop(session_id, None)
+            self._touched.pop(session_id, None)
+
+    def expire(self):
+        cutoff = time.monotonic() - self.ttl_seconds
+        with self._lock:
+            stale = [sid for sid, t in self._touched.items() if t < cutoff]
+            for sid in stale:
+                del self._data[sid]
+                del self._touched[sid]
+        return len(stale)
+
+    def __contains__(self, session_id):
+        return self.get(session_id) is not None
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SQLiteSessionStore(SessionStore):
+    """Durable store shared by every worker on a host (SQLite in WAL mode)."""
+
+    def __init__(self, path, ttl_seconds=SESSION_TTL_SECONDS):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS sessions (
+                id TEXT PRIMARY KEY,
+                agent_id TEXT,
+                persona_key TEXT,
+                extra TEXT NOT NULL DEFAULT '{}',
+                last_active REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS messages (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                session_id TEXT NOT NULL,
+                role TEXT NOT NULL,
+                text TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS messages_session ON messages(session_id, seq);
+            CREATE INDEX IF NOT EXISTS sessions_last_active ON sessions(last_active);
+            """
+        )
+
+    def _touch(self, session_id):
+        cur = self._conn.execute("UPDATE sessions SET last_active = ? WHERE id = ? AND last_active >= ?",
+                                 (time.time(), session_id, time.time() - self.ttl_seconds))
+        return cur.rowcount > 0
+
+    def create(self, session_id, agent_id, persona_key):
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO sessions (id, agent_id, persona_key, extra, last_active) VALUES (?, ?, ?, '{}', ?)",
+                               (session_id, agent_id, persona_key, time.time()))
+
+    def get(self, session_id):
+        with self._lock:
+            if not self._touch(session_id):
+                return None
+            agent_id, persona_key, extra = self._conn.execute(
+                "SELECT agent_id, persona_key, extra FROM sessions WHERE id = ?", (session_id,)).fetchone()
+            rows = self._conn.execute("SELECT role, text FROM messages WHERE session_id = ? ORDER BY seq", (session_id,)).fetchall()
+        messages = MessageLog()
+        for role, text in rows:
+            messages.append(role, text)
+        session = json.loads(extra)
+        session.update({"agent_id": agent_id, "persona_key": persona_key, "messages": messages})
+        return session
+
+    def append_message(self, session_id, role, text):
+        with self._lock:
+            if not self._touch(session_id):
+                raise ValueError("session not found")
+            self._conn.execute("INSERT INTO messages (session_id, role, text) VALUES (?, ?, ?)", (session_id, role, text))
+
+    def set_field(self, session_id, key, value):
+        with self._lock:
+            if not self._touch(session_id):
+                raise ValueError("session not found")
+            self._conn.execute("UPDATE sessions SET extra = json_set(extra, '$.' || ?, json(?)) WHERE id = ?",
+                               (key, json.dumps(value), session_id))
+
+    def delete(self, session_id):
+        with self._lock:
+            self._conn.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+            self._conn.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+
+    def expire(self):
+        cutoff = time.time() - self.ttl_seconds
+        with self._lock:
+            self._conn.execute("BEGIN")
+            self._conn.execute("DELETE FROM messages WHERE session_id IN (SELECT id FROM sessions WHERE last_active < ?)", (cutoff,))
+            n = self._conn.execute("DELETE FROM sessions WHERE last_active < ?", (cutoff,)).rowcount
+            self._conn.execute("COMMIT")
+        return n
+
+    def __contains__(self, session_id):
+        with self._lock:
+            return self._touch(session_id)
+
+
+def make_session_store(url=None):
+    """Build a store from SESSION_STORE: 'memory' (default) or 'sqlite:///path/to.db'."""
+    url = url or os.environ.get("SESSION_STORE", "memory")
+    if url.startswith("sqlite:///"):
+        return SQLiteSessionStore(url[len("sqlite:///"):])
+    if url == "memory":
+        return MemorySessionStore()
+    raise ValueError(f"unsupported SESSION_STORE: {url}")
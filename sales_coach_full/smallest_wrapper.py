@@ -1,24 +1,62 @@
-import os, sys, uuid, random, json
+import os, sys, uuid, random, json, base64, threading
+from tts_cache import TTSCache, cache_key
+from providers import get_provider
+from mock_providers import MOCK_MODE, MockAtomsClient, MockWavesClient
+
+FALLBACK_REPLY = "I didn't catch that. Could you please repeat?"
 
 class SmallestClientWrapper:
-    def __init__(self, api_key=None, force_mock=False):
+    def __init__(self, api_key=None, force_mock=False, tts_cache=None):
+        self.tts_cache = tts_cache or TTSCache()
+        # offline mode (PROVIDER_MODE=mock or force_mock): no SDK, no key, no network
+        self.mock = force_mock or MOCK_MODE
+        self._clients_lock = threading.Lock()
+        self._atoms_client = self._waves_client = None
+        if self.mock:
+            self.api_key = None
+            self._atoms_client = MockAtomsClient()
+            self._waves_client = MockWavesClient()
+            return
+        # the SDK is imported and the clients built on first use (or by init_clients
+        # from the app's warm-up), so importing the app stays fast and a missing key
+        # or SDK shows up on /ready instead of crashing the worker
         self.api_key = api_key or os.environ.get("SMALLEST_API_KEY")
-        if not self.api_key:
-            raise RuntimeError("SMALLEST_API_KEY not set")
-        try:
-            # Use Atoms with explicit Configuration taking access_token from env/key
-            from smallestai.atoms.atoms_client import AtomsClient  # type: ignore
-            from smallestai.atoms.configuration import Configuration  # type: ignore
-            from smallestai.waves.waves_client import WavesClient  # type: ignore
-
-            atoms_config = Configuration(access_token=self.api_key)
-            self.atoms_client = AtomsClient(configuration=atoms_config)
-            # WavesClient accepts api_key directly
-            self.waves_client = WavesClient(api_key=self.api_key)
-        except Exception as e:
-            raise RuntimeError(f"smallestai SDK not available or failed to import: {e}")
+
+    def init_clients(self):
+        """Import the smallestai SDK and build the Atoms and Waves clients once."""
+        if self._waves_client is not None:
+            return
+        with self._clients_lock:
+            if self._waves_client is not None:
+                return
+            if not self.api_key:
+                raise RuntimeError("SMALLEST_API_KEY not set")
+            try:
+                # Use Atoms with explicit Configuration taking access_token from env/key
+                from smallestai.atoms.atoms_client import AtomsClient  # type: ignore
+                from smallestai.atoms.configuration import Configuration  # type: ignore
+                from smallestai.waves.waves_client import WavesClient  # type: ignore
+
+                atoms_config = Configuration(access_token=self.api_key)
+                self._atoms_client = AtomsClient(configuration=atoms_config)
+                # WavesClient accepts api_key directly
+                self._waves_client = WavesClient(api_key=self.api_key)
+            except Exception as e:
+                raise RuntimeError(f"smallestai SDK not available or failed to import: {e}")
+
+    @property
+    def atoms_client(self):
+        self.init_clients()
+        return self._atoms_client
+
+    @property
+    def waves_client(self):
+        self.init_clients()
+        return self._waves_client
 
     def create_agent(self, display_name, persona_prompt, voice_config=None):
+        if self.mock:
+            return self.atoms_client.create_agent(name=display_name, global_prompt=persona_prompt)
         # Build request model per SDK
         try:
             from smallestai.atoms.models.create_agent_request import CreateAgentRequest  # type: ignore
@@ -48,26 +86,51 @@ class SmallestClientWrapper:
         # Temporary text reply fallback until a chat endpoint is available via SDK.
         # Keeps the pipeline working so TTS can be produced by Waves.
         if not user_message:
-            return "I didn't catch that. Could you please repeat?"
+            return FALLBACK_REPLY
         trimmed = user_message.strip()
         if len(trimmed) > 400:
             trimmed = trimmed[:400] + "…"
         return f"You said: {trimmed}"
 
-    def synthesize_tts_base64(self, text, voice_id=None):
-        if voice_id is None:
-            voice_id = os.environ.get("SMALLEST_VOICE_ID") or None
-        resp = self.waves_client.synthesize(text=text, voice_id=voice_id)
+    def _synthesize(self, text, voice_id, **params):
+        resp = get_provider('smallest').call(self.waves_client.synthesize, text=text, voice_id=voice_id, **params)
         if isinstance(resp, bytes):
-            import base64
-            return base64.b64encode(resp).decode('utf-8')
+            return resp
         if isinstance(resp, dict):
-            audio_b64 = resp.get('audio') or resp.get('data')
-            if isinstance(audio_b64, bytes):
-                import base64
-                return base64.b64encode(audio_b64).decode('utf-8')
-            return audio_b64
-        return str(resp)
+            audio = resp.get('audio') or resp.get('data')
+            if isinstance(audio, bytes):
+                return audio
+            return base64.b64decode(audio or '')
+        return str(resp).encode('utf-8')
+
+    def _cache_key(self, text, voice_id, **params):
+        if voice_id is None:
+            voice_id = os.environ.get("SMALLEST_VOICE_ID") or None
+        return cache_key(text, voice_id, **params), voice_id
+
+    def is_cached(self, text, voice_id=None, **params):
+        return self._cache_key(text, voice_id, **params)[0] in self.tts_cache
+
+    def synthesize_tts_bytes(self, text, voice_id=None, **params):
+        """Raw audio for text, served from the TTS cache when this (text, voice, params) was seen before."""
+        key, voice_id = self._cache_key(text, voice_id, **params)
+        audio = self.tts_cache.get(key)
+        if audio is None:
+            audio = self._synthesize(text, voice_id, **params)
+            if audio:
+                self.tts_cache.put(key, audio)
+        return audio
+
+    def synthesize_tts_base64(self, text, voice_id=None, **params):
+        return base64.b64encode(self.synthesize_tts_bytes(text, voice_id, **params)).decode('utf-8')
+
+    def agent_alive(self, agent_id):
+        """False only when Atoms answers that agent_id is gone; lookup errors count as alive."""
+        try:
+            self.atoms_client.get_agent_by_id(id=agent_id)
+            return True
+        except Exception as e:
+            return getattr(e, 'status', None) not in (404, 410)
 
     def delete_agent(self, agent_id: str) -> None:
         try:
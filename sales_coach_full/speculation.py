@@ -0,0 +1,152 @@
+"""Speculative reply + TTS while the rep's transcript is still pending.
+
+Without OpenAI the customer reply is drawn from a small fixed set: one
+keyword group (price, battery, delivery, warranty) or the canned replies.
+While STT runs, speculate() picks a reply from the most likely groups, judged
+by the persona prompt and the rep's recent turns, and starts synthesizing it.
+commit() then looks up the group the final transcript actually selects: on a
+hit that reply and its (possibly finished) audio are used, everything else is
+cancelled.
+
+Costs are capped: at most SPECULATIVE_MAX_CANDIDATES syntheses per turn,
+SPECULATIVE_BUDGET_PER_MIN per process, and SPECULATIVE_MAX_IN_FLIGHT at once
+so speculation backs off under load instead of queueing ahead of real STT and
+TTS work on the provider pool. Replies already in the TTS cache cost nothing
+and are not counted. Cancelling only drops syntheses that haven't
+started; one already running finishes into the TTS cache, is counted as wasted
+and holds its in-flight slot until the provider call returns.
+"""
+import os, time, random, asyncio, threading
+from collections import deque
+from async_utils import run_blocking, get_executor
+from providers import openai_api_key
+from reply import KEYWORD_REPLIES, CANNED_REPLIES, candidate_replies
+from metrics import SPECULATION_TURNS, SPECULATIVE_TTS, SPECULATION_SAVED_SECONDS, METRICS_ENABLED, count
+
+SPECULATIVE_REPLIES = os.environ.get("SPECULATIVE_REPLIES", "1") == "1"
+SPECULATIVE_MAX_CANDIDATES = int(os.environ.get("SPECULATIVE_MAX_CANDIDATES", "2"))
+SPECULATIVE_BUDGET_PER_MIN = int(os.environ.get("SPECULATIVE_BUDGET_PER_MIN", "120"))
+SPECULATIVE_MAX_IN_FLIGHT = int(os.environ.get("SPECULATIVE_MAX_IN_FLIGHT", "8"))
+# how many recent rep turns inform the guess
+SPECULATIVE_HISTORY = 3
+
+_budget_lock = threading.Lock()
+_spent = deque()
+_in_flight = 0
+
+
+def _take_budget():
+    global _in_flight
+    now = time.monotonic()
+    with _budget_lock:
+        while _spent and now - _spent[0] > 60.0:
+            _spent.popleft()
+        if len(_spent) >= SPECULATIVE_BUDGET_PER_MIN or _in_flight >= SPECULATIVE_MAX_IN_FLIGHT:
+            return False
+        _spent.append(now)
+        _in_flight += 1
+        return True
+
+
+def _release_budget(future):
+    # done callback of the executor future: runs once the provider call has
+    # really finished (or the synthesis was cancelled before it started)
+    global _in_flight
+    with _budget_lock:
+        _in_flight -= 1
+
+
+def likely_reply_sets(messages, persona_prompt="", k=SPECULATIVE_MAX_CANDIDATES):
+    """Up to k reply groups ranked by keyword hits in the recent rep turns (x2) and the persona prompt."""
+    recent = []
+    for m in reversed(messages):
+        if m["role"] == "rep":
+            recent.append(m["text"].lower())
+            if len(recent) >= SPECULATIVE_HISTORY:
+                break
+    recent_text = " ".join(recent)
+    persona = (persona_prompt or "").lower()
+    ranked = []
+    for pattern, replies in KEYWORD_REPLIES:
+        words = pattern.split("|")
+        score = 2 * sum(recent_text.count(w) for w in words) + sum(persona.count(w) for w in words)
+        if score:
+            ranked.append((score, replies))
+    ranked.sort(key=lambda item: -item[0])
+    sets = [replies for _, replies in ranked] + [CANNED_REPLIES]
+    return sets[:k]
+
+
+class Speculation:
+    def __init__(self, smallest, persona_key=""):
+        self.smallest = smallest
+        self.persona_key = persona_key
+        # id(reply set) -> [text, synthesis future (None when cached), timing]
+        self.picks = {}
+
+    def start(self, reply_sets):
+        for replies in reply_sets:
+            text = random.choice(replies)
+            if self.smallest.is_cached(text):
+                self.picks[id(replies)] = [text, None, None]
+                continue
+            if not _take_budget():
+                count(SPECULATIVE_TTS, "over_budget")
+                continue
+            timing = {}
+            # the executor future itself, not an asyncio wrapper: cancel() on a
+            # wrapper succeeds even while the thread is already synthesizing
+            future = get_executor().submit(self._synthesize, text, timing)
+            future.add_done_callback(_release_budget)
+            self.picks[id(replies)] = [text, future, timing]
+        return self
+
+    def _synthesize(self, text, timing):
+        started = time.perf_counter()
+        try:
+            return self.smallest.synthesize_tts_bytes(text)
+        finally:
+            timing["seconds"] = time.perf_counter() - started
+
+    def cancel(self, keep=None):
+        for key, (_, future, _) in self.picks.items():
+            if key == keep or future is None:
+                continue
+            if future.cancel():
+                count(SPECULATIVE_TTS, "cancelled")
+            else:
+                count(SPECULATIVE_TTS, "wasted")
+
+    async def commit(self, transcript):
+        """(reply_text, audio) when the speculation covered transcript's reply set, else None."""
+        if not self.picks:
+            # every candidate was over budget
+            count(SPECULATION_TURNS, "skipped")
+            return None
+        key = id(candidate_replies(transcript))
+        pick = self.picks.get(key)
+        self.cancel(keep=key)
+        if pick is None:
+            count(SPECULATION_TURNS, "miss")
+            return None
+        text, future, timing = pick
+        count(SPECULATION_TURNS, "hit")
+        if future is None:
+            return text, await run_blocking(self.smallest.synthesize_tts_bytes, text)
+        waited_from = time.perf_counter()
+        try:
+            audio = await asyncio.wrap_future(future)
+        except Exception:
+            return None
+        count(SPECULATIVE_TTS, "used")
+        if METRICS_ENABLED:
+            saved = max(0.0, timing.get("seconds", 0.0) - (time.perf_counter() - waited_from))
+            SPECULATION_SAVED_SECONDS.observe((self.persona_key,), saved)
+        return text, audio
+
+
+def speculate(smallest, messages, persona_prompt="", persona_key=""):
+    """Start a Speculation for the next reply, or None when disabled or replies come from OpenAI."""
+    if not SPECULATIVE_REPLIES or SPECULATIVE_MAX_CANDIDATES <= 0 or openai_api_key():
+        return None
+    return Speculation(smallest, persona_key).start(likely_reply_sets(messages, persona_prompt))
@@ -0,0 +1,179 @@
+# WebSocket voice turns: audio frames in, partial transcripts + per-sentence TTS frames out
+import os, re, json, asyncio
+from starlette.websockets import WebSocketDisconnect
+from async_utils import run_blocking
+from stt import transcribe_audio_deepgram
+from reply import generate_reply_text
+from uploads import UPLOAD_MAX_BYTES, UPLOAD_MAX_SECONDS, WAV_HEADER_BYTES, wav_duration
+
+# A gap this long after the last audio frame is treated as end of utterance.
+# Only clients that stop sending frames hit it: MediaRecorder keeps sending
+# during silence, so browser clients must send {"type": "end"}.
+WS_UTTERANCE_GAP_S = float(os.environ.get('WS_UTTERANCE_GAP_MS', '800')) / 1000.0
+# Re-transcribe the buffered audio at most this often while the rep is talking
+WS_PARTIAL_INTERVAL_S = float(os.environ.get('WS_PARTIAL_INTERVAL_MS', '1500')) / 1000.0
+# Each partial re-sends the whole utterance (compressed frames can't be sent on
+# their own), so a partial waits until the audio has doubled since the last one
+# and there are at most this many per utterance: partials then bill less audio
+# than the final transcript instead of growing quadratically with its length.
+WS_MAX_PARTIALS = int(os.environ.get('WS_MAX_PARTIALS', '4'))
+# Close code for an utterance over the upload limits (RFC 6455 "message too big")
+WS_CLOSE_TOO_BIG = 1009
+
+_SENTENCE_RE = re.compile(r'[^.!?…]+(?:[.!?…]+|$)')
+
+def split_sentences(text: str):
+    """Split reply text into sentences so TTS can start on the first one."""
+    return [s.strip() for s in _SENTENCE_RE.findall(text or '') if s.strip()]
+
+
+class _Utterance:
+    def __init__(self, filename):
+        self.filename = filename
+        self.audio = bytearray()
+        self.partial_len = 0
+        self.partial_text = ''
+        self.partial_task = None
+        self.partial_task_len = 0
+        self.partials = 0
+        self.started_at = None
+        self.last_partial_at = 0.0
+
+    def over_limit(self, extra, now):
+        """Why adding extra bytes would break the HTTP upload limits, or None.
+
+        Duration is the WAV header's when there is one, else wall time since
+        the first frame (frames of a live recording arrive in real time).
+        """
+        size = len(self.audio) + extra
+        if size > UPLOAD_MAX_BYTES:
+            return f"utterance is over {UPLOAD_MAX_BYTES} bytes"
+        seconds = wav_duration(bytes(self.audio[:WAV_HEADER_BYTES]), size)
+        if seconds is None and self.started_at is not None:
+            seconds = now - self.started_at
+        if seconds is not None and seconds > UPLOAD_MAX_SECONDS:
+            return f"utterance is over {UPLOAD_MAX_SECONDS:.0f} s"
+        return None
+
+    def wants_partial(self, now):
+        if self.partials >= WS_MAX_PARTIALS or now - self.last_partial_at < WS_PARTIAL_INTERVAL_S:
+            return False
+        if self.partial_task and not self.partial_task.done():
+            return False
+        return len(self.audio) >= 2 * self.partial_task_len
+
+    def cancel(self):
+        if self.partial_task and not self.partial_task.done():
+            self.partial_task.cancel()
+
+
+async def _send_partial(websocket, utt, n):
+    text = await run_blocking(transcribe_audio_deepgram, bytes(utt.audio[:n]), filename=utt.filename)
+    utt.partial_len, utt.partial_text = n, text
+    await websocket.send_json({'type': 'partial', 'text': text})
+
+
+async def _final_transcript(utt):
+    n = len(utt.audio)
+    if utt.partial_task and utt.partial_task_len == n:
+        # the in-flight partial already covers the whole utterance
+        try:
+            await utt.partial_task
+        except Exception:
+            pass
+    else:
+        utt.cancel()
+    if utt.partial_len == n:
+        return utt.partial_text
+    return await run_blocking(transcribe_audio_deepgram, bytes(utt.audio), filename=utt.filename)
+
+
+async def _run_turn(websocket, session_mgr, session_id, persona_prompt, smallest, transcript):
+    await websocket.send_json({'type': 'transcript', 'text': transcript})
+    session_mgr.append_message(session_id, 'rep', transcript)
+    messages = session_mgr.get_session(session_id)['messages']
+    reply_text = await run_blocking(generate_reply_text, messages, persona_prompt, session_mgr.reply_context(session_id))
+    session_mgr.append_message(session_id, 'customer', reply_text)
+    await websocket.send_json({'type': 'reply_text', 'text': reply_text})
+
+    # Synthesize all sentences concurrently but send them in order, so the
+    # first audio frame goes out as soon as the first sentence is ready.
+    sentences = split_sentences(reply_text)
+    tasks = [asyncio.ensure_future(run_blocking(smallest.synthesize_tts_bytes, s)) for s in sentences]
+    try:
+        for index, (sentence, task) in enumerate(zip(sentences, tasks)):
+            try:
+                audio = await task
+            except Exception:
+                continue
+            if not audio:
+                continue
+            await websocket.send_json({'type': 'audio', 'index': index, 'text': sentence})
+            await websocket.send_bytes(audio)
+    finally:
+        for task in tasks:
+            task.cancel()
+    await websocket.send_json({'type': 'turn_end'})
+
+
+async def stream_voice_turns(websocket, session_mgr, session_id, persona_prompt, smallest):
+    """Drive voice turns over an accepted WebSocket until the client disconnects.
+
+    Client -> server: binary audio frames (one growing recording per utterance),
+    optional {"type": "start", "filename": "x.webm"} text frame, and {"type": "end"}
+    after each utterance. Send "end" explicitly: the WS_UTTERANCE_GAP_MS fallback
+    only fires when frames stop, and MediaRecorder keeps sending them in silence.
+    An utterance over UPLOAD_MAX_BYTES or UPLOAD_MAX_SECONDS closes the socket
+    with code 1009.
+    Server -> client: partial/transcript/reply_text/audio JSON events, each audio
+    event followed by one binary frame with that sentence's audio, then turn_end.
+    """
+    loop = asyncio.get_running_loop()
+    filename = 'stream.webm'
+    utt = _Utterance(filename)
+    try:
+        while True:
+            try:
+                msg = await asyncio.wait_for(websocket.receive(), timeout=WS_UTTERANCE_GAP_S if utt.audio else None)
+            except asyncio.TimeoutError:
+                msg = None
+            if msg is not None:
+                if msg['type'] == 'websocket.disconnect':
+                    break
+                if msg.get('bytes'):
+                    now = loop.time()
+                    # a client that never sends "end" must not grow the buffer without bound
+                    reason = utt.over_limit(len(msg['bytes']), now)
+                    if reason:
+                        await websocket.close(code=WS_CLOSE_TOO_BIG, reason=reason)
+                        break
+                    utt.audio.extend(msg['bytes'])
+                    if utt.started_at is None:
+                        utt.started_at = now
+                    if not utt.last_partial_at:
+                        utt.last_partial_at = now
+                    if utt.wants_partial(now):
+                        utt.last_partial_at = now
+                        utt.partials += 1
+                        utt.partial_task_len = len(utt.audio)
+                        utt.partial_task = asyncio.ensure_future(_send_partial(websocket, utt, utt.partial_task_len))
+                    continue
+                try:
+                    data = json.loads(msg.get('text') or '{}')
+                except ValueError:
+                    continue
+                if data.get('type') == 'start':
+                    filename = data.get('filename') or filename
+                    utt.filename = filename
+                    continue
+                if data.get('type') != 'end':
+                    continue
+            if not utt.audio:
+                continue
+            transcript = await _final_transcript(utt)
+            utt = _Utterance(filename)
+            await _run_turn(websocket, session_mgr, session_id, persona_prompt, smallest, transcript)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        utt.cancel()
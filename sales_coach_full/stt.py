@@ -1,4 +1,117 @@
-import os, requests, json
+import os, io, json, wave
+from providers import get_provider
+from mock_providers import MOCK_MODE, synthetic_transcript
+from uploads import file_size
+
+# Local preprocessing of WAV/PCM uploads before STT: trim leading/trailing
+# silence, downmix to mono and resample to 16 kHz. Compressed uploads
+# (webm/opus, mp3, ...) are sent as-is.
+STT_VAD = os.environ.get("STT_VAD", "1") == "1"
+STT_RESAMPLE = os.environ.get("STT_RESAMPLE", "1") == "1"
+STT_SAMPLE_RATE = 16000
+VAD_FRAME_MS = 20
+# a frame is speech when louder than max(VAD_MIN_DBFS, noise floor + VAD_MARGIN_DB),
+# and always when louder than VAD_SPEECH_DBFS (clips cut right at the speech have
+# no quiet frames, so their "noise floor" is speech); a clip is all silence only
+# when no frame reaches VAD_MIN_DBFS
+VAD_MIN_DBFS = float(os.environ.get("VAD_MIN_DBFS", "-50"))
+VAD_MARGIN_DB = float(os.environ.get("VAD_MARGIN_DB", "12"))
+VAD_SPEECH_DBFS = float(os.environ.get("VAD_SPEECH_DBFS", "-35"))
+# speech kept on each side of the voiced region so word edges aren't clipped
+VAD_PAD_MS = int(os.environ.get("VAD_PAD_MS", "250"))
+# WAV file uploads larger than this skip the VAD (it decodes the whole clip) and are streamed to STT as-is
+STT_VAD_MAX_BYTES = int(os.environ.get("STT_VAD_MAX_BYTES", str(8 * 1024 * 1024)))
+
+_SAMPLE_DTYPES = {1: "u1", 2: "<i2", 4: "<i4"}
+
+_np = None
+
+def load_numpy():
+    """numpy, imported on first use (it is the slowest import here), or None when missing."""
+    global _np
+    if _np is None:
+        try:
+            import numpy
+            _np = numpy
+        except ImportError:  # optional: without NumPy audio is uploaded untouched
+            _np = False
+    return _np or None
+
+def decode_wav(file_bytes: bytes):
+    """(float32 samples shaped (frames, channels) in [-1, 1], sample_rate), or None if not PCM WAV."""
+    if file_bytes[:4] != b'RIFF':
+        return None
+    np = load_numpy()
+    if np is None:
+        return None
+    try:
+        with wave.open(io.BytesIO(file_bytes), 'rb') as w:
+            width, channels, rate = w.getsampwidth(), w.getnchannels(), w.getframerate()
+            raw = w.readframes(w.getnframes())
+    except (wave.Error, EOFError):
+        return None
+    dtype = _SAMPLE_DTYPES.get(width)
+    if dtype is None:
+        return None
+    samples = np.frombuffer(raw, dtype=dtype)
+    samples = samples[:len(samples) - len(samples) % channels].reshape(-1, channels)
+    if width == 1:
+        return (samples.astype(np.float32) - 128.0) / 128.0, rate
+    return samples.astype(np.float32) / float(2 ** (8 * width - 1)), rate
+
+def encode_wav(samples, rate: int) -> bytes:
+    np = load_numpy()
+    pcm = (np.clip(samples, -1.0, 1.0) * 32767.0).astype('<i2')
+    buf = io.BytesIO()
+    with wave.open(buf, 'wb') as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        w.writeframes(pcm.tobytes())
+    return buf.getvalue()
+
+def voiced_span(mono, rate: int):
+    """(start, end) sample indices of the padded voiced region, or None when every frame is below VAD_MIN_DBFS."""
+    np = load_numpy()
+    frame = max(1, rate * VAD_FRAME_MS // 1000)
+    n = len(mono) // frame
+    if n == 0:
+        return None
+    frames = mono[:n * frame].reshape(n, frame)
+    db = 10.0 * np.log10(np.mean(frames * frames, axis=1) + 1e-12)
+    if float(db.max()) < VAD_MIN_DBFS:
+        return None
+    threshold = min(VAD_SPEECH_DBFS, max(VAD_MIN_DBFS, float(np.percentile(db, 10)) + VAD_MARGIN_DB))
+    voiced = np.flatnonzero(db > threshold)
+    if len(voiced) == 0:
+        # quiet but not silent: keep the whole clip rather than guess
+        return 0, len(mono)
+    pad = rate * VAD_PAD_MS // 1000
+    return max(0, voiced[0] * frame - pad), min(len(mono), (voiced[-1] + 1) * frame + pad)
+
+def resample(mono, rate: int, target: int = STT_SAMPLE_RATE):
+    np = load_numpy()
+    if rate == target or len(mono) == 0:
+        return mono
+    n = int(round(len(mono) * target / float(rate)))
+    positions = np.arange(n, dtype=np.float64) * (rate / float(target))
+    return np.interp(positions, np.arange(len(mono)), mono).astype(np.float32)
+
+def preprocess_audio(file_bytes: bytes):
+    """Trimmed 16 kHz mono WAV for a PCM WAV upload, b'' when it is all silence,
+    or the original bytes when it can't be decoded here."""
+    decoded = decode_wav(file_bytes)
+    if decoded is None:
+        return file_bytes
+    samples, rate = decoded
+    mono = samples.mean(axis=1) if samples.shape[1] > 1 else samples[:, 0]
+    span = voiced_span(mono, rate)
+    if span is None:
+        return b''
+    mono = mono[span[0]:span[1]]
+    if STT_RESAMPLE:
+        mono, rate = resample(mono, rate), STT_SAMPLE_RATE
+    return encode_wav(mono, rate)
 
 def _infer_content_type(filename: str) -> str:
     name = (filename or '').lower()
@@ -9,17 +122,41 @@ def _infer_content_type(filename: str) -> str:
     if name.endswith('.ogg') or name.endswith('.oga'): return 'audio/ogg'
     return 'application/octet-stream'
 
-def transcribe_audio_deepgram(file_bytes: bytes, filename: str = 'audio.wav') -> str:
+def transcribe_audio_deepgram(file_bytes, filename: str = 'audio.wav') -> str:
     """Transcribe audio using Deepgram REST API if DEEPGRAM_API_KEY is set.
     Returns transcript string. Fallback to configuration error if key is absent.
+    file_bytes may also be a seekable binary file (a spooled upload): small
+    WAV files are read for the VAD; everything else (webm, ogg, mp3, which the
+    VAD can't decode anyway, and large WAVs) is streamed as the request body.
     """
+    if not isinstance(file_bytes, (bytes, bytearray)):
+        file_bytes.seek(0)
+        is_wav = file_bytes.read(4) == b'RIFF'
+        if MOCK_MODE or (STT_VAD and is_wav and file_size(file_bytes) <= STT_VAD_MAX_BYTES):
+            file_bytes.seek(0)
+            file_bytes = file_bytes.read()
+    if MOCK_MODE:
+        # before the VAD: mock TTS output and other silent WAVs still get a transcript
+        return synthetic_transcript(file_bytes)
+    if STT_VAD and isinstance(file_bytes, (bytes, bytearray)):
+        file_bytes = preprocess_audio(file_bytes)
+        if not file_bytes:
+            # nothing but silence: no transcript, no STT call
+            return ''
     api_key = os.environ.get('DEEPGRAM_API_KEY')
     if not api_key:
         return "[configuration_error] Missing DEEPGRAM_API_KEY"
-    url = 'https://api.deepgram.com/v1/listen'
+    url = os.environ.get('DEEPGRAM_URL', 'https://api.deepgram.com/v1/listen')
+    if isinstance(file_bytes, (bytes, bytearray)):
+        head = file_bytes[:4]
+    else:
+        file_bytes.seek(0)
+        head = file_bytes.read(4)
+        file_bytes.seek(0)
     headers = {
         'Authorization': 'Token ' + api_key,
-        'Content-Type': _infer_content_type(filename),
+        # preprocessing may have turned the upload into WAV whatever its name
+        'Content-Type': 'audio/wav' if head == b'RIFF' else _infer_content_type(filename),
     }
     params = {
         # Prefer smart_format (punctuation, capitalization, numbers, dates, etc.)
@@ -35,16 +172,15 @@ def transcribe_audio_deepgram(file_bytes: bytes, filename: str = 'audio.wav') ->
         else:
             params['detect_language'] = 'true'
 
-        resp = requests.post(url, headers=headers, params=params, data=file_bytes, timeout=30)
-        try:
-            resp.raise_for_status()
-        except requests.HTTPError as he:
+        # pooled keep-alive session with retries and a circuit breaker
+        resp = get_provider('deepgram').request('POST', url, headers=headers, params=params, data=file_bytes)
+        if resp.status_code >= 400:
             detail = ''
             try:
                 detail = resp.text
             except Exception:
                 pass
-            return f"[deepgram_error] {he}: {detail}"
+            return f"[deepgram_error] {resp.status_code} {resp.reason}: {detail}"
         data = resp.json()
         # navigate Deepgram response
         transcript = ''
@@ -57,7 +193,8 @@ def transcribe_audio_deepgram(file_bytes: bytes, filename: str = 'audio.wav') ->
         return f"[deepgram_error] {e}"
 
 def transcribe_audio_mock(file_bytes: bytes) -> str:
-    return transcribe_audio_deepgram(file_bytes)
+    """Offline transcript, whatever PROVIDER_MODE is (see mock_providers)."""
+    return synthetic_transcript(file_bytes)
 
 if __name__ == '__main__':
     print('stt module OK')
@@ -0,0 +1,62 @@
+import os, json, time, tempfile, threading, unittest
+from agent_pool import AgentPool
+from personas import PERSONAS
+
+class SlowSmallest:
+    def __init__(self):
+        self.created = []
+        self.deleted = []
+        self.dead = set()
+        self._lock = threading.Lock()
+
+    def create_agent(self, display_name, persona_prompt, voice_config=None):
+        time.sleep(0.05)
+        with self._lock:
+            self.created.append(display_name)
+            return {'agent_id': f'agent_{len(self.created)}'}
+
+    def agent_alive(self, agent_id):
+        return agent_id not in self.dead
+
+    def delete_agent(self, agent_id):
+        self.deleted.append(agent_id)
+
+class TestAgentPool(unittest.TestCase):
+    def test_concurrent_first_sessions_create_one_agent(self):
+        smallest = SlowSmallest()
+        pool = AgentPool(smallest, path=None)
+        ids = []
+        threads = [threading.Thread(target=lambda: ids.append(pool.get('budget_shopper'))) for _ in range(20)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(smallest.created, ['Budget Shopper'])
+        self.assertEqual(set(ids), {'agent_1'})
+
+    def test_warm_persist_and_health(self):
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, 'agents.json')
+            smallest = SlowSmallest()
+            pool = AgentPool(smallest, path=path)
+            self.assertEqual(pool.warm(), 0)
+            self.assertEqual(len(smallest.created), len(PERSONAS))
+            # a restart reuses the saved agents
+            restarted = AgentPool(SlowSmallest(), path=path)
+            self.assertEqual(restarted.agents, pool.agents)
+            dead = pool.agents['budget_shopper']
+            smallest.dead.add(dead)
+            self.assertEqual(pool.check_health(), ['budget_shopper'])
+            self.assertEqual(smallest.deleted, [dead])
+            self.assertNotEqual(pool.agents['budget_shopper'], dead)
+            with open(path) as f:
+                self.assertEqual(json.load(f)['budget_shopper']['agent_id'], pool.agents['budget_shopper'])
+
+    def test_unwritable_map_path_still_returns_the_agent(self):
+        with tempfile.TemporaryDirectory() as d:
+            pool = AgentPool(SlowSmallest(), path=os.path.join(d, 'missing-dir', 'agents.json'))
+            self.assertEqual(pool.get('budget_shopper'), 'agent_1')
+            self.assertEqual(pool.get('budget_shopper'), 'agent_1')
+
+if __name__ == '__main__':
+    unittest.main()
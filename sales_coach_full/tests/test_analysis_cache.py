@@ -0,0 +1,70 @@
+import os, tempfile, unittest
+from analysis import AnalysisCache, analysis_cache_key
+import analysis
+
+MESSAGES = [{'role': 'rep', 'text': 'Our battery  lasts 5000 mAh.'}, {'role': 'customer', 'text': 'Price?'}]
+SPACED = [{'role': 'rep', 'text': ' Our battery lasts\n5000 mAh. '}, {'role': 'customer', 'text': 'Price?'}]
+
+class TestAnalysisCache(unittest.TestCase):
+    def test_key_is_the_exact_transcript(self):
+        self.assertEqual(analysis_cache_key(MESSAGES, 'openai'), analysis_cache_key([dict(m) for m in MESSAGES], 'openai'))
+        self.assertNotEqual(analysis_cache_key(MESSAGES, 'openai'), analysis_cache_key(MESSAGES, 'heuristic'))
+        # the heuristic scores all of these differently, so none may share an entry
+        capitalized = [{'role': 'Rep', 'text': MESSAGES[0]['text']}, MESSAGES[1]]
+        with_empty = MESSAGES + [{'role': 'rep', 'text': ''}]
+        keys = {analysis_cache_key(m, 'heuristic') for m in (MESSAGES, SPACED, capitalized, with_empty)}
+        self.assertEqual(len(keys), 4)
+
+    def test_whitespace_in_phrases_is_not_merged(self):
+        objection = [{'role': 'customer', 'text': 'I am not sure'}, {'role': 'rep', 'text': 'Fair enough.'}]
+        split = [{'role': 'customer', 'text': 'I am not\nsure'}, {'role': 'rep', 'text': 'Fair enough.'}]
+        cache = AnalysisCache()
+        for messages in (objection, split):
+            cached = cache.get_or_compute(messages, 'heuristic', lambda: (analysis.analyze_conversation_heuristic(messages), True))
+            direct = analysis.analyze_conversation_heuristic(messages)
+            self.assertEqual(cached['scores'], direct['scores'])
+            self.assertEqual(cached['transcript'], direct['transcript'])
+
+    def test_hit_returns_copy_and_counts_saved_time(self):
+        cache = AnalysisCache(max_entries=4)
+        calls = []
+        compute = lambda: (calls.append(1) or {'scores': {'rapport': 7}}, True)
+        first = cache.get_or_compute(MESSAGES, 'openai', compute)
+        first['scores']['rapport'] = 0
+        second = cache.get_or_compute(MESSAGES, 'openai', compute)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(second, {'scores': {'rapport': 7}})
+        stats = cache.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['hit_ratio']), (1, 1, 0.5))
+        self.assertGreaterEqual(stats['saved_seconds'], 0.0)
+
+    def test_uncacheable_results_are_recomputed(self):
+        cache = AnalysisCache()
+        calls = []
+        compute = lambda: (calls.append(1) or {'error': 'openai_call_failed'}, False)
+        cache.get_or_compute(MESSAGES, 'openai', compute)
+        cache.get_or_compute(MESSAGES, 'openai', compute)
+        self.assertEqual(len(calls), 2)
+
+    def test_disk_store_and_rubric_bump(self):
+        with tempfile.TemporaryDirectory() as d:
+            key = analysis_cache_key(MESSAGES, 'openai')
+            AnalysisCache(disk_dir=d, version='1').put(key, {'scores': {}}, 1.5)
+            reopened = AnalysisCache(disk_dir=d, version='1')
+            self.assertEqual(reopened.get(key), {'scores': {}})
+            self.assertEqual(reopened.stats()['saved_seconds'], 1.5)
+
+            original = analysis.ANALYSIS_RUBRIC_VERSION
+            analysis.ANALYSIS_RUBRIC_VERSION = '2'
+            try:
+                bumped_key = analysis_cache_key(MESSAGES, 'openai')
+            finally:
+                analysis.ANALYSIS_RUBRIC_VERSION = original
+            self.assertNotEqual(bumped_key, key)
+            bumped = AnalysisCache(disk_dir=d, version='2')
+            self.assertIsNone(bumped.get(key))
+            self.assertEqual(bumped.prune(), 1)
+            self.assertEqual(os.listdir(d), ['2'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+import unittest
+import random
+from analysis_heuristic import KeywordMatcher, MATCHER, RunningAnalysis, analyze_conversation_heuristic
+from messages import format_transcript
+
+class TestKeywordMatcher(unittest.TestCase):
+    def test_counts_distinct_overlapping_keywords(self):
+        counts = MATCHER.counts("that is too expensive, too expensive really")
+        # "too expensive" and "expensive" both match, each counted once
+        self.assertEqual(counts['objection'], 2)
+        self.assertEqual(counts['feature'], 0)
+
+    def test_keyword_in_several_categories(self):
+        matcher = KeywordMatcher({'a': ['Demo'], 'b': ['demo', 'trial']})
+        self.assertEqual(matcher.counts('book a demo'), {'a': 1, 'b': 1})
+
+    def test_missed_facts(self):
+        messages = [
+            {'role': 'rep', 'text': 'Hello there'},
+            {'role': 'customer', 'text': 'How many km per charge?'},
+        ]
+        res = analyze_conversation_heuristic(messages)
+        self.assertEqual(res['missed_facts_examples'], ['How many km per charge?'])
+        messages.append({'role': 'rep', 'text': 'About 400 km of range'})
+        self.assertEqual(analyze_conversation_heuristic(messages)['missed_facts_examples'], [])
+
+class TestRunningAnalysis(unittest.TestCase):
+    def test_incremental_matches_batch(self):
+        messages = [
+            {'role': 'rep', 'text': 'Hi'},
+            {'role': 'customer', 'text': "I'm not sure, it's too expensive"},
+            {'role': 'rep', 'text': 'I understand. We offer a warranty and a free trial.'},
+            {'role': 'customer', 'text': 'What is the battery range?'},
+            {'role': 'rep', 'text': 'Would you like a demo?'},
+        ]
+        running = RunningAnalysis()
+        for i, m in enumerate(messages):
+            running.add(m['role'], m['text'])
+            self.assertEqual(running.scores(), analyze_conversation_heuristic(messages[:i + 1])['scores'])
+        random.seed(1)
+        snap = running.snapshot(format_transcript(messages))
+        random.seed(1)
+        self.assertEqual(snap, analyze_conversation_heuristic(messages))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+import threading, time, unittest
+from analysis_queue import AnalysisQueue
+
+MESSAGES = [{'role': 'rep', 'text': 'Hello'}, {'role': 'customer', 'text': 'Hi'}]
+
+class TestAnalysisQueue(unittest.TestCase):
+    def setUp(self):
+        self.calls = []
+        self.done = []
+
+        def analyze_batch(items):
+            self.calls.append([item_id for item_id, _ in items])
+            time.sleep(0.05)
+            return {item_id: {'scores': {'n': len(messages)}} for item_id, messages in items}
+
+        self.queue = AnalysisQueue(on_done=lambda sid, result: self.done.append(sid),
+                                   batch_size=8, max_wait_s=0.1, analyze_batch=analyze_batch)
+
+    def test_concurrent_submits_share_one_call(self):
+        jobs = []
+        threads = [threading.Thread(target=lambda i=i: jobs.append(self.queue.submit(f's{i}', MESSAGES)))
+                   for i in range(5)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        results = [job.wait(2) for job in jobs]
+        self.assertEqual(len(self.calls), 1)
+        self.assertEqual(sorted(self.calls[0]), sorted(job.id for job in jobs))
+        self.assertEqual(results, [{'scores': {'n': 2}}] * 5)
+        self.assertEqual(sorted(self.done), [f's{i}' for i in range(5)])
+        self.assertTrue(all(self.queue.get(job.id).status == 'done' for job in jobs))
+
+    def test_same_session_reuses_pending_job(self):
+        first = self.queue.submit('s1', MESSAGES)
+        self.assertIs(self.queue.submit('s1', MESSAGES), first)
+        first.wait(2)
+        self.assertIsNot(self.queue.submit('s1', MESSAGES), first)
+
+    def test_failed_batch_marks_jobs_error(self):
+        def boom(items):
+            raise RuntimeError('down')
+        queue = AnalysisQueue(max_wait_s=0.01, analyze_batch=boom)
+        job = queue.submit('s1', MESSAGES)
+        self.assertEqual(job.wait(2)['error'], 'analysis_failed')
+        self.assertEqual(job.status, 'error')
+
+if __name__ == '__main__':
+    unittest.main()
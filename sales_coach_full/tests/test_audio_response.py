@@ -0,0 +1,31 @@
+import json, unittest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from audio_response import multipart_audio_response, audio_media_type
+
+class TestAudioResponse(unittest.TestCase):
+    def test_multipart_roundtrip(self):
+        audio = b'RIFF' + bytes(range(256)) * 600
+        app = FastAPI()
+
+        @app.get('/turn')
+        def turn():
+            return multipart_audio_response({'reply_text': 'Hi: there'}, audio)
+
+        resp = TestClient(app).get('/turn')
+        ctype = resp.headers['content-type']
+        self.assertTrue(ctype.startswith('multipart/form-data; boundary='))
+        boundary = ctype.split('boundary=')[1].encode()
+        parts = resp.content.split(b'--' + boundary)
+        meta = parts[1].split(b'\r\n\r\n', 1)[1].rstrip(b'\r\n')
+        self.assertEqual(json.loads(meta), {'reply_text': 'Hi: there'})
+        head, body = parts[2].split(b'\r\n\r\n', 1)
+        self.assertIn(b'Content-Type: audio/wav', head)
+        self.assertEqual(body[:-2], audio)
+
+    def test_media_type(self):
+        self.assertEqual(audio_media_type(b'ID3\x04'), 'audio/mpeg')
+        self.assertEqual(audio_media_type(b'\x00\x01'), 'application/octet-stream')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+import json, os, tempfile, unittest
+from batch import run_batch, iter_transcripts
+
+class TestBatch(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.input = os.path.join(self.tmp.name, 'in.jsonl')
+        with open(self.input, 'w') as f:
+            for i in range(25):
+                msgs = [{'role': 'rep', 'text': 'Would you like a demo?'}, {'role': 'customer', 'text': f'How many km? {i}'}]
+                f.write(json.dumps({'session_id': f'sess_{i}', 'messages': msgs}) + '\n')
+        self.output = os.path.join(self.tmp.name, 'out.jsonl')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def read_ids(self):
+        with open(self.output) as f:
+            return [json.loads(line)['id'] for line in f]
+
+    def test_run_and_resume(self):
+        report = run_batch(self.input, self.output, workers=2, chunk_size=10)
+        self.assertEqual(report['processed'], 25)
+        self.assertEqual(self.read_ids(), [f'sess_{i}' for i in range(25)])
+        # pretend the run stopped after the first chunk, with a partial second chunk written
+        with open(self.output + '.ckpt') as f:
+            state = json.load(f)
+        with open(self.output, 'rb') as f:
+            first_chunk_bytes = sum(len(line) for line in f.readlines()[:10])
+        with open(self.output + '.ckpt', 'w') as f:
+            json.dump({'done': 10, 'output_bytes': first_chunk_bytes}, f)
+        report = run_batch(self.input, self.output, workers=1, chunk_size=10, resume=True)
+        self.assertEqual((report['skipped'], report['processed']), (10, 15))
+        self.assertEqual(self.read_ids(), [f'sess_{i}' for i in range(25)])
+        self.assertEqual(state['done'], 25)
+
+    def test_bad_records_do_not_abort_the_run(self):
+        with open(self.input) as f:
+            lines = f.readlines()
+        lines[3] = '{"session_id": "sess_3", "messages": [\n'
+        lines[7] = '[1, 2]\n'
+        with open(self.input, 'w') as f:
+            f.writelines(lines)
+        report = run_batch(self.input, self.output, workers=2, chunk_size=10)
+        self.assertEqual((report['processed'], report['errors']), (25, 2))
+        # a resume from a checkpoint before the bad lines gets past them too
+        with open(self.output + '.ckpt', 'w') as f:
+            json.dump({'done': 0, 'output_bytes': 0}, f)
+        report = run_batch(self.input, self.output, workers=1, chunk_size=10, resume=True)
+        self.assertEqual(report['errors'], 2)
+        with open(self.output) as f:
+            rows = [json.loads(line) for line in f]
+        self.assertEqual(len(rows), 25)
+        self.assertEqual([r['id'] for r in rows if 'error' in r], ['in.jsonl:3', 'in.jsonl:7'])
+        self.assertIn('JSONDecodeError', rows[3]['error'])
+
+    def test_iter_directory(self):
+        d = os.path.join(self.tmp.name, 'dir')
+        os.makedirs(d)
+        with open(os.path.join(d, 'a.json'), 'w') as f:
+            json.dump({'messages': []}, f)
+        self.assertEqual([r['id'] for r in iter_transcripts(d)], ['a.json:0'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,33 @@
+import unittest
+from context import ContextWindow, build_reply_prompt, system_prefix, estimate_tokens
+
+def long_call(turns):
+    messages = []
+    for i in range(turns):
+        messages.append({'role': 'rep', 'text': f'Turn {i}: the battery is rated {4000 + i} mAh and we can talk about it more.'})
+        messages.append({'role': 'customer', 'text': f'Okay. Is option {i} covered by the warranty?'})
+    return messages
+
+class TestContextWindow(unittest.TestCase):
+    def test_window_is_bounded_and_summarizes(self):
+        ctx = ContextWindow(max_tokens=200, summary_tokens=60).sync(long_call(50))
+        prompt = ctx.prompt_messages('Budget shopper')
+        self.assertLessEqual(ctx.window_tokens, 200)
+        self.assertLessEqual(ctx.prompt_tokens('Budget shopper'), 200 + 60 + estimate_tokens(prompt[0]['content']) + 20)
+        self.assertEqual(prompt[-1]['content'], 'Okay. Is option 49 covered by the warranty?')
+        self.assertEqual(prompt[-1]['role'], 'assistant')
+        self.assertTrue(prompt[1]['content'].startswith('Earlier in the call'))
+        self.assertIn('mAh', prompt[1]['content'])
+
+    def test_incremental_matches_rebuild(self):
+        messages = long_call(30)
+        ctx = ContextWindow(max_tokens=150)
+        for n in range(1, len(messages) + 1):
+            incremental = build_reply_prompt(messages[:n], 'p', ctx)
+        self.assertEqual(incremental, build_reply_prompt(messages, 'p', ContextWindow(max_tokens=150)))
+
+    def test_persona_prefix_is_cached(self):
+        self.assertIs(system_prefix('Ask about price'), system_prefix('Ask about price'))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,28 @@
+import threading, unittest
+from unittest import mock
+from fastapi.testclient import TestClient
+from analysis_queue import AnalysisQueue
+
+class TestEndRoute(unittest.TestCase):
+    def test_slow_analysis_falls_back_to_the_job_status(self):
+        import app.main as main
+        main.session_mgr.sessions.create('sess_slow_end', 'agent_x', 'budget_shopper')
+        release = threading.Event()
+        def analyze_batch(items):
+            release.wait(5)
+            return {item_id: {'scores': {}} for item_id, _ in items}
+        queue = AnalysisQueue(on_done=lambda *a: None, batch_size=1, max_wait_s=0.0, analyze_batch=analyze_batch)
+        with mock.patch.object(main, 'openai_api_key', lambda: 'sk-test'), \
+                mock.patch.object(main, 'analysis_queue', queue), \
+                mock.patch.object(main, 'ANALYSIS_END_WAIT_SECONDS', 0.1):
+            resp = TestClient(main.app).post('/sessions/sess_slow_end/end')
+        release.set()
+        self.assertEqual(resp.status_code, 200)
+        body = resp.json()
+        self.assertNotIn('openai_analysis', body)
+        self.assertIn(body['status'], ('queued', 'running'))
+        self.assertEqual(body['status_url'], '/sessions/sess_slow_end/analysis')
+        self.assertEqual(queue.get(body['job_id']).wait(5), {'scores': {}})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,30 @@
+import unittest
+import metrics
+from metrics import Histogram
+
+class TestMetrics(unittest.TestCase):
+    def test_histogram_render(self):
+        h = Histogram('t_seconds', 'test', buckets=(0.1, 1.0))
+        h.observe(('stt', 'p', 'deepgram'), 0.05)
+        h.observe(('stt', 'p', 'deepgram'), 0.5)
+        h.observe(('stt', 'p', 'deepgram'), 3.0)
+        text = h.render()
+        self.assertIn('# TYPE t_seconds histogram', text)
+        self.assertIn('t_seconds_bucket{stage="stt",persona="p",provider="deepgram",le="0.1"} 1', text)
+        self.assertIn('t_seconds_bucket{stage="stt",persona="p",provider="deepgram",le="1.0"} 2', text)
+        self.assertIn('t_seconds_bucket{stage="stt",persona="p",provider="deepgram",le="+Inf"} 3', text)
+        self.assertIn('t_seconds_count{stage="stt",persona="p",provider="deepgram"} 3', text)
+
+    def test_span_noop_when_disabled(self):
+        old = metrics.METRICS_ENABLED
+        metrics.METRICS_ENABLED = False
+        try:
+            with metrics.span('stt', 'nobody') as s:
+                pass
+            self.assertIs(s, metrics._NOOP)
+        finally:
+            metrics.METRICS_ENABLED = old
+        self.assertNotIn('persona="nobody"', metrics.render_prometheus())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,26 @@
+import unittest
+from mock_providers import synthetic_wav, synthetic_transcript, audio_seconds, mock_agent_id, MOCK_PITCH
+from smallest_wrapper import SmallestClientWrapper
+from tts_cache import TTSCache
+
+class TestMockProviders(unittest.TestCase):
+    def test_wav_length_follows_text(self):
+        short, long = synthetic_wav('Hi there.'), synthetic_wav('Hi there. ' * 10)
+        self.assertTrue(short.startswith(b'RIFF'))
+        self.assertAlmostEqual(audio_seconds(long) / audio_seconds(short), 100 / 9, places=1)
+
+    def test_transcript_is_deterministic(self):
+        audio = synthetic_wav('x' * 200)  # 14 s of audio
+        self.assertEqual(synthetic_transcript(audio), synthetic_transcript(audio))
+        self.assertEqual(synthetic_transcript(audio), ' '.join(MOCK_PITCH[:4]))
+        self.assertEqual(synthetic_transcript(b'fake'), MOCK_PITCH[0])
+
+    def test_wrapper_needs_no_key_or_sdk(self):
+        w = SmallestClientWrapper(force_mock=True, tts_cache=TTSCache(max_bytes=1 << 20))
+        agent = w.create_agent('Budget Shopper', 'prompt')['agent_id']
+        self.assertEqual(agent, mock_agent_id('Budget Shopper', 'prompt'))
+        self.assertEqual(w.synthesize_tts_bytes('Hello'), synthetic_wav('Hello'))
+        w.delete_agent(agent)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+import json, os, threading, time, unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from providers import ProviderClient, ProviderUnavailable
+import stt
+
+class FakeProvider(BaseHTTPRequestHandler):
+    """Fails the first `fail_first` requests with 503, sleeping `latency_s` before each reply."""
+    protocol_version = 'HTTP/1.1'
+    fail_first = 0
+    latency_s = 0.0
+    requests_seen = 0
+    client_ports = set()
+
+    def do_POST(self):
+        cls = type(self)
+        self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        cls.requests_seen += 1
+        cls.client_ports.add(self.client_address[1])
+        time.sleep(cls.latency_s)
+        if cls.requests_seen <= cls.fail_first:
+            status, body = 503, b'busy'
+        else:
+            status = 200
+            body = json.dumps({'results': {'channels': [{'alternatives': [{'transcript': 'hello there'}]}]}}).encode()
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+def make_client(**overrides):
+    cfg = dict(max_concurrency=4, timeout_s=2.0, deadline_s=5.0, retries=2,
+               backoff_base_s=0.01, breaker_threshold=2, breaker_cooldown_s=60.0)
+    cfg.update(overrides)
+    return ProviderClient('fake', **cfg)
+
+class TestProviders(unittest.TestCase):
+    def setUp(self):
+        self.handler = type('Handler', (FakeProvider,), {'client_ports': set()})
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), self.handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}/v1/listen'
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_keep_alive_reuses_connection(self):
+        client = make_client()
+        for _ in range(5):
+            self.assertEqual(client.request('POST', self.url, data=b'x').status_code, 200)
+        self.assertEqual(len(self.handler.client_ports), 1)
+
+    def test_retries_transient_errors(self):
+        self.handler.fail_first = 2
+        resp = make_client().request('POST', self.url, data=b'x')
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(self.handler.requests_seen, 3)
+
+    def test_breaker_opens_and_fails_fast(self):
+        self.handler.fail_first = 100
+        client = make_client(retries=0)
+        self.assertEqual(client.request('POST', self.url, data=b'x').status_code, 503)
+        self.assertEqual(client.request('POST', self.url, data=b'x').status_code, 503)
+        with self.assertRaises(ProviderUnavailable):
+            client.request('POST', self.url, data=b'x')
+        self.assertEqual(self.handler.requests_seen, 2)
+
+    def test_half_open_trial_closes_breaker(self):
+        self.handler.fail_first = 1
+        client = make_client(retries=0, breaker_threshold=1, breaker_cooldown_s=0.0)
+        self.assertEqual(client.request('POST', self.url, data=b'x').status_code, 503)
+        self.assertEqual(client.breaker.state, 'half_open')
+        self.assertEqual(client.request('POST', self.url, data=b'x').status_code, 200)
+        self.assertEqual(client.breaker.state, 'closed')
+
+    def test_deadline_bounds_slow_provider(self):
+        self.handler.latency_s = 1.0
+        client = make_client(timeout_s=0.2, deadline_s=0.5, retries=5)
+        t0 = time.monotonic()
+        with self.assertRaises(Exception):
+            client.request('POST', self.url, data=b'x')
+        self.assertLess(time.monotonic() - t0, 1.0)
+
+    def test_stt_against_fake_deepgram(self):
+        env = {'DEEPGRAM_URL': self.url, 'DEEPGRAM_API_KEY': 'test'}
+        old = {k: os.environ.get(k) for k in env}
+        os.environ.update(env)
+        try:
+            self.assertEqual(stt.transcribe_audio_deepgram(b'RIFF', filename='a.wav'), 'hello there')
+        finally:
+            for k, v in old.items():
+                if v is None:
+                    os.environ.pop(k, None)
+                else:
+                    os.environ[k] = v
+
+if __name__ == '__main__':
+    unittest.main()
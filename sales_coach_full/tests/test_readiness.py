@@ -0,0 +1,29 @@
+import json, os, sys, unittest
+from unittest import mock
+from smallest_wrapper import SmallestClientWrapper
+
+class TestLazyProviders(unittest.TestCase):
+    def test_missing_key_fails_on_first_use_not_construction(self):
+        with mock.patch.dict(os.environ, {}, clear=False):
+            os.environ.pop('SMALLEST_API_KEY', None)
+            wrapper = SmallestClientWrapper()
+        with self.assertRaises(RuntimeError):
+            wrapper.waves_client
+        self.assertNotIn('smallestai.waves.waves_client', sys.modules)
+
+    def test_ready_reports_failed_checks(self):
+        import app.main as main
+        with mock.patch.object(main.smallest, 'api_key', None), mock.patch.object(main, 'TTS_WARMUP', False), \
+                mock.patch.dict(main.readiness, {'ready': False, 'checks': {}}):
+            if main.smallest.mock:
+                self.skipTest('mock provider mode builds clients eagerly')
+            main.warm_up()
+            resp = main.ready()
+            self.assertEqual(resp.status_code, 503)
+            body = json.loads(resp.body)
+            self.assertIn('SMALLEST_API_KEY', body['checks']['smallest'])
+            self.assertEqual(body['checks']['http'], 'ok')
+        self.assertEqual(main.health(), {'status': 'ok'})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+import os, time, tempfile, unittest
+import numpy as np
+from score_store import ScoreStore, SCORE_KEYS, ANONYMOUS_REP
+
+DAY = 86400
+
+def _random_store(rows=5000, seed=1, **kwargs):
+    rng = np.random.default_rng(seed)
+    store = ScoreStore(path=None, **kwargs)
+    reps = rng.choice(['ana', 'bo', 'cy', 'di'], rows)
+    personas = rng.choice(['feature_engineer', 'price_sensitive'], rows)
+    scores = rng.integers(1, 11, (rows, len(SCORE_KEYS)))
+    ts = rng.uniform(0, 30 * DAY, rows)
+    store.extend(reps, personas, scores, ts)
+    return store, reps, personas, scores, ts
+
+class TestScoreStore(unittest.TestCase):
+    def test_leaderboard_matches_python(self):
+        store, reps, _, scores, _ = _random_store()
+        board = store.leaderboard('closing', limit=4)
+        closing = scores[:, SCORE_KEYS.index('closing')]
+        expected = sorted(((closing[reps == r].mean(), r) for r in set(reps)), reverse=True)
+        self.assertEqual([row['rep_id'] for row in board], [r for _, r in expected])
+        self.assertAlmostEqual(board[0]['closing'], round(expected[0][0], 2))
+        overall = store.leaderboard(min_sessions=10 ** 6)
+        self.assertEqual(overall, [])
+        with self.assertRaises(ValueError):
+            store.leaderboard('charm')
+
+    def test_percentiles_are_nearest_rank(self):
+        store, _, personas, scores, ts = _random_store()
+        since = 10 * DAY
+        result = store.persona_percentiles((10, 50, 95), since=since)
+        keep = (personas == 'price_sensitive') & (ts >= since)
+        self.assertEqual(result['price_sensitive']['sessions'], int(keep.sum()))
+        for j, key in enumerate(SCORE_KEYS):
+            expected = np.percentile(scores[keep, j], [10, 50, 95], method='inverted_cdf')
+            got = [result['price_sensitive'][key][p] for p in ('p10', 'p50', 'p95')]
+            self.assertEqual(got, [int(v) for v in expected])
+
+    def test_rep_trend_by_day(self):
+        store = ScoreStore(path=None)
+        store.append('ana', 'feature_engineer', {'rapport': 4, 'objection_handling': 8, 'product_knowledge': 6, 'closing': 2}, ts=DAY + 10)
+        store.append('ana', 'feature_engineer', {'rapport': 6, 'objection_handling': 8, 'product_knowledge': 6, 'closing': 4}, ts=DAY + 20)
+        store.append('ana', 'feature_engineer', {'rapport': 9, 'objection_handling': 9, 'product_knowledge': 9, 'closing': 9}, ts=3 * DAY)
+        store.append('bo', 'feature_engineer', {'rapport': 1, 'objection_handling': 1, 'product_knowledge': 1, 'closing': 1}, ts=DAY)
+        trend = store.rep_trend('ana')
+        self.assertEqual([(t['period_start'], t['sessions'], t['rapport'], t['closing']) for t in trend],
+                         [(DAY, 2, 5.0, 3.0), (3 * DAY, 1, 9.0, 9.0)])
+        self.assertEqual(store.rep_trend('nobody'), [])
+
+    def test_segments_round_trip(self):
+        with tempfile.TemporaryDirectory() as d:
+            store = ScoreStore(path=d, segment_rows=3, flush_rows=1)
+            for i in range(7):
+                store.append(f'rep{i % 2}', 'feature_engineer', dict.fromkeys(SCORE_KEYS, i + 1), ts=i)
+            # two full segments plus the open one holding the seventh row
+            self.assertEqual(len(os.listdir(d)), 3)
+            store.close()
+            reopened = ScoreStore(path=d)
+            self.assertEqual(reopened.leaderboard(), store.leaderboard())
+            self.assertEqual(reopened.stats()['sessions'], 7)
+
+    def test_trend_after_restart_loads_segments(self):
+        with tempfile.TemporaryDirectory() as d:
+            store = ScoreStore(path=d)
+            store.append('ana', 'feature_engineer', dict.fromkeys(SCORE_KEYS, 5), ts=DAY)
+            store.close()
+            self.assertEqual(ScoreStore(path=d).rep_trend('ana')[0]['sessions'], 1)
+
+    def test_unclosed_rows_are_flushed(self):
+        with tempfile.TemporaryDirectory() as d:
+            by_rows = ScoreStore(path=d, flush_rows=2, flush_seconds=60)
+            by_time = ScoreStore(path=d, flush_rows=100, flush_seconds=0.05)
+            for store in (by_rows, by_rows, by_time):
+                store.append('ana', 'feature_engineer', dict.fromkeys(SCORE_KEYS, 5))
+            time.sleep(0.3)
+            # two stores on one directory (two workers) never overwrite each other's segments
+            self.assertEqual(ScoreStore(path=d).stats()['sessions'], 3)
+
+    def test_workers_see_each_others_new_rows(self):
+        with tempfile.TemporaryDirectory() as d:
+            a, b = ScoreStore(path=d, flush_rows=1), ScoreStore(path=d, flush_rows=1)
+            a.append('ana', 'feature_engineer', dict.fromkeys(SCORE_KEYS, 5))
+            b.append('bo', 'feature_engineer', dict.fromkeys(SCORE_KEYS, 7))
+            self.assertEqual(len(b.leaderboard()), 2)
+            # a rewrites its open segment; b reads only the new row from it
+            a.append('ana', 'feature_engineer', dict.fromkeys(SCORE_KEYS, 9))
+            board = {row['rep_id']: row for row in b.leaderboard()}
+            self.assertEqual((board['ana']['sessions'], board['ana']['overall']), (2, 7.0))
+            self.assertEqual(b.stats()['sessions'], 3)
+            # b's own rows are written once, whatever it read in between
+            b.close()
+            self.assertEqual(ScoreStore(path=d).stats()['sessions'], 3)
+
+    def test_anonymous_rows_are_not_ranked(self):
+        store = ScoreStore(path=None)
+        store.append(None, 'feature_engineer', dict.fromkeys(SCORE_KEYS, 10))
+        store.append('ana', 'feature_engineer', dict.fromkeys(SCORE_KEYS, 3))
+        self.assertEqual([row['rep_id'] for row in store.leaderboard()], ['ana'])
+        self.assertEqual(store.rep_trend(ANONYMOUS_REP), [])
+        self.assertEqual(store.persona_percentiles()['feature_engineer']['sessions'], 2)
+
+if __name__ == '__main__':
+    unittest.main()
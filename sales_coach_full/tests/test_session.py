@@ -1,5 +1,6 @@
-import unittest
+import time, unittest, base64
 from session_manager import SessionManager
+from session_store import MemorySessionStore
 from smallest_wrapper import SmallestClientWrapper
 
 class TestSessionManagerMock(unittest.TestCase):
@@ -13,7 +14,8 @@ class TestSessionManagerMock(unittest.TestCase):
         # send a rep message
         reply, tts = self.sm.send_rep_message(session_id, 'Hello, can I tell you about range and battery?')
         self.assertIsInstance(reply, str)
-        self.assertTrue(tts.startswith('BASE64_AUDIO_'))
+        # mock TTS is a synthetic WAV
+        self.assertTrue(base64.b64decode(tts).startswith(b'RIFF'))
         # end and analyze
         analysis = self.sm.end_and_analyze(session_id)
         self.assertIn('scores', analysis)
@@ -21,6 +23,33 @@ class TestSessionManagerMock(unittest.TestCase):
         self.assertIn('rapport', scores)
         self.assertIn('product_knowledge', scores)
 
+    def test_end_records_scores_once(self):
+        session_id, _ = self.sm.create_session('feature_engineer', rep_id='rep-7')
+        self.sm.send_rep_message(session_id, 'The battery lasts two days.')
+        analysis = self.sm.end_and_analyze(session_id)
+        self.sm.end_and_analyze(session_id)
+        self.assertEqual(self.sm.scores.n, 1)
+        trend = self.sm.scores.rep_trend('rep-7')
+        self.assertEqual(trend[0]['sessions'], 1)
+        self.assertEqual(trend[0]['rapport'], analysis['scores']['rapport'])
+
+    def test_empty_injected_store_is_used(self):
+        store = MemorySessionStore(max_sessions=5)
+        sm = SessionManager(self.wrapper, store=store)
+        self.assertIs(sm.sessions, store)
+        for _ in range(8):
+            sm.create_session('feature_engineer')
+        self.assertEqual(len(store), 5)
+
+    def test_per_process_state_is_bounded_like_the_store(self):
+        sm = SessionManager(self.wrapper, store=MemorySessionStore(max_sessions=5, ttl_seconds=0.05))
+        ids = [sm.create_session('feature_engineer')[0] for _ in range(50)]
+        sm.reply_context(ids[-1])
+        self.assertEqual(len(sm.live), 5)
+        time.sleep(0.1)
+        self.assertEqual(sm.expire_live(), 5)
+        self.assertEqual((len(sm.live), len(sm.contexts)), (0, 0))
+
     def test_unknown_persona(self):
         with self.assertRaises(ValueError):
             self.sm.create_session('nonexistent_persona')
@@ -0,0 +1,70 @@
+import os, tempfile, unittest
+from session_store import SessionStore, MemorySessionStore, SQLiteSessionStore, make_session_store
+
+class StoreContract:
+    def make_store(self, ttl_seconds=3600):
+        raise NotImplementedError
+
+    def test_create_append_get(self):
+        store = self.make_store()
+        store.create('sess_a', 'agent_1', 'budget_shopper')
+        store.append_message('sess_a', 'rep', 'Hi: there\nsecond line')
+        store.append_message('sess_a', 'customer', 'Any discount?')
+        store.set_field('sess_a', 'analysis', {'scores': {'closing': 5}})
+        session = store.get('sess_a')
+        self.assertEqual(session['agent_id'], 'agent_1')
+        self.assertEqual([m['role'] for m in session['messages']], ['rep', 'customer'])
+        self.assertEqual(session['messages'][0]['text'], 'Hi: there\nsecond line')
+        self.assertEqual(session['analysis']['scores']['closing'], 5)
+        self.assertIn('sess_a', store)
+        self.assertNotIn('sess_missing', store)
+
+    def test_expire_idle(self):
+        store = self.make_store(ttl_seconds=-1)
+        store.create('sess_a', 'agent_1', 'budget_shopper')
+        self.assertIsNone(store.get('sess_a'))
+        with self.assertRaises(ValueError):
+            store.append_message('sess_a', 'rep', 'hello')
+        store.expire()
+
+class TestMemorySessionStore(StoreContract, unittest.TestCase):
+    def make_store(self, ttl_seconds=3600):
+        return MemorySessionStore(max_sessions=2, ttl_seconds=ttl_seconds)
+
+    def test_lru_eviction(self):
+        store = self.make_store()
+        for sid in ('s1', 's2'):
+            store.create(sid, 'a', 'p')
+        store.get('s1')
+        store.create('s3', 'a', 'p')
+        self.assertIn('s1', store)
+        self.assertNotIn('s2', store)
+
+class TestSQLiteSessionStore(StoreContract, unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def make_store(self, ttl_seconds=3600):
+        return SQLiteSessionStore(os.path.join(self.tmp.name, 'sessions.db'), ttl_seconds=ttl_seconds)
+
+    def test_survives_reopen(self):
+        self.make_store().create('sess_a', 'agent_1', 'budget_shopper')
+        self.make_store().append_message('sess_a', 'rep', 'hello')
+        self.assertEqual(self.make_store().get('sess_a')['messages'], [{'role': 'rep', 'text': 'hello'}])
+
+    def test_make_session_store(self):
+        store = make_session_store('sqlite:///' + os.path.join(self.tmp.name, 'x.db'))
+        self.assertIsInstance(store, SQLiteSessionStore)
+
+class TestSessionStoreInterface(unittest.TestCase):
+    def test_incomplete_backend_fails_on_construction(self):
+        class NoExpire(SessionStore):
+            create = get = append_message = set_field = delete = __contains__ = lambda *a: None
+        with self.assertRaises(TypeError):
+            NoExpire()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+import asyncio, time, unittest
+from reply import CANNED_REPLIES, KEYWORD_REPLIES
+import speculation
+from speculation import Speculation, likely_reply_sets
+from metrics import SPECULATIVE_TTS
+
+PRICE, BATTERY = KEYWORD_REPLIES[0][1], KEYWORD_REPLIES[1][1]
+
+class FakeSmallest:
+    def __init__(self):
+        self.synthesized = []
+
+    def is_cached(self, text):
+        return False
+
+    def synthesize_tts_bytes(self, text):
+        time.sleep(0.05)
+        self.synthesized.append(text)
+        return text.encode('utf-8')
+
+class TestSpeculation(unittest.TestCase):
+    def test_likely_sets_follow_history_then_persona(self):
+        messages = [{'role': 'rep', 'text': 'Our battery range is great, battery lasts'}]
+        sets = likely_reply_sets(messages, 'Ask about discounts and total cost', k=3)
+        self.assertEqual([id(s) for s in sets], [id(BATTERY), id(PRICE), id(CANNED_REPLIES)])
+        self.assertEqual([id(s) for s in likely_reply_sets([], '', k=2)], [id(CANNED_REPLIES)])
+
+    def test_commit_hit_and_miss(self):
+        async def turn(transcript):
+            smallest = FakeSmallest()
+            spec = Speculation(smallest).start([BATTERY, PRICE])
+            return await spec.commit(transcript)
+
+        text, audio = asyncio.run(turn('the battery holds 5000 mAh'))
+        self.assertIn(text, BATTERY)
+        self.assertEqual(audio, text.encode('utf-8'))
+        self.assertIsNone(asyncio.run(turn('we ship next week, delivery is free')))
+
+    def test_running_loser_is_wasted_and_holds_its_slot(self):
+        async def turn():
+            spec = Speculation(FakeSmallest()).start([BATTERY, PRICE])
+            await asyncio.sleep(0.01)  # both syntheses are now running on the pool
+            self.assertIsNone(await spec.commit('we ship next week, delivery is free'))
+            return speculation._in_flight
+
+        time.sleep(0.1)  # let losers of earlier tests finish
+        wasted = SPECULATIVE_TTS.value(('wasted',))
+        cancelled = SPECULATIVE_TTS.value(('cancelled',))
+        in_flight = asyncio.run(turn())
+        self.assertEqual(in_flight, 2)
+        self.assertEqual(SPECULATIVE_TTS.value(('wasted',)) - wasted, 2)
+        self.assertEqual(SPECULATIVE_TTS.value(('cancelled',)), cancelled)
+        time.sleep(0.1)
+        self.assertEqual(speculation._in_flight, 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+import unittest
+from unittest import mock
+from fastapi import FastAPI, WebSocket
+from fastapi.testclient import TestClient
+import streaming
+from streaming import split_sentences, stream_voice_turns
+from session_manager import SessionManager
+
+class FakeSmallest:
+    def create_agent(self, display_name, persona_prompt, voice_config=None):
+        return {'agent_id': 'agent_fake'}
+
+    def synthesize_tts_bytes(self, text, voice_id=None):
+        return text.encode('utf-8')
+
+class TestStreaming(unittest.TestCase):
+    def test_split_sentences(self):
+        self.assertEqual(split_sentences("Is there a discount? What's the final price"),
+                         ["Is there a discount?", "What's the final price"])
+        self.assertEqual(split_sentences(''), [])
+
+    def test_websocket_turn(self):
+        app = FastAPI()
+        sm = SessionManager(FakeSmallest())
+        session_id, _ = sm.create_session('budget_shopper')
+
+        @app.websocket('/ws')
+        async def ws(websocket: WebSocket):
+            await websocket.accept()
+            await stream_voice_turns(websocket, sm, session_id, '', FakeSmallest())
+
+        with TestClient(app).websocket_connect('/ws') as ws:
+            ws.send_bytes(b'RIFF0000')
+            ws.send_json({'type': 'end'})
+            events = []
+            while True:
+                evt = ws.receive_json()
+                events.append(evt['type'])
+                if evt['type'] == 'audio':
+                    self.assertEqual(ws.receive_bytes(), evt['text'].encode('utf-8'))
+                if evt['type'] == 'turn_end':
+                    break
+        self.assertEqual(events[:2], ['transcript', 'reply_text'])
+        self.assertIn('audio', events)
+        self.assertEqual([m['role'] for m in sm.get_session(session_id)['messages']], ['rep', 'customer'])
+
+    def test_partials_bill_less_than_the_utterance(self):
+        app = FastAPI()
+        sm = SessionManager(FakeSmallest())
+        session_id, _ = sm.create_session('budget_shopper')
+        sent = []
+
+        def transcribe(audio, filename=None):
+            sent.append(len(audio))
+            return 'partial'
+
+        @app.websocket('/ws')
+        async def ws(websocket: WebSocket):
+            await websocket.accept()
+            await stream_voice_turns(websocket, sm, session_id, '', FakeSmallest())
+
+        with mock.patch.object(streaming, 'transcribe_audio_deepgram', transcribe), \
+                mock.patch.object(streaming, 'WS_PARTIAL_INTERVAL_S', 0.0), \
+                TestClient(app).websocket_connect('/ws') as ws:
+            for _ in range(200):
+                ws.send_bytes(b'x' * 100)
+            ws.send_json({'type': 'end'})
+            while '"turn_end"' not in (ws.receive().get('text') or ''):
+                pass
+        # at most WS_MAX_PARTIALS partials plus the final, doubling in size each time
+        self.assertLessEqual(len(sent), streaming.WS_MAX_PARTIALS + 1, sent)
+        self.assertLessEqual(sum(sent), 2 * 20000, sent)
+
+    def test_endless_utterance_is_closed(self):
+        app = FastAPI()
+        sm = SessionManager(FakeSmallest())
+        session_id, _ = sm.create_session('budget_shopper')
+
+        @app.websocket('/ws')
+        async def ws(websocket: WebSocket):
+            await websocket.accept()
+            await stream_voice_turns(websocket, sm, session_id, '', FakeSmallest())
+
+        with mock.patch.object(streaming, 'UPLOAD_MAX_BYTES', 1000), \
+                mock.patch.object(streaming, 'transcribe_audio_deepgram', lambda *a, **k: ''), \
+                TestClient(app).websocket_connect('/ws') as ws:
+            for _ in range(11):
+                ws.send_bytes(b'x' * 100)
+            msg = ws.receive()
+        self.assertEqual((msg['type'], msg['code']), ('websocket.close', streaming.WS_CLOSE_TOO_BIG))
+
+if __name__ == '__main__':
+    unittest.main()
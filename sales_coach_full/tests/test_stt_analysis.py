@@ -1,6 +1,7 @@
 import unittest
 from stt import transcribe_audio_mock, transcribe_audio_deepgram
 from analysis import analyze_with_openai
+from messages import MessageLog
 import os
 
 class TestSTTAndAnalysis(unittest.TestCase):
@@ -20,5 +21,16 @@ class TestSTTAndAnalysis(unittest.TestCase):
         res = analyze_with_openai(transcript)
         self.assertIn('scores', res)
 
+    def test_analysis_accepts_structured_messages(self):
+        # colons and newlines inside an utterance must survive (no string round-trip)
+        log = MessageLog([{'role': 'rep', 'text': 'Specs:\nbattery 5000 mAh'}])
+        log.append('customer', 'Ratio: 2:1?')
+        self.assertEqual(list(log), [{'role': 'rep', 'text': 'Specs:\nbattery 5000 mAh'},
+                                     {'role': 'customer', 'text': 'Ratio: 2:1?'}])
+        self.assertEqual(log[-1]['role'], 'customer')
+        res = analyze_with_openai(log)
+        self.assertEqual(res['scores']['product_knowledge'], 7)
+        self.assertEqual(res['transcript'], 'rep: Specs:\nbattery 5000 mAh\ncustomer: Ratio: 2:1?')
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,58 @@
+import io, wave, unittest
+from unittest import mock
+import numpy as np
+import stt
+from stt import preprocess_audio, transcribe_audio_deepgram, VAD_PAD_MS
+from mock_providers import synthetic_wav, synthetic_transcript
+
+def encode(mono, rate=48000, channels=2):
+    pcm = (np.repeat(mono[:, None], channels, axis=1) * 32767).astype('<i2')
+    buf = io.BytesIO()
+    with wave.open(buf, 'wb') as w:
+        w.setnchannels(channels)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        w.writeframes(pcm.tobytes())
+    return buf.getvalue()
+
+def make_wav(seconds_silence, seconds_tone, rate=48000, channels=2, noise=0.001):
+    rng = np.random.default_rng(0)
+    n_sil, n_tone = int(seconds_silence * rate), int(seconds_tone * rate)
+    t = np.arange(n_tone) / rate
+    mono = np.concatenate([np.zeros(n_sil), 0.3 * np.sin(2 * np.pi * 220 * t), np.zeros(n_sil)])
+    mono = mono + noise * rng.standard_normal(len(mono))
+    return encode(mono, rate, channels)
+
+class TestSTTPreprocess(unittest.TestCase):
+    def test_trims_downmixes_and_resamples(self):
+        out = preprocess_audio(make_wav(2.0, 1.0))
+        with wave.open(io.BytesIO(out), 'rb') as w:
+            self.assertEqual((w.getnchannels(), w.getframerate()), (1, 16000))
+            seconds = w.getnframes() / 16000.0
+        self.assertAlmostEqual(seconds, 1.0 + 2 * VAD_PAD_MS / 1000.0, delta=0.05)
+
+    def test_all_silence_skips_stt(self):
+        self.assertEqual(preprocess_audio(make_wav(1.5, 0.0)), b'')
+        self.assertEqual(transcribe_audio_deepgram(make_wav(1.5, 0.0)), '')
+
+    def test_loud_clip_without_pauses_is_kept(self):
+        # push-to-talk clip cut right at the speech: -10 dBFS tone, 50-70% amplitude-modulated at 4 Hz
+        rate = 48000
+        t = np.arange(int(1.5 * rate)) / rate
+        envelope = 0.6 + 0.1 * np.sin(2 * np.pi * 4 * t)
+        mono = (10 ** (-10 / 20.0)) * np.sqrt(2) * envelope / 0.7 * np.sin(2 * np.pi * 220 * t)
+        out = preprocess_audio(encode(mono, rate))
+        with wave.open(io.BytesIO(out), 'rb') as w:
+            self.assertAlmostEqual(w.getnframes() / 16000.0, 1.5, delta=0.05)
+
+    def test_mock_mode_transcribes_silent_wav(self):
+        silent = synthetic_wav('Hello there, how can I help?')
+        with mock.patch.object(stt, 'MOCK_MODE', True):
+            self.assertEqual(transcribe_audio_deepgram(silent), synthetic_transcript(silent))
+
+    def test_compressed_audio_passes_through(self):
+        webm = b'\x1aE\xdf\xa3' + b'\x00' * 100
+        self.assertIs(preprocess_audio(webm), webm)
+
+if __name__ == '__main__':
+    unittest.main()
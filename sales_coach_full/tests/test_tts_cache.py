@@ -0,0 +1,39 @@
+import os, tempfile, unittest
+from tts_cache import TTSCache, cache_key
+
+class TestTTSCache(unittest.TestCase):
+    def test_key_depends_on_voice_and_params(self):
+        self.assertEqual(cache_key('Hi', 'v1', speed=1.0), cache_key('Hi', 'v1', speed=1.0))
+        self.assertNotEqual(cache_key('Hi', 'v1'), cache_key('Hi', 'v2'))
+        self.assertNotEqual(cache_key('Hi', 'v1'), cache_key('Hi', 'v1', speed=1.2))
+
+    def test_lru_bounded_by_bytes(self):
+        cache = TTSCache(max_bytes=10, disk_dir=None)
+        cache.put('a', b'12345')
+        cache.put('b', b'12345')
+        cache.get('a')
+        cache.put('c', b'123')
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), b'12345')
+        stats = cache.stats()
+        self.assertEqual((stats['evictions'], stats['hits_memory'], stats['misses']), (1, 2, 1))
+        self.assertLessEqual(stats['bytes'], 10)
+
+    def test_disk_tier(self):
+        with tempfile.TemporaryDirectory() as d:
+            TTSCache(max_bytes=100, disk_dir=d).put('k' * 64, b'audio')
+            cache = TTSCache(max_bytes=100, disk_dir=d)
+            self.assertEqual(cache.get('k' * 64), b'audio')
+            self.assertEqual(cache.get('k' * 64), b'audio')
+            self.assertEqual((cache.stats()['hits_disk'], cache.stats()['hits_memory']), (1, 1))
+
+    def test_disk_write_errors_are_ignored(self):
+        with tempfile.TemporaryDirectory() as d:
+            # a file where the key's subdirectory should go makes every write fail
+            open(os.path.join(d, 'kk'), 'w').close()
+            cache = TTSCache(max_bytes=100, disk_dir=d)
+            cache.put('k' * 64, b'audio')
+            self.assertEqual(cache.get('k' * 64), b'audio')
+
+if __name__ == '__main__':
+    unittest.main()
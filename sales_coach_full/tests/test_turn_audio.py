@@ -0,0 +1,59 @@
+import asyncio, threading, time, unittest
+from turn_audio import TurnAudioStore
+
+class TestTurnAudioStore(unittest.TestCase):
+    def test_text_first_audio_later(self):
+        release = threading.Event()
+        def synthesize(text):
+            release.wait(2)
+            return b'RIFF' + text.encode()
+        store = TurnAudioStore(synthesize)
+        turn = store.start('s1', 'hello')
+        self.assertEqual(turn.status, 'pending')
+        # long-poll times out while TTS is still running
+        self.assertEqual(asyncio.run(store.wait(turn, 0.05)).status, 'pending')
+        release.set()
+        turn = asyncio.run(store.wait(turn, 2))
+        self.assertEqual((turn.status, turn.audio), ('done', b'RIFFhello'))
+        self.assertIs(store.get('s1', turn.id), turn)
+        self.assertIsNone(store.get('other-session', turn.id))
+
+    def test_retention_is_bounded_by_bytes(self):
+        store = TurnAudioStore(lambda text: b'x' * 100, max_bytes=250)
+        turns = [store.start('s1', str(i)) for i in range(4)]
+        for turn in turns:
+            turn.future.result(2)
+        self.assertEqual(store.stats()['bytes'], 200)
+        self.assertEqual([store.get('s1', t.id) is not None for t in turns], [False, False, True, True])
+
+    def test_failed_synthesis_is_an_error(self):
+        def boom(text):
+            raise RuntimeError('tts down')
+        store = TurnAudioStore(boom)
+        turn = store.start('s1', 'hello')
+        turn.future.result(2)
+        self.assertEqual((turn.status, turn.error), ('error', 'tts down'))
+
+    def test_ending_session_cancels_and_drops_audio(self):
+        release = threading.Event()
+        def synthesize(text):
+            release.wait(2)
+            return b'audio'
+        store = TurnAudioStore(synthesize)
+        done = store.start('s1', 'a')
+        release.set()
+        done.future.result(2)
+        release.clear()
+        pending = store.start('s1', 'b')
+        other = store.start('s2', 'c')
+        self.assertEqual(store.cancel_session('s1'), 2)
+        release.set()
+        other.future.result(2)
+        time.sleep(0.05)
+        self.assertEqual((pending.status, pending.audio), ('cancelled', b''))
+        self.assertEqual(done.status, 'expired')
+        self.assertIsNone(store.get('s1', done.id))
+        self.assertEqual(store.stats(), {'turns': 1, 'pending': 0, 'bytes': 5, 'max_bytes': store.max_bytes})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+import io, os, json, tempfile, threading, unittest, wave
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from unittest import mock
+import stt
+from fastapi import FastAPI, File, UploadFile
+from fastapi.testclient import TestClient
+from uploads import UploadLimitMiddleware, read_upload, wav_duration
+
+def _wav(seconds, rate=8000):
+    buf = io.BytesIO()
+    with wave.open(buf, 'wb') as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        w.writeframes(b'\x00\x00' * int(seconds * rate))
+    return buf.getvalue()
+
+def _app(max_bytes, max_seconds):
+    app = FastAPI()
+    app.add_middleware(UploadLimitMiddleware, max_bytes=max_bytes)
+
+    @app.post('/upload')
+    async def upload(file: UploadFile = File(...)):
+        f = await read_upload(file, max_bytes=max_bytes, max_seconds=max_seconds)
+        return {'bytes': len(f.read())}
+    return app
+
+class TestUploads(unittest.TestCase):
+    def test_wav_duration_from_header(self):
+        data = _wav(2.5)
+        self.assertAlmostEqual(wav_duration(data[:64], len(data)), 2.5)
+        # streaming recorders leave the data size unset
+        streamed = data[:40] + b'\xff\xff\xff\xff' + data[44:]
+        self.assertAlmostEqual(wav_duration(streamed[:64], len(streamed)), 2.5)
+        self.assertIsNone(wav_duration(b'\x1aE\xdf\xa3webm', 100))
+
+    def test_limits(self):
+        client = TestClient(_app(max_bytes=200 * 1024, max_seconds=5))
+        ok = client.post('/upload', files={'file': ('a.wav', _wav(1), 'audio/wav')})
+        self.assertEqual(ok.json(), {'bytes': len(_wav(1))})
+        too_long = client.post('/upload', files={'file': ('a.wav', _wav(6), 'audio/wav')})
+        self.assertEqual(too_long.status_code, 413)
+        too_big = client.post('/upload', files={'file': ('a.webm', b'\x00' * (300 * 1024), 'audio/webm')})
+        self.assertEqual(too_big.status_code, 413)
+        # body under the middleware cap (limit + form overhead) but file over the limit
+        just_over = client.post('/upload', files={'file': ('a.webm', b'\x00' * (210 * 1024), 'audio/webm')})
+        self.assertEqual(just_over.status_code, 413)
+
+    def test_chunked_body_is_cut_off(self):
+        client = TestClient(_app(max_bytes=10 * 1024, max_seconds=5))
+        def chunks():
+            boundary = b'--x\r\nContent-Disposition: form-data; name="file"; filename="a.webm"\r\n\r\n'
+            yield boundary
+            for _ in range(200):
+                yield b'\x00' * 1024
+            yield b'\r\n--x--\r\n'
+        resp = client.post('/upload', content=chunks(), headers={'content-type': 'multipart/form-data; boundary=x'})
+        self.assertEqual(resp.status_code, 413)
+
+    def _stt_with_stand_in(self, f, filename):
+        """transcribe_audio_deepgram(f) against a local Deepgram stand-in; returns (transcript, requests seen)."""
+        received = []
+
+        class DeepgramStandIn(BaseHTTPRequestHandler):
+            def do_POST(self):
+                received.append((self.headers.get('Content-Type'), len(self.rfile.read(int(self.headers['Content-Length'])))))
+                doc = json.dumps({'results': {'channels': [{'alternatives': [{'transcript': 'ok'}]}]}}).encode()
+                self.send_response(200)
+                self.send_header('Content-Length', str(len(doc)))
+                self.end_headers()
+                self.wfile.write(doc)
+
+            def log_message(self, *args):
+                pass
+
+        server = HTTPServer(('127.0.0.1', 0), DeepgramStandIn)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        env = {'DEEPGRAM_URL': f'http://127.0.0.1:{server.server_port}/v1/listen', 'DEEPGRAM_API_KEY': 'test'}
+        try:
+            with mock.patch.dict(os.environ, env), mock.patch.object(stt, 'MOCK_MODE', False):
+                return stt.transcribe_audio_deepgram(f, filename=filename), received
+        finally:
+            server.shutdown()
+
+    def test_large_file_is_streamed_to_stt(self):
+        with tempfile.TemporaryFile() as f, mock.patch.object(stt, 'STT_VAD_MAX_BYTES', 0):
+            f.write(_wav(3))
+            f.seek(100)
+            transcript, received = self._stt_with_stand_in(f, 'a.bin')
+        self.assertEqual(transcript, 'ok')
+        self.assertEqual(received, [('audio/wav', len(_wav(3)))])
+
+    def test_compressed_upload_is_never_read_whole(self):
+        class Spooled(io.BytesIO):
+            whole_reads = 0
+
+            def read(self, size=-1):
+                if size is None or size < 0:
+                    Spooled.whole_reads += 1
+                return super().read(size)
+
+        webm = Spooled(b'\x1aE\xdf\xa3' + b'\x00' * 100000)
+        transcript, received = self._stt_with_stand_in(webm, 'a.webm')
+        self.assertEqual((transcript, received), ('ok', [('audio/webm', 100004)]))
+        self.assertEqual(Spooled.whole_reads, 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,23 @@
+import unittest
+from unittest import mock
+from fastapi.testclient import TestClient
+from providers import ProviderUnavailable
+
+class TestVoiceRoute(unittest.TestCase):
+    def test_tts_outage_still_returns_and_stores_the_reply(self):
+        import app.main as main
+        main.session_mgr.sessions.create('sess_tts_down', 'agent_x', 'budget_shopper')
+        def unavailable(*args, **kwargs):
+            raise ProviderUnavailable('smallest circuit open')
+        with mock.patch.object(main, 'speculate', lambda *a: None), \
+                mock.patch.object(main, 'transcribe_audio_deepgram', lambda *a, **k: 'What is the price?'), \
+                mock.patch.object(main.smallest, 'synthesize_tts_bytes', unavailable):
+            resp = TestClient(main.app).post('/voice/sess_tts_down', files={'file': ('a.webm', b'\x1aE\xdf\xa3', 'audio/webm')})
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(resp.json()['reply_text'])
+        self.assertEqual(resp.json()['tts_base64'], '')
+        roles = [m['role'] for m in main.session_mgr.get_session('sess_tts_down')['messages']]
+        self.assertEqual(roles, ['rep', 'customer'])
+
+if __name__ == '__main__':
+    unittest.main()
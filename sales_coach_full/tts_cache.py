@@ -0,0 +1,147 @@
+"""Content-addressed cache for synthesized TTS audio.
+
+Entries are keyed by sha256 of (text, voice_id, synthesis params). A
+byte-bounded in-memory LRU sits in front of an optional on-disk tier
+(TTS_CACHE_DIR). Disk write errors are ignored: the audio is still returned
+and kept in memory.
+
+    python -m tts_cache warm     # pre-synthesize canned replies for every persona
+"""
+import os, sys, json, hashlib, threading
+from collections import OrderedDict
+
+TTS_CACHE_MAX_BYTES = int(os.environ.get("TTS_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+TTS_CACHE_DIR = os.environ.get("TTS_CACHE_DIR") or None
+
+
+def cache_key(text, voice_id=None, **params):
+    raw = json.dumps([text, voice_id, sorted(params.items())], ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class TTSCache:
+    def __init__(self, max_bytes=TTS_CACHE_MAX_BYTES, disk_dir=TTS_CACHE_DIR):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits_memory = 0
+        self.hits_disk = 0
+        self.misses = 0
+        self.evictions = 0
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, key[:2], key + ".audio")
+
+    def _read_disk(self, key):
+        try:
+            with open(self._disk_path(key), "rb") as f:
+                # the bytes end up in the memory tier anyway, so a plain read is enough
+                return f.read() or None
+        except OSError:
+            return None
+
+    def _write_disk(self, key, audio):
+        path = self._disk_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(audio)
+        os.replace(tmp, path)
+
+    def _remember(self, key, audio):
+        if len(audio) > self.max_bytes:
+            return
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= len(old)
+        self._entries[key] = audio
+        self._bytes += len(audio)
+        while self._bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= len(evicted)
+            self.evictions += 1
+
+    def __contains__(self, key):
+        """Peek without touching LRU order or hit/miss counters."""
+        with self._lock:
+            if key in self._entries:
+                return True
+        return bool(self.disk_dir) and os.path.exists(self._disk_path(key))
+
+    def get(self, key):
+        with self._lock:
+            audio = self._entries.get(key)
+            if audio is not None:
+                self._entries.move_to_end(key)
+                self.hits_memory += 1
+                return audio
+        audio = self._read_disk(key) if self.disk_dir else None
+        with self._lock:
+            if audio is None:
+                self.misses += 1
+                return None
+            self.hits_disk += 1
+            self._remember(key, audio)
+        return audio
+
+    def put(self, key, audio):
+        with self._lock:
+            self._remember(key, audio)
+        if self.disk_dir:
+            try:
+                self._write_disk(key, audio)
+            except OSError:
+                # full or read-only disk: the synthesized audio is still good
+                pass
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits_memory + self.hits_disk + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits_memory": self.hits_memory,
+                "hits_disk": self.hits_disk,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": round((self.hits_memory + self.hits_disk) / lookups, 4) if lookups else 0.0,
+            }
+
+
+def canned_phrases():
+    """Every reply text that repeats across sessions: canned, keyword and fallback replies."""
+    from reply import CANNED_REPLIES, KEYWORD_REPLIES
+    from smallest_wrapper import FALLBACK_REPLY
+    phrases = list(CANNED_REPLIES)
+    for _, replies in KEYWORD_REPLIES:
+        phrases.extend(replies)
+    phrases.append(FALLBACK_REPLY)
+    return list(dict.fromkeys(phrases))
+
+
+def warm_tts_cache(smallest):
+    """Synthesize canned phrases once per distinct persona voice; returns the number synthesized."""
+    from personas import PERSONAS
+    voices = list(dict.fromkeys(p.get("voice_id") for p in PERSONAS.values()))
+    n = 0
+    for voice_id in voices:
+        for text in canned_phrases():
+            try:
+                smallest.synthesize_tts_bytes(text, voice_id=voice_id)
+                n += 1
+            except Exception:
+                pass
+    return n
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] != ["warm"]:
+        sys.exit("usage: python -m tts_cache warm")
+    from smallest_wrapper import SmallestClientWrapper
+    wrapper = SmallestClientWrapper()
+    print(f"warmed {warm_tts_cache(wrapper)} phrases", wrapper.tts_cache.stats())
@@ -0,0 +1,123 @@
+"""Reply audio synthesized in the background and fetched per turn.
+
+With ?audio=deferred the turn endpoints return the reply text right away with
+a turn id, and TTS runs on the shared provider pool. The audio is then served
+by GET /sessions/{id}/turns/{turn_id}/audio, which can long-poll with ?wait=.
+
+Finished audio is kept in memory up to TURN_AUDIO_MAX_BYTES in total and for
+at most TURN_AUDIO_TTL_SECONDS; the oldest turns are dropped first. Ending a
+session cancels its syntheses that haven't started and drops its audio.
+"""
+import os, time, uuid, asyncio, threading
+from collections import OrderedDict
+from async_utils import get_executor
+
+TURN_AUDIO_MAX_BYTES = int(os.environ.get("TURN_AUDIO_MAX_BYTES", str(32 * 1024 * 1024)))
+TURN_AUDIO_TTL_SECONDS = float(os.environ.get("TURN_AUDIO_TTL_SECONDS", "600"))
+# upper bound for ?wait= on the audio endpoint
+TURN_AUDIO_MAX_WAIT_SECONDS = float(os.environ.get("TURN_AUDIO_MAX_WAIT_SECONDS", "25"))
+
+
+class TurnAudio:
+    def __init__(self, session_id, text):
+        self.id = "turn_" + uuid.uuid4().hex[:12]
+        self.session_id = session_id
+        self.text = text
+        # pending -> done | error | cancelled; expired once dropped from retention
+        self.status = "pending"
+        self.audio = b""
+        self.error = None
+        self.finished_at = None
+        self.future = None
+
+    def to_dict(self):
+        return {"turn_id": self.id, "status": self.status}
+
+
+class TurnAudioStore:
+    def __init__(self, synthesize, max_bytes=TURN_AUDIO_MAX_BYTES, ttl_s=TURN_AUDIO_TTL_SECONDS):
+        self.synthesize = synthesize
+        self.max_bytes = max_bytes
+        self.ttl_s = ttl_s
+        self.turns = {}
+        self._finished = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def start(self, session_id, text):
+        """Register a turn and start synthesizing text on the provider pool."""
+        turn = TurnAudio(session_id, text)
+        with self._lock:
+            self._expire()
+            self.turns[turn.id] = turn
+        turn.future = get_executor().submit(self._run, turn)
+        return turn
+
+    def get(self, session_id, turn_id):
+        with self._lock:
+            self._expire()
+            turn = self.turns.get(turn_id)
+        return turn if turn is not None and turn.session_id == session_id else None
+
+    async def wait(self, turn, timeout):
+        """Wait up to timeout seconds for a pending turn; returns it either way."""
+        if turn.status == "pending" and timeout > 0:
+            try:
+                await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(turn.future)), timeout)
+            except (asyncio.TimeoutError, asyncio.CancelledError):
+                pass
+        return turn
+
+    def cancel_session(self, session_id):
+        """Cancel a session's pending syntheses and drop its audio; returns the number of turns removed."""
+        with self._lock:
+            turns = [t for t in self.turns.values() if t.session_id == session_id]
+            for turn in turns:
+                self._drop(turn, "cancelled" if turn.status == "pending" else "expired")
+        for turn in turns:
+            # syntheses already running finish, but their audio is discarded
+            if turn.future is not None:
+                turn.future.cancel()
+        return len(turns)
+
+    def _run(self, turn):
+        if turn.status != "pending":
+            return
+        try:
+            audio = self.synthesize(turn.text)
+        except Exception as e:
+            audio, error = b"", str(e)
+        else:
+            error = None
+        with self._lock:
+            if turn.status != "pending" or self.turns.get(turn.id) is not turn:
+                return
+            turn.finished_at = time.monotonic()
+            self._finished[turn.id] = turn
+            if error is not None or not audio:
+                turn.status, turn.error = "error", error or "no audio"
+            else:
+                turn.audio, turn.status = audio, "done"
+                self._bytes += len(audio)
+            self._expire()
+
+    def _drop(self, turn, status):
+        self.turns.pop(turn.id, None)
+        if self._finished.pop(turn.id, None) is not None:
+            self._bytes -= len(turn.audio)
+        turn.audio = b""
+        turn.status = status
+
+    def _expire(self):
+        # finished turns in finish order: past the TTL, or oldest while over the byte cap
+        cutoff = time.monotonic() - self.ttl_s
+        while self._finished:
+            turn = next(iter(self._finished.values()))
+            if turn.finished_at > cutoff and self._bytes <= self.max_bytes:
+                break
+            self._drop(turn, "expired")
+
+    def stats(self):
+        with self._lock:
+            pending = sum(1 for t in self.turns.values() if t.status == "pending")
+            return {"turns": len(self.turns), "pending": pending, "bytes": self._bytes, "max_bytes": self.max_bytes}
@@ -0,0 +1,98 @@
+"""Size and duration limits for audio uploads, without buffering them in memory.
+
+Starlette's multipart parser already writes each uploaded file chunk by chunk
+into a SpooledTemporaryFile (in memory up to 1 MB, then on disk).
+UploadLimitMiddleware caps the request body as it arrives: a Content-Length
+over the limit is rejected before anything is read, and a chunked body is cut
+off with 413 once it passes the limit. read_upload() then checks the spooled
+file's size and, for WAV, the duration in its header, and hands the file back
+rewound so STT can stream it as the request body instead of copying it into
+a bytes object.
+"""
+import os, struct
+from fastapi import HTTPException
+from starlette.responses import JSONResponse
+
+UPLOAD_MAX_BYTES = int(os.environ.get("UPLOAD_MAX_BYTES", str(64 * 1024 * 1024)))
+UPLOAD_MAX_SECONDS = float(os.environ.get("UPLOAD_MAX_SECONDS", "600"))
+# room for multipart boundaries and the other form fields
+UPLOAD_FORM_OVERHEAD = 64 * 1024
+WAV_HEADER_BYTES = 4096
+
+
+def _too_large(detail):
+    return HTTPException(status_code=413, detail=detail)
+
+
+def wav_duration(head, total_bytes):
+    """Seconds of audio from a WAV header, or None when head isn't a readable WAV header.
+
+    A data chunk sized 0 or 0xFFFFFFFF (recorders that stream the header
+    first) is taken to run to the end of the file.
+    """
+    if len(head) < 12 or head[:4] != b"RIFF" or head[8:12] != b"WAVE":
+        return None
+    pos, byte_rate = 12, None
+    while pos + 8 <= len(head):
+        chunk_id, size = head[pos:pos + 4], struct.unpack("<I", head[pos + 4:pos + 8])[0]
+        if chunk_id == b"fmt " and pos + 20 <= len(head):
+            byte_rate = struct.unpack("<I", head[pos + 16:pos + 20])[0]
+        elif chunk_id == b"data":
+            if not byte_rate:
+                return None
+            if size in (0, 0xFFFFFFFF):
+                size = total_bytes - pos - 8
+            return max(0, min(size, total_bytes - pos - 8)) / float(byte_rate)
+        pos += 8 + size + (size & 1)
+    return None
+
+
+def file_size(f):
+    """Size of a seekable file; leaves it rewound."""
+    f.seek(0, os.SEEK_END)
+    size = f.tell()
+    f.seek(0)
+    return size
+
+
+async def read_upload(file, max_bytes=UPLOAD_MAX_BYTES, max_seconds=UPLOAD_MAX_SECONDS):
+    """The upload's spooled binary file, rewound; 413 when it is over the size or duration limit."""
+    f = file.file
+    size = file.size if getattr(file, "size", None) is not None else file_size(f)
+    if size > max_bytes:
+        raise _too_large(f"upload is {size} bytes, limit is {max_bytes}")
+    f.seek(0)
+    seconds = wav_duration(f.read(WAV_HEADER_BYTES), size)
+    f.seek(0)
+    if seconds is not None and seconds > max_seconds:
+        raise _too_large(f"upload is {seconds:.0f} s of audio, limit is {max_seconds:.0f} s")
+    return f
+
+
+class UploadLimitMiddleware:
+    """ASGI middleware rejecting request bodies over max_bytes (+ form overhead) with 413."""
+
+    def __init__(self, app, max_bytes=UPLOAD_MAX_BYTES):
+        self.app = app
+        self.limit = max_bytes + UPLOAD_FORM_OVERHEAD
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        declared = dict(scope.get("headers") or []).get(b"content-length")
+        if declared is not None and declared.isdigit() and int(declared) > self.limit:
+            response = JSONResponse({"detail": f"request body over {self.limit} bytes"}, status_code=413)
+            return await response(scope, receive, send)
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.limit:
+                    # raised inside body parsing; FastAPI turns it into the 413 response
+                    raise _too_large(f"request body over {self.limit} bytes")
+            return message
+
+        await self.app(scope, limited_receive, send)